@@ -0,0 +1 @@
+"""Benchmarks for NoteViz performance-sensitive stages."""
@@ -0,0 +1,57 @@
+"""
+Benchmark the combined analysis request against separate topic, summary
+and key-concept requests.
+
+Input tokens are estimated from the prompts received by a fake client
+whose latency grows with the prompt length.
+
+Usage:
+    python -m benchmarks.bench_analysis [num_words] [latency_seconds]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from noteviz.core.llm import OpenAILLMService, SummarizerConfig, TopicExtractorConfig
+
+from .fakes import FakeAsyncOpenAI
+from .pdfs import WORDS
+
+
+async def run(num_words: int, latency: float) -> None:
+    rng = random.Random(0)
+    sentences = [" ".join(rng.choice(WORDS) for _ in range(15)).capitalize() + "." for _ in range(num_words // 15)]
+    text = " ".join(sentences)
+    # One group covers the text, so both paths send it whole rather than map-reducing it
+    summarizer_config = SummarizerConfig(group_tokens=1_000_000)
+    topic_config = TopicExtractorConfig()
+
+    client = FakeAsyncOpenAI(latency=latency)
+    service = OpenAILLMService(summarizer_config, topic_config, client=client)
+    start = time.perf_counter()
+    await service.extract_topics(text)
+    await service.generate_summary(text)
+    await service.identify_key_concepts(text)
+    separate_seconds = time.perf_counter() - start
+    separate = client.chat.completions
+
+    client = FakeAsyncOpenAI(latency=latency)
+    service = OpenAILLMService(summarizer_config, topic_config, client=client)
+    start = time.perf_counter()
+    result = await service.analyze(text)
+    combined_seconds = time.perf_counter() - start
+    combined = client.chat.completions
+
+    assert result.combined, "combined response was not parsed"
+    print(f"words={num_words} latency={latency * 1000:.0f}ms")
+    print(f"  separate: {separate.calls} requests {separate.input_tokens:8d} tokens {separate_seconds:7.3f}s")
+    print(f"  combined: {combined.calls} requests {combined.input_tokens:8d} tokens {combined_seconds:7.3f}s")
+    print(f"  saving:   {1 - combined.input_tokens / separate.input_tokens:8.0%} tokens "
+          f"{separate_seconds / combined_seconds:.1f}x faster")
+
+
+if __name__ == "__main__":
+    num_words = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    asyncio.run(run(num_words, latency))
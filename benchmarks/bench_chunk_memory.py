@@ -0,0 +1,67 @@
+"""
+Benchmark peak memory of string chunks against offset-based chunk spans.
+
+Page text is extracted once up front; the measured part is building the
+full text, the chunks and the re-joined text handed to the LLM.
+
+Usage:
+    python -m benchmarks.bench_chunk_memory [num_pages]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List
+
+from noteviz.core.pdf import DocumentText, PDFConfig, PyPDFProcessor
+
+from .pdfs import generate_book
+
+CONFIG = PDFConfig(chunk_size=1000, chunk_overlap=200)
+
+
+def string_chunks(pages: List[str]) -> int:
+    """Concatenate pages, slice chunk strings and re-join them."""
+    text = ""
+    for page_text in pages:
+        text += page_text + "\n"
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunks.append(text[start:start + CONFIG.chunk_size])
+        start += CONFIG.chunk_size - CONFIG.chunk_overlap
+    joined = "\n".join(chunks)
+    return len(chunks) + len(joined)
+
+
+def span_chunks(pages: List[str]) -> int:
+    """Build one buffer, chunk it into spans and reuse the buffer."""
+    document = DocumentText("book.pdf", pages)
+    chunks = document.chunk(CONFIG.chunk_size, CONFIG.chunk_overlap)
+    joined = document.text
+    return len(chunks) + len(joined)
+
+
+def measure(name: str, build: Callable[[List[str]], int], pages: List[str]) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    build(pages)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {name:<8} peak={peak / 1e6:7.1f}MB time={seconds:6.3f}s")
+
+
+async def run(num_pages: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = generate_book(Path(tmp) / "book.pdf", num_pages)
+        pages = await PyPDFProcessor(CONFIG).extract_pages(pdf_path)
+    print(f"pages={num_pages} text={sum(len(page) + 1 for page in pages) / 1e6:.1f}M chars")
+    measure("strings", string_chunks, pages)
+    measure("spans", span_chunks, pages)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
@@ -0,0 +1,66 @@
+"""
+Benchmark batched and concurrent embedding requests against the per-text
+request loop.
+
+Usage:
+    python -m benchmarks.bench_embedding_batching [num_chunks] [latency_seconds]
+"""
+import asyncio
+import sys
+import time
+from typing import List
+
+from noteviz.core.embedding import EmbeddingConfig, OpenAIEmbeddingService
+
+from .fakes import FakeAsyncOpenAI
+
+
+async def per_text_loop(client: FakeAsyncOpenAI, texts: List[str], model: str) -> List[List[float]]:
+    """The original strategy: one request per text."""
+    embeddings = []
+    for text in texts:
+        response = await client.embeddings.create(model=model, input=text)
+        embeddings.append(response.data[0].embedding)
+    return embeddings
+
+
+async def run(num_chunks: int, latency: float) -> None:
+    texts = [f"Chunk {i}: " + "lorem ipsum dolor sit amet " * 35 for i in range(num_chunks)]
+    config = EmbeddingConfig(model_name="text-embedding-3-small", batch_size=32)
+
+    client = FakeAsyncOpenAI(latency=latency)
+    start = time.perf_counter()
+    baseline = await per_text_loop(client, texts, config.model_name)
+    loop_seconds = time.perf_counter() - start
+    loop_calls = client.embeddings.calls
+
+    client = FakeAsyncOpenAI(latency=latency)
+    service = OpenAIEmbeddingService(config, client=client)
+    start = time.perf_counter()
+    batched = await service.generate_embeddings(texts)
+    batch_seconds = time.perf_counter() - start
+    batch_calls = client.embeddings.calls
+
+    concurrent_config = config.model_copy(update={"max_concurrency": 8})
+    client = FakeAsyncOpenAI(latency=latency)
+    service = OpenAIEmbeddingService(concurrent_config, client=client)
+    concurrent = await service.generate_embeddings(texts)
+    stats = service.stats
+
+    assert batched == baseline, "batched results differ from the per-text loop"
+    assert concurrent == baseline, "concurrent results differ from the per-text loop"
+    print(f"chunks={num_chunks} latency={latency * 1000:.0f}ms batch_size={config.batch_size}")
+    print(f"  per-text loop: {loop_calls:5d} requests {loop_seconds:8.3f}s")
+    print(f"  batched:       {batch_calls:5d} requests {batch_seconds:8.3f}s")
+    print(
+        f"  concurrent:    {stats.requests:5d} requests {stats.elapsed_seconds:8.3f}s "
+        f"(peak {stats.peak_concurrency} in flight, {stats.texts_per_second:.0f} texts/s)"
+    )
+    print(f"  speedup:       {loop_seconds / batch_seconds:8.1f}x batched, "
+          f"{loop_seconds / stats.elapsed_seconds:.1f}x concurrent")
+
+
+if __name__ == "__main__":
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    asyncio.run(run(num_chunks, latency))
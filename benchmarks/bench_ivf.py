@@ -0,0 +1,61 @@
+"""
+Recall@k versus latency of IVFRetrieval compared with exact CosineRetrieval.
+
+Embeddings are synthetic: unit vectors scattered around random cluster
+centres, which mimics the topical structure of real chunk embeddings.
+
+Usage:
+    python -m benchmarks.bench_ivf [corpus_size] [dimensions]
+"""
+import sys
+import time
+
+import numpy as np
+
+from noteviz.core.retrieval import CosineRetrieval, IVFConfig, IVFRetrieval, RetrievalConfig
+
+K = 10
+NUM_QUERIES = 200
+
+
+def synthetic_embeddings(rng: np.random.Generator, size: int, dimensions: int) -> np.ndarray:
+    centres = rng.normal(size=(max(1, size // 500), dimensions))
+    points = centres[rng.integers(len(centres), size=size)] + 0.5 * rng.normal(size=(size, dimensions))
+    return points.astype(np.float32)
+
+
+def main(size: int, dimensions: int) -> None:
+    rng = np.random.default_rng(0)
+    embeddings = synthetic_embeddings(rng, size, dimensions)
+    texts = [str(i) for i in range(size)]
+    queries = embeddings[rng.choice(size, NUM_QUERIES, replace=False)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32)
+
+    exact = CosineRetrieval(RetrievalConfig(similarity_threshold=0.0, max_results=K))
+    exact.index(texts, embeddings)
+    start = time.perf_counter()
+    truth = [{t for t, _ in exact.find_relevant_chunks(q)} for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / NUM_QUERIES
+
+    ivf = IVFRetrieval(IVFConfig(similarity_threshold=0.0, max_results=K))
+    start = time.perf_counter()
+    ivf.index(texts, embeddings)
+    build_seconds = time.perf_counter() - start
+
+    print(f"corpus={size} dimensions={dimensions} lists={len(ivf.centroids)} "
+          f"build={build_seconds:.2f}s")
+    print(f"{'backend':>12} {'recall@' + str(K):>10} {'ms/query':>10}")
+    print(f"{'exact':>12} {1.0:>10.3f} {exact_ms:>10.3f}")
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        ivf.config.nprobe = nprobe
+        start = time.perf_counter()
+        found = [{t for t, _ in ivf.find_relevant_chunks(q)} for q in queries]
+        ivf_ms = (time.perf_counter() - start) * 1000 / NUM_QUERIES
+        recall = np.mean([len(f & t) / K for f, t in zip(found, truth)])
+        print(f"{'nprobe=' + str(nprobe):>12} {recall:>10.3f} {ivf_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    main(size, dimensions)
@@ -0,0 +1,36 @@
+"""
+Benchmark serial against process-pool page text extraction.
+
+Usage:
+    python -m benchmarks.bench_pdf_extraction [num_pages]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from noteviz.core.pdf import PDFConfig, PyPDFProcessor
+
+from .pdfs import generate_book
+
+
+async def run(num_pages: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = generate_book(Path(tmp) / "book.pdf", num_pages)
+        print(f"pages={num_pages} size={pdf_path.stat().st_size / 1e6:.1f}MB cpus={os.cpu_count()}")
+        baseline = None
+        for workers in (1, 2, 4, 8):
+            processor = PyPDFProcessor(PDFConfig(num_workers=workers))
+            start = time.perf_counter()
+            pages = await processor.extract_pages(pdf_path)
+            seconds = time.perf_counter() - start
+            if baseline is None:
+                baseline = (pages, seconds)
+            assert pages == baseline[0], "parallel extraction changed the page text"
+            print(f"  workers={workers}: {seconds:7.2f}s ({baseline[1] / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 300))
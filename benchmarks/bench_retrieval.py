@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of CosineRetrieval query throughput against corpus size.
+
+Compares the indexed, normalized matrix with partial top-k selection against
+the original per-query implementation, which rebuilt the array, recomputed
+every row norm and fully sorted the scores.
+
+It also reports how long a saved, memory-mapped index takes to open.
+
+Usage:
+    python -m benchmarks.bench_retrieval [dimensions]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from noteviz.core.retrieval import CosineRetrieval, RetrievalConfig
+
+
+def legacy_query(
+    texts: List[str], embeddings: List[List[float]], query: List[float], config: RetrievalConfig
+) -> List[Tuple[str, float]]:
+    """The original ``find_relevant_chunks`` implementation."""
+    query_array = np.array(query)
+    embeddings_array = np.array(embeddings)
+    similarities = np.dot(embeddings_array, query_array) / (
+        np.linalg.norm(embeddings_array, axis=1) * np.linalg.norm(query_array)
+    )
+    indices = np.argsort(similarities)[::-1]
+    results = []
+    for idx in indices:
+        similarity = similarities[idx]
+        if similarity < config.similarity_threshold or len(results) >= config.max_results:
+            break
+        results.append((texts[idx], float(similarity)))
+    return results
+
+
+def queries_per_second(run: Callable[[], object], min_seconds: float = 0.5) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        run()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main(dimensions: int) -> None:
+    rng = np.random.default_rng(0)
+    config = RetrievalConfig(similarity_threshold=0.0, max_results=5)
+    print(f"dimensions={dimensions} max_results={config.max_results}")
+    print(f"{'corpus':>8} {'legacy q/s':>12} {'indexed q/s':>12} {'speedup':>8}")
+    for size in (1_000, 5_000, 20_000, 50_000):
+        matrix = rng.normal(size=(size, dimensions)).astype(np.float32)
+        texts = [f"chunk {i}" for i in range(size)]
+        query = rng.normal(size=dimensions).astype(np.float32)
+        service = CosineRetrieval(config)
+        service.index(texts, matrix)
+
+        indexed = queries_per_second(lambda: service.find_relevant_chunks(query))
+        if size <= 5_000:
+            embeddings = matrix.tolist()
+            query_list = query.tolist()
+            legacy = queries_per_second(lambda: legacy_query(texts, embeddings, query_list, config))
+            print(f"{size:>8} {legacy:>12.1f} {indexed:>12.1f} {indexed / legacy:>7.0f}x")
+        else:
+            print(f"{size:>8} {'-':>12} {indexed:>12.1f} {'':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service.save(Path(tmp) / "index")
+        loaded = CosineRetrieval(config)
+        start = time.perf_counter()
+        loaded.load(Path(tmp) / "index")
+        load_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        loaded.find_relevant_chunks(query)
+        first_query_ms = (time.perf_counter() - start) * 1000
+    print(f"memory-mapped load of {len(loaded.texts)} rows: {load_ms:.2f}ms "
+          f"(first query {first_query_ms:.2f}ms)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1536)
@@ -0,0 +1,60 @@
+"""
+Benchmark reprocessing a revised PDF against processing it from scratch.
+
+Usage:
+    python -m benchmarks.bench_revision [num_pages] [num_revised_pages]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from noteviz.core.embedding import EmbeddingConfig, OpenAIEmbeddingService
+from noteviz.core.indexing import DocumentIndexer
+from noteviz.core.pdf import PDFConfig, PyPDFProcessor
+from noteviz.core.retrieval import CosineRetrieval, RetrievalConfig
+
+from .fakes import FakeAsyncOpenAI
+from .pdfs import generate_book
+
+
+async def index(pdf_path: Path, directory: Path) -> None:
+    client = FakeAsyncOpenAI()
+    indexer = DocumentIndexer(
+        PyPDFProcessor(PDFConfig()),
+        OpenAIEmbeddingService(
+            EmbeddingConfig(model_name="text-embedding-3-small", batch_size=32, max_concurrency=4),
+            client=client,
+        ),
+        CosineRetrieval(RetrievalConfig(similarity_threshold=0.7, max_results=5)),
+        directory,
+    )
+    start = time.perf_counter()
+    update = await indexer.update(pdf_path)
+    seconds = time.perf_counter() - start
+    print(f"  {len(update.changed_pages):4d}/{update.num_pages} pages extracted, "
+          f"{update.chunks_added:5d} chunks embedded in {client.embeddings.calls:3d} requests, "
+          f"{update.chunks_reused:5d} reused: {seconds:6.2f}s")
+
+
+async def run(num_pages: int, num_revised: int) -> None:
+    revised = set(range(1, num_pages + 1, max(1, num_pages // num_revised)))
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pdf_path = generate_book(tmp / "book.pdf", num_pages)
+        print(f"pages={num_pages} revised={len(revised)}")
+        print("first edition, from scratch:")
+        await index(pdf_path, tmp / "index")
+        generate_book(pdf_path, num_pages, revised_pages=revised)
+        print("second edition, incremental:")
+        await index(pdf_path, tmp / "index")
+        print("second edition, from scratch:")
+        await index(pdf_path, tmp / "fresh")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    ))
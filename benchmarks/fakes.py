@@ -0,0 +1,84 @@
+"""
+Local stand-ins for the OpenAI client used by the benchmarks.
+
+The fakes mimic the shape of the real async client closely enough for the
+NoteViz services and add a fixed per-request latency, so benchmarks measure
+round-trip behaviour without network access or an API key.
+"""
+import asyncio
+import json
+import zlib
+from types import SimpleNamespace
+from typing import Dict, List, Union
+
+from noteviz.core.tokens import estimate_total_tokens
+
+
+class FakeEmbeddings:
+    """Fake ``client.embeddings`` resource returning deterministic vectors."""
+
+    def __init__(self, latency: float = 0.02, dimensions: int = 1536):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        seed = zlib.crc32(text.encode("utf-8"))
+        return [((seed >> (i % 24)) & 0xFF) / 255.0 for i in range(self.dimensions)]
+
+    async def create(self, model: str, input: Union[str, List[str]], **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        texts = [input] if isinstance(input, str) else list(input)
+        return SimpleNamespace(
+            data=[
+                SimpleNamespace(index=i, embedding=self._vector(text))
+                for i, text in enumerate(texts)
+            ]
+        )
+
+
+class FakeChatCompletions:
+    """Fake ``client.chat.completions`` resource answering each NoteViz prompt.
+
+    Latency grows with the prompt length, like prefill time of a real model.
+    """
+
+    def __init__(self, latency: float = 0.02, seconds_per_token: float = 2e-6):
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.calls = 0
+        self.input_tokens = 0
+
+    def _answer(self, prompt: str) -> str:
+        if "respond with a JSON object" in prompt:
+            return json.dumps({
+                "topics": [self._topic(i) for i in range(5)],
+                "summary": "A synthetic summary.",
+                "key_concepts": [f"Concept {i}: a synthetic concept" for i in range(5)],
+            })
+        if "JSON array" in prompt:
+            return json.dumps([self._topic(i) for i in range(5)])
+        if "numbered list" in prompt:
+            return "\n".join(f"{i + 1}. Concept {i}: a synthetic concept" for i in range(5))
+        return "A synthetic summary."
+
+    @staticmethod
+    def _topic(i: int) -> Dict[str, object]:
+        return {"name": f"Topic {i}", "description": "A synthetic topic", "confidence": 0.5, "keywords": ["synthetic"]}
+
+    async def create(self, model: str, messages: List[Dict[str, str]], **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        tokens = estimate_total_tokens(message["content"] for message in messages)
+        self.input_tokens += tokens
+        await asyncio.sleep(self.latency + tokens * self.seconds_per_token)
+        content = self._answer(messages[-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")])
+
+
+class FakeAsyncOpenAI:
+    """Fake ``AsyncOpenAI`` exposing the resources NoteViz uses."""
+
+    def __init__(self, latency: float = 0.02, dimensions: int = 1536):
+        self.embeddings = FakeEmbeddings(latency, dimensions)
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(latency))
@@ -0,0 +1,55 @@
+"""
+Synthetic PDF books for the PDF benchmarks.
+"""
+import random
+from pathlib import Path
+from typing import Collection
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+WORDS = (
+    "system process data model function value network signal energy matrix "
+    "theory method result analysis structure memory vector layer query index "
+    "the of and to in is that for with as on by this are from be an"
+).split()
+
+
+def generate_book(
+    path: Path,
+    num_pages: int,
+    lines_per_page: int = 45,
+    seed: int = 0,
+    revised_pages: Collection[int] = (),
+) -> Path:
+    """Write a text-only PDF with running headers, footers and page numbers.
+
+    Args:
+        path: Output file.
+        num_pages: Number of pages to generate.
+        lines_per_page: Body lines per page.
+        seed: Random seed for the generated words.
+        revised_pages: One-based page numbers whose first line is marked as
+            revised, to simulate a new revision of the same book.
+
+    Returns:
+        The output path.
+    """
+    rng = random.Random(seed)
+    pdf = canvas.Canvas(str(path), pagesize=letter)
+    width, height = letter
+    for page in range(1, num_pages + 1):
+        if page % 25 == 1:
+            chapter = page // 25 + 1
+            pdf.drawString(72, height - 90, f"Chapter {chapter}")
+        pdf.drawString(72, height - 40, "A Synthetic Book About Systems")
+        y = height - 110
+        if page in revised_pages:
+            pdf.drawString(72, y + 13, "Revised in the second edition.")
+        for _ in range(lines_per_page):
+            pdf.drawString(72, y, " ".join(rng.choice(WORDS) for _ in range(14)).capitalize() + ".")
+            y -= 13
+        pdf.drawString(width / 2, 30, str(page))
+        pdf.showPage()
+    pdf.save()
+    return path
@@ -2,19 +2,47 @@
 Command-line interface for NoteViz.
 """
 import asyncio
+import hashlib
 import sys
 from pathlib import Path
 
-from noteviz.core.pdf import PDFConfig, PyPDFProcessor
-from noteviz.core.embedding import EmbeddingConfig, OpenAIEmbeddingService
+from noteviz.config import config
+from noteviz.core.pdf import ExtractionCache, PDFConfig, PyPDFProcessor, split_sections
+from noteviz.core.embedding import (
+    CachedEmbeddingService,
+    DeduplicatingEmbeddingService,
+    EmbeddingCache,
+    EmbeddingConfig,
+    OpenAIEmbeddingService,
+)
 from noteviz.core.llm import (
+    ResponseCache,
     SummarizerConfig,
+    SummaryCache,
     TopicExtractorConfig,
     OpenAILLMService,
 )
+from noteviz.core.indexing import DocumentIndexer
+from noteviz.core.stages import StageResult
 from noteviz.core.retrieval import RetrievalConfig, CosineRetrieval
 
 
+def index_directory(pdf_path: Path) -> Path:
+    """Directory of the persisted index for a PDF file.
+    
+    The directory is keyed by the resolved path, so files that share a
+    name in different folders keep separate indexes.
+    
+    Args:
+        pdf_path: Path to the PDF file.
+        
+    Returns:
+        Directory under the data directory for the file's index.
+    """
+    digest = hashlib.sha256(str(pdf_path.resolve()).encode("utf-8")).hexdigest()
+    return config.data_dir / "indexes" / f"{pdf_path.stem}-{digest[:12]}"
+
+
 async def process_pdf(pdf_path: str) -> dict:
     """Process a PDF file and generate analysis.
     
@@ -30,15 +58,31 @@ async def process_pdf(pdf_path: str) -> dict:
         sys.exit(1)
         
     # Initialize services
-    pdf_config = PDFConfig(chunk_size=1000, chunk_overlap=200)
-    pdf_processor = PyPDFProcessor(pdf_config)
+    pdf_config = PDFConfig(chunker="tokens", chunk_tokens=256, chunk_overlap_tokens=32, strip_boilerplate=True)
+    extraction_cache = ExtractionCache(
+        config.cache_dir / "extraction.sqlite3",
+        max_bytes=config.extraction_cache_max_bytes
+    )
+    pdf_processor = PyPDFProcessor(pdf_config, cache=extraction_cache)
     
     embedding_config = EmbeddingConfig(
         model_name="text-embedding-3-small",
         device="cpu",
-        batch_size=32
+        batch_size=32,
+        max_concurrency=4
+    )
+    embedding_cache = EmbeddingCache(
+        config.cache_dir / "embeddings.sqlite3",
+        max_bytes=config.embedding_cache_max_bytes
+    )
+    cached_embedding_service = CachedEmbeddingService(
+        OpenAIEmbeddingService(embedding_config),
+        embedding_cache
+    )
+    embedding_service = DeduplicatingEmbeddingService(
+        cached_embedding_service,
+        threshold=config.dedup_threshold
     )
-    embedding_service = OpenAIEmbeddingService(embedding_config)
     
     summarizer_config = SummarizerConfig(
         model_name="gpt-3.5-turbo",
@@ -51,7 +95,21 @@ async def process_pdf(pdf_path: str) -> dict:
         max_tokens=1000,
         num_topics=5
     )
-    llm_service = OpenAILLMService(summarizer_config, topic_config)
+    summary_cache = SummaryCache(
+        config.cache_dir / "summaries.sqlite3",
+        max_bytes=config.summary_cache_max_bytes
+    )
+    response_cache = ResponseCache(
+        config.cache_dir / "llm_responses.sqlite3",
+        max_bytes=config.response_cache_max_bytes,
+        max_age=config.response_cache_max_age
+    )
+    llm_service = OpenAILLMService(
+        summarizer_config,
+        topic_config,
+        summary_cache=summary_cache,
+        response_cache=response_cache
+    )
     
     retrieval_config = RetrievalConfig(
         similarity_threshold=0.7,
@@ -59,43 +117,79 @@ async def process_pdf(pdf_path: str) -> dict:
     )
     retrieval_service = CosineRetrieval(retrieval_config)
     
-    # Process PDF
+    # Process PDF, reusing the pages indexed by the previous run
     print(f"Processing PDF: {pdf_path}")
-    chunks = await pdf_processor.process_pdf(pdf_path)
-    print(f"Extracted {len(chunks)} chunks")
-    
-    # Generate embeddings
-    print("Generating embeddings...")
-    embeddings = await embedding_service.generate_embeddings(chunks)
-    print(f"Generated {len(embeddings)} embeddings")
-    
-    # Extract topics
-    print("\nExtracting topics...")
-    text = "\n".join(chunks)
-    topics = await llm_service.extract_topics(text)
-    print("\nTopics:")
-    for topic in topics:
-        print(f"- {topic.name}: {topic.description}")
-    
-    # Generate summary
-    print("\nGenerating summary...")
-    summary = await llm_service.generate_summary(text)
-    print(f"\nSummary:\n{summary}")
+    indexer = DocumentIndexer(
+        pdf_processor,
+        embedding_service,
+        retrieval_service,
+        index_directory(pdf_path)
+    )
+    update = await indexer.update(pdf_path)
+    if update.unchanged:
+        print(f"Unchanged since the last run, reusing {update.chunks_reused} indexed chunks")
+    else:
+        print(f"Extracted {len(update.extracted_pages)} of {update.num_pages} pages: "
+              f"{update.chunks_added} chunks added, {update.chunks_reused} reused, "
+              f"{update.chunks_removed} removed")
+        print(f"Generated {update.chunks_added - update.chunks_aliased} embeddings "
+              f"({cached_embedding_service.hits} cached, {cached_embedding_service.misses} new)")
+        if embedding_service.duplicates:
+            print(f"Indexed {update.chunks_aliased} near-duplicate chunks as aliases, "
+                  f"saved {embedding_service.requests_saved} requests (~{embedding_service.tokens_saved} tokens)")
+    normalization = pdf_processor.normalization
+    if normalization.lines_removed or normalization.hyphens_joined:
+        print(f"Stripped {normalization.lines_removed} header, footer and page-number lines "
+              f"and joined {normalization.hyphens_joined} hyphenated words "
+              f"({normalization.chars_removed} characters, ~{normalization.tokens_removed} tokens)")
+    if extraction_cache.hits:
+        print(f"Read cached page text, saved {extraction_cache.saved_seconds:.2f}s of parsing")
     
-    # Identify key concepts
-    print("\nIdentifying key concepts...")
-    key_concepts = await llm_service.identify_key_concepts(text)
-    print("\nKey Concepts:")
-    for concept in key_concepts:
-        print(f"- {concept}")
+    # Extract topics, summary and key concepts, printing each as it arrives
+    print("\nAnalyzing...")
+    text = update.document.text
+    sections = split_sections(update.document, update.outline)
+    if len(sections) > 1:
+        print(f"Summarizing {len(sections)} sections, such as chapters, separately")
+    analysis = await llm_service.analyze(
+        text,
+        num_topics=topic_config.num_topics,
+        on_result=print_stage,
+        sections=[section.text for section in sections]
+    )
+    for stage in llm_service.summarizer.stages:
+        print(f"  {stage.name}: {stage.calls} requests, {stage.cached} cached, "
+              f"~{stage.input_tokens} tokens in, ~{stage.output_tokens} out, {stage.seconds:.2f}s")
+    if not analysis.combined:
+        print("  Combined response could not be parsed, used separate concurrent requests")
+    if response_cache.hits:
+        print(f"  Answered {response_cache.hits} of {response_cache.hits + response_cache.misses} "
+              f"LLM requests from the response cache")
         
     return {
-        "topics": topics,
-        "summary": summary,
-        "key_concepts": key_concepts
+        "topics": analysis.topics,
+        "summary": analysis.summary,
+        "key_concepts": analysis.key_concepts
     }
 
 
+def print_stage(result: StageResult) -> None:
+    """Print the result of one analysis stage."""
+    title = {"topics": "Topics", "summary": "Summary", "key_concepts": "Key Concepts"}[result.name]
+    if not result.ok:
+        print(f"\n{title} failed after {result.seconds:.2f}s: {result.error}")
+    elif result.name == "topics":
+        print(f"\n{title}:")
+        for topic in result.value:
+            print(f"- {topic.name}: {topic.description}")
+    elif result.name == "summary":
+        print(f"\n{title}:\n{result.value}")
+    else:
+        print(f"\n{title}:")
+        for concept in result.value:
+            print(f"- {concept}")
+
+
 def main(args=None):
     """Main entry point for the CLI."""
     if args is None:
@@ -10,6 +10,23 @@ class Config:
         self.openai_api_key: Optional[str] = os.getenv("OPENAI_API_KEY")
         self.data_dir: Path = Path(os.getenv("NOTEVIZ_DATA_DIR", "data"))
         self.cache_dir: Path = Path(os.getenv("NOTEVIZ_CACHE_DIR", "cache"))
+        self.embedding_cache_max_bytes: int = int(
+            os.getenv("NOTEVIZ_EMBEDDING_CACHE_MAX_BYTES", str(1024 ** 3))
+        )
+        self.extraction_cache_max_bytes: int = int(
+            os.getenv("NOTEVIZ_EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 ** 2))
+        )
+        self.summary_cache_max_bytes: int = int(
+            os.getenv("NOTEVIZ_SUMMARY_CACHE_MAX_BYTES", str(64 * 1024 ** 2))
+        )
+        self.response_cache_max_bytes: int = int(
+            os.getenv("NOTEVIZ_RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 ** 2))
+        )
+        # Seconds until a cached LLM response expires; 30 days by default
+        self.response_cache_max_age: float = float(
+            os.getenv("NOTEVIZ_RESPONSE_CACHE_MAX_AGE", str(30 * 24 * 3600))
+        )
+        self.dedup_threshold: float = float(os.getenv("NOTEVIZ_DEDUP_THRESHOLD", "0.9"))
         
         # Create directories if they don't exist
         self.data_dir.mkdir(parents=True, exist_ok=True)
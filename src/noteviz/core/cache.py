@@ -0,0 +1,173 @@
+"""
+Disk-backed key/value storage shared by the NoteViz caches.
+"""
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+# Stores written before entries recorded their creation time
+_ADD_CREATED = """
+ALTER TABLE entries ADD COLUMN created REAL NOT NULL DEFAULT 0;
+UPDATE entries SET created = accessed;
+"""
+
+# SQLite limits the number of host parameters in a single statement
+_MAX_PARAMS = 500
+
+
+class LRUStore:
+    """SQLite-backed byte store with least-recently-used and age-based eviction.
+
+    Every read refreshes the entry's access time. When the total size of the
+    stored values exceeds ``max_bytes``, the least recently used entries are
+    deleted until the store fits again. Entries stored more than
+    ``max_age`` seconds ago are treated as missing and deleted on the next
+    write.
+    """
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None, max_age: Optional[float] = None):
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be greater than 0")
+        if max_age is not None and max_age <= 0:
+            raise ValueError("max_age must be greater than 0")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.executescript(_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+        if "created" not in columns:
+            self._conn.executescript(_ADD_CREATED)
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of the stored values in bytes."""
+        return self._total
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM entries WHERE key = ? AND created >= ?", (key, self._cutoff())
+        ).fetchone()
+        return row is not None
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value stored under ``key``, or None if it is missing."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Return the stored values for every key that is present.
+
+        Args:
+            keys: Keys to look up.
+
+        Returns:
+            Mapping from each found key to its value.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        for start in range(0, len(keys), _MAX_PARAMS):
+            part = keys[start:start + _MAX_PARAMS]
+            placeholders = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                f"SELECT key, value FROM entries WHERE key IN ({placeholders}) AND created >= ?",
+                part + [self._cutoff()]
+            ).fetchall()
+            found.update((key, bytes(value)) for key, value in rows)
+        if found:
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE entries SET accessed = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+        return found
+
+    def put(self, key: str, value: bytes) -> None:
+        """Store ``value`` under ``key``, replacing any previous value."""
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]) -> None:
+        """Store several values and evict old entries if the store is full.
+
+        Args:
+            items: (key, value) pairs to store.
+        """
+        items = list(dict(items).items())
+        if not items:
+            return
+        now = time.time()
+        with self._conn:
+            replaced = self._sizes([key for key, _ in items])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed, created) VALUES (?, ?, ?, ?, ?)",
+                [(key, sqlite3.Binary(value), len(value), now, now) for key, value in items]
+            )
+        self._total += sum(len(value) for _, value in items) - sum(replaced.values())
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        """Remove ``key`` from the store if present."""
+        with self._conn:
+            size = self._sizes([key]).get(key)
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._total -= size or 0
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+        self._total = 0
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        self._conn.close()
+
+    def _sizes(self, keys: List[str]) -> Dict[str, int]:
+        sizes: Dict[str, int] = {}
+        for start in range(0, len(keys), _MAX_PARAMS):
+            part = keys[start:start + _MAX_PARAMS]
+            placeholders = ",".join("?" * len(part))
+            sizes.update(self._conn.execute(
+                f"SELECT key, size FROM entries WHERE key IN ({placeholders})", part
+            ).fetchall())
+        return sizes
+
+    def _cutoff(self) -> float:
+        """Creation time before which entries have expired."""
+        return time.time() - self.max_age if self.max_age is not None else float("-inf")
+
+    def _evict(self) -> None:
+        if self.max_age is not None:
+            with self._conn:
+                expired = self._conn.execute("DELETE FROM entries WHERE created < ?", (self._cutoff(),)).rowcount
+            if expired:
+                self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if self.max_bytes is None or self._total <= self.max_bytes:
+            return
+        excess = self._total - self.max_bytes
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed, rowid"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self._conn:
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
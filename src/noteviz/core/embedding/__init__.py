@@ -2,10 +2,16 @@
 Embedding module for NoteViz.
 """
 from .base import EmbeddingService, EmbeddingConfig
+from .cache import CachedEmbeddingService, EmbeddingCache
+from .dedup import DeduplicatingEmbeddingService, find_near_duplicates
 from .openai import OpenAIEmbeddingService
 
 __all__ = [
     "EmbeddingService",
     "EmbeddingConfig",
     "OpenAIEmbeddingService",
+    "EmbeddingCache",
+    "CachedEmbeddingService",
+    "DeduplicatingEmbeddingService",
+    "find_near_duplicates",
 ]
@@ -2,8 +2,9 @@
 Base interface for embedding services.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any
+from typing import Any, Dict, List, Optional
 
+import numpy as np
 from pydantic import BaseModel, Field
 
 
@@ -12,6 +13,13 @@ class EmbeddingConfig(BaseModel):
     model_name: str = Field(..., description="Name of the embedding model to use")
     device: str = Field(default="cpu", pattern="^(cpu|cuda)$", description="Device to run the model on")
     batch_size: int = Field(default=32, gt=0, description="Batch size for processing")
+    dimensions: Optional[int] = Field(default=None, gt=0, description="Output vector size, if the model supports shortening")
+    max_tokens_per_request: int = Field(
+        default=250_000, gt=0, description="Maximum estimated input tokens per embedding request"
+    )
+    max_concurrency: int = Field(default=1, gt=0, description="Maximum number of requests in flight at once")
+    requests_per_minute: Optional[int] = Field(default=None, gt=0, description="Request rate limit, if any")
+    tokens_per_minute: Optional[int] = Field(default=None, gt=0, description="Input token rate limit, if any")
 
 
 class EmbeddingService(ABC):
@@ -32,6 +40,20 @@ class EmbeddingService(ABC):
         """
         pass
     
+    async def generate_embedding_matrix(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings as a contiguous float32 matrix.
+        
+        Services that can decode vectors without intermediate Python floats
+        should override this; the default converts ``generate_embeddings``.
+        
+        Args:
+            texts: List of text strings to generate embeddings for.
+            
+        Returns:
+            Array of shape ``(len(texts), dimensions)`` and dtype float32.
+        """
+        return np.asarray(await self.generate_embeddings(texts), dtype=np.float32)
+    
     @abstractmethod
     async def get_model_info(self) -> dict:
         """Get information about the embedding model.
@@ -0,0 +1,54 @@
+"""
+Request batching for embedding services.
+"""
+from dataclasses import dataclass, field
+from typing import List
+
+from ..tokens import estimate_tokens
+
+
+@dataclass
+class EmbeddingBatch:
+    """A group of texts sent to the embedding API in a single request."""
+
+    indices: List[int] = field(default_factory=list)
+    """Positions of the batched texts in the original input list."""
+
+    texts: List[str] = field(default_factory=list)
+    """Texts included in the request, in request order."""
+
+    tokens: int = 0
+    """Estimated number of input tokens in the request."""
+
+
+def plan_batches(texts: List[str], batch_size: int, max_tokens: int) -> List[EmbeddingBatch]:
+    """Pack texts into multi-input requests.
+
+    Texts are packed greedily in their original order. A batch is closed when
+    adding the next text would exceed either ``batch_size`` inputs or
+    ``max_tokens`` estimated tokens. A single text larger than ``max_tokens``
+    is sent on its own so the API can report the error for that input.
+
+    Args:
+        texts: Texts to embed.
+        batch_size: Maximum number of inputs per request.
+        max_tokens: Maximum number of estimated tokens per request.
+
+    Returns:
+        List of batches covering every text exactly once.
+    """
+    batches: List[EmbeddingBatch] = []
+    current = EmbeddingBatch()
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current.indices and (
+            len(current.indices) >= batch_size or current.tokens + tokens > max_tokens
+        ):
+            batches.append(current)
+            current = EmbeddingBatch()
+        current.indices.append(i)
+        current.texts.append(text)
+        current.tokens += tokens
+    if current.indices:
+        batches.append(current)
+    return batches
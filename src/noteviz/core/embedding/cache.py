@@ -0,0 +1,144 @@
+"""
+Persistent, content-addressed cache for embedding vectors.
+"""
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from ..cache import LRUStore
+from .base import EmbeddingService
+
+
+class EmbeddingCache:
+    """Disk cache mapping (model, dimensions, text) to a float32 vector."""
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None):
+        self.store = LRUStore(path, max_bytes=max_bytes)
+
+    @staticmethod
+    def key(model_name: str, dimensions: Optional[int], text: str) -> str:
+        """Build the content-addressed key for one text.
+
+        Args:
+            model_name: Name of the embedding model.
+            dimensions: Requested vector size, or None for the model default.
+            text: Text that was embedded.
+
+        Returns:
+            Hex digest identifying the vector.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{model_name}\0{dimensions or ''}\0".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors for the keys that are present."""
+        return {
+            key: np.frombuffer(blob, dtype=np.float32)
+            for key, blob in self.store.get_many(keys).items()
+        }
+
+    def put_many(self, vectors: Dict[str, Union[List[float], np.ndarray]]) -> None:
+        """Store vectors as float32 blobs."""
+        self.store.put_many(
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in vectors.items()
+        )
+
+
+class CachedEmbeddingService(EmbeddingService):
+    """Embedding service wrapper that serves repeated texts from an EmbeddingCache.
+
+    Only texts that are not cached are forwarded to the wrapped service, each
+    distinct text at most once per call.
+    """
+
+    def __init__(self, service: EmbeddingService, cache: EmbeddingCache):
+        super().__init__(service.config)
+        self.service = service
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings, reusing cached vectors where possible.
+
+        Args:
+            texts: List of text strings to generate embeddings for.
+
+        Returns:
+            List of embedding vectors, in the same order as ``texts``.
+        """
+        if not texts:
+            raise ValueError("No texts provided for embedding generation")
+
+        keys = [
+            EmbeddingCache.key(self.config.model_name, self.config.dimensions, text)
+            for text in texts
+        ]
+        cached = {key: vector.tolist() for key, vector in self.cache.get_many(keys).items()}
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            fresh = await self.service.generate_embeddings(list(missing.values()))
+            if len(fresh) != len(missing):
+                raise ValueError(
+                    f"Expected {len(missing)} embeddings from wrapped service, got {len(fresh)}"
+                )
+            fresh_vectors = dict(zip(missing, fresh))
+            self.cache.put_many(fresh_vectors)
+            # Round through float32 as the cache stores it, so cold and warm runs agree
+            cached.update(
+                (key, np.asarray(vector, dtype=np.float32).tolist()) for key, vector in fresh_vectors.items()
+            )
+        return [cached[key] for key in keys]
+
+    async def generate_embedding_matrix(self, texts: List[str]) -> np.ndarray:
+        """Generate a float32 embedding matrix, reusing cached vectors where possible.
+
+        Cached blobs are copied straight into the output rows, so no Python
+        floats are created for hits.
+
+        Args:
+            texts: List of text strings to generate embeddings for.
+
+        Returns:
+            Array of shape ``(len(texts), dimensions)`` and dtype float32.
+        """
+        if not texts:
+            raise ValueError("No texts provided for embedding generation")
+
+        keys = [
+            EmbeddingCache.key(self.config.model_name, self.config.dimensions, text)
+            for text in texts
+        ]
+        cached = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            fresh = await self.service.generate_embedding_matrix(list(missing.values()))
+            if len(fresh) != len(missing):
+                raise ValueError(
+                    f"Expected {len(missing)} embeddings from wrapped service, got {len(fresh)}"
+                )
+            fresh_vectors = dict(zip(missing, fresh))
+            self.cache.put_many(fresh_vectors)
+            cached.update(fresh_vectors)
+
+        matrix = np.empty((len(texts), len(cached[keys[0]])), dtype=np.float32)
+        for row, key in enumerate(keys):
+            matrix[row] = cached[key]
+        return matrix
+
+    async def get_model_info(self) -> dict:
+        """Get information about the wrapped model and the cache counters."""
+        info = await self.service.get_model_info()
+        info["cache"] = {"hits": self.hits, "misses": self.misses}
+        return info
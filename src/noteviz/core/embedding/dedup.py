@@ -0,0 +1,239 @@
+"""
+Near-duplicate detection for texts sent to embedding services.
+
+Texts are compared by MinHash signatures of their word shingles, and
+candidate pairs are found with locality-sensitive hashing (LSH) over bands
+of the signatures, so the cost grows linearly with the number of texts
+rather than with the number of pairs.
+"""
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from ..tokens import estimate_total_tokens
+from .base import EmbeddingService
+from .batching import plan_batches
+
+# Mersenne prime 2**31 - 1; products of 31-bit values fit in uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str, shingle_size: int = 3) -> np.ndarray:
+    """Hash the overlapping word n-grams of a text.
+
+    Words are lowercased, so case and punctuation do not affect the result.
+    A text with fewer words than ``shingle_size`` becomes a single shingle.
+
+    Args:
+        text: Text to shingle.
+        shingle_size: Number of words per shingle.
+
+    Returns:
+        Distinct 31-bit shingle hashes as a uint64 array.
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    count = max(1, len(words) - shingle_size + 1)
+    hashes = {
+        zlib.crc32(" ".join(words[i:i + shingle_size]).encode("utf-8")) & 0x7FFFFFFF
+        for i in range(count)
+    }
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def minhash_signatures(
+    texts: List[str], num_perm: int = 128, shingle_size: int = 3, seed: int = 0
+) -> np.ndarray:
+    """Compute MinHash signatures using universal hashes ``(a * x + b) mod p``.
+
+    Args:
+        texts: Texts to sign.
+        num_perm: Number of hash functions, i.e. signature length.
+        shingle_size: Number of words per shingle.
+        seed: Seed of the hash function coefficients.
+
+    Returns:
+        Array of shape ``(len(texts), num_perm)``; the fraction of equal
+        entries of two rows estimates the Jaccard similarity of the texts.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for row, text in enumerate(texts):
+        shingles = shingle_hashes(text, shingle_size)
+        signatures[row] = ((a * shingles + b) % _PRIME).min(axis=1)
+    return signatures
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Choose the LSH band layout whose similarity cut-off is closest to ``threshold``.
+
+    Two texts with Jaccard similarity ``s`` share a bucket with probability
+    ``1 - (1 - s**rows)**bands``, which rises steeply around
+    ``(1 / bands) ** (1 / rows)``.
+
+    Args:
+        num_perm: Signature length.
+        threshold: Target Jaccard similarity.
+
+    Returns:
+        Number of bands and rows per band, with ``bands * rows == num_perm``.
+    """
+    layouts = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(layouts, key=lambda layout: abs((1 / layout[0]) ** (1 / layout[1]) - threshold))
+
+
+def find_near_duplicates(
+    texts: List[str], threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 3
+) -> List[int]:
+    """Map every text to the canonical text it duplicates.
+
+    Texts are visited in order; a text whose estimated Jaccard similarity
+    to an earlier canonical text in one of its LSH buckets is at least
+    ``threshold`` maps to that text, and otherwise becomes canonical itself.
+    Comparing against canonical texts only keeps similarity from chaining
+    across a group.
+
+    Args:
+        texts: Texts to compare.
+        threshold: Minimum estimated Jaccard similarity of word shingles.
+        num_perm: Signature length; longer signatures estimate more precisely.
+        shingle_size: Number of words per shingle.
+
+    Returns:
+        For each text, the index of its canonical text (its own index if it
+        has no earlier near-duplicate).
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be between 0 and 1")
+    signatures = minhash_signatures(texts, num_perm, shingle_size)
+    bands, rows = lsh_bands(num_perm, threshold)
+    buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+    canonical = []
+    for index, signature in enumerate(signatures):
+        keys = [signature[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+        candidates = {
+            candidate for band, key in enumerate(keys) for candidate in buckets[band].get(key, ())
+        }
+        match = next(
+            (
+                candidate for candidate in sorted(candidates)
+                if np.mean(signatures[candidate] == signature) >= threshold
+            ),
+            None,
+        )
+        if match is not None:
+            canonical.append(match)
+            continue
+        canonical.append(index)
+        for band, key in enumerate(keys):
+            buckets[band][key].append(index)
+    return canonical
+
+
+class DeduplicatingEmbeddingService(EmbeddingService):
+    """Embedding service wrapper that embeds each group of near-duplicate texts once.
+
+    Every near-duplicate receives the vector of its canonical text, so the
+    result still has one row per input. Callers that keep an index use
+    ``embed_canonical`` instead, index the canonical rows only and keep the
+    returned mapping to resolve a hit back to every occurrence.
+    """
+
+    def __init__(
+        self,
+        service: EmbeddingService,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        shingle_size: int = 3,
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be between 0 and 1")
+        super().__init__(service.config)
+        self.service = service
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.duplicates = 0
+        self.tokens_saved = 0
+        self.requests_saved = 0
+
+    def _deduplicate(self, texts: List[str]) -> Tuple[List[str], List[int]]:
+        """Return the canonical texts and each input's row among them, updating the counters."""
+        canonical = find_near_duplicates(texts, self.threshold, self.num_perm, self.shingle_size)
+        rows: Dict[int, int] = {}
+        for index, target in enumerate(canonical):
+            if target == index:
+                rows[index] = len(rows)
+        unique = [texts[index] for index in rows]
+        skipped = [text for index, text in enumerate(texts) if index not in rows]
+
+        self.duplicates += len(skipped)
+        self.tokens_saved += estimate_total_tokens(skipped)
+        if skipped:
+            limits = (self.config.batch_size, self.config.max_tokens_per_request)
+            self.requests_saved += len(plan_batches(texts, *limits)) - len(plan_batches(unique, *limits))
+        return unique, [rows[target] for target in canonical]
+
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings, embedding each group of near-duplicates once.
+
+        Args:
+            texts: List of text strings to generate embeddings for.
+
+        Returns:
+            List of embedding vectors, in the same order as ``texts``.
+        """
+        if not texts:
+            raise ValueError("No texts provided for embedding generation")
+        unique, rows = self._deduplicate(texts)
+        vectors = await self.service.generate_embeddings(unique)
+        if len(vectors) != len(unique):
+            raise ValueError(f"Expected {len(unique)} embeddings from wrapped service, got {len(vectors)}")
+        return [vectors[row] for row in rows]
+
+    async def generate_embedding_matrix(self, texts: List[str]) -> np.ndarray:
+        """Generate a float32 embedding matrix, embedding each group of near-duplicates once.
+
+        Args:
+            texts: List of text strings to generate embeddings for.
+
+        Returns:
+            Array of shape ``(len(texts), dimensions)`` and dtype float32.
+        """
+        matrix, rows = await self.embed_canonical(texts)
+        return matrix[rows]
+
+    async def embed_canonical(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """Embed only the canonical text of each group of near-duplicates.
+
+        Args:
+            texts: List of text strings to generate embeddings for.
+
+        Returns:
+            A float32 matrix with one row per canonical text, in input
+            order, and the row of each input's canonical text. The first
+            input mapped to a row is the canonical text itself.
+        """
+        if not texts:
+            raise ValueError("No texts provided for embedding generation")
+        unique, rows = self._deduplicate(texts)
+        matrix = await self.service.generate_embedding_matrix(unique)
+        if len(matrix) != len(unique):
+            raise ValueError(f"Expected {len(unique)} embeddings from wrapped service, got {len(matrix)}")
+        return matrix, rows
+
+    async def get_model_info(self) -> dict:
+        """Get information about the wrapped model and the deduplication counters."""
+        info = await self.service.get_model_info()
+        info["dedup"] = {
+            "duplicates": self.duplicates,
+            "tokens_saved": self.tokens_saved,
+            "requests_saved": self.requests_saved,
+        }
+        return info
@@ -1,10 +1,17 @@
 """
 OpenAI implementation of the embedding service.
 """
-from typing import Dict, List, Optional
+import asyncio
+import base64
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
 from openai import AsyncOpenAI
 
 from .base import EmbeddingConfig, EmbeddingService
+from .batching import EmbeddingBatch, plan_batches
+from .scheduler import EmbeddingStats, RateLimiter
 
 
 class OpenAIEmbeddingConfig(EmbeddingConfig):
@@ -19,32 +26,132 @@ class OpenAIEmbeddingService(EmbeddingService):
     def __init__(self, config: EmbeddingConfig, client: Optional[AsyncOpenAI] = None):
         super().__init__(config)
         self.client = client or AsyncOpenAI()
+        self.rate_limiter = RateLimiter(config.requests_per_minute, config.tokens_per_minute)
+        self.stats = EmbeddingStats()
     
     async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings using OpenAI's API.
         
+        Texts are packed into multi-input requests of at most
+        ``config.batch_size`` inputs and ``config.max_tokens_per_request``
+        estimated tokens each. Up to ``config.max_concurrency`` requests are
+        kept in flight, subject to the configured rate limits.
+        
         Args:
             texts: List of text strings to generate embeddings for.
             
         Returns:
-            List of embedding vectors.
+            List of embedding vectors, in the same order as ``texts``.
         """
+        # Every slot is filled by ``_dispatch``, which raises if a batch fails
+        embeddings: List[List[float]] = [[] for _ in texts]
+        
+        def store(batch: EmbeddingBatch, items: List[Any]) -> None:
+            for i, item in zip(batch.indices, items):
+                embeddings[i] = item.embedding
+        
+        await self._dispatch(texts, store)
+        return embeddings
+    
+    async def generate_embedding_matrix(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings as a contiguous float32 matrix.
+        
+        Vectors are requested in base64 encoding and decoded directly into
+        rows of a preallocated matrix, without building Python floats.
+        
+        Args:
+            texts: List of text strings to generate embeddings for.
+            
+        Returns:
+            Array of shape ``(len(texts), dimensions)`` and dtype float32.
+        """
+        matrix: Optional[np.ndarray] = None
+        
+        def store(batch: EmbeddingBatch, items: List[Any]) -> None:
+            nonlocal matrix
+            for i, item in zip(batch.indices, items):
+                vector = _decode_embedding(item.embedding)
+                if matrix is None:
+                    matrix = np.empty((len(texts), vector.shape[0]), dtype=np.float32)
+                matrix[i] = vector
+        
+        await self._dispatch(texts, store, encoding_format="base64")
+        # ``_dispatch`` raises on empty input and stores every row otherwise
+        assert matrix is not None
+        return matrix
+    
+    async def _dispatch(
+        self,
+        texts: List[str],
+        store: Callable[[EmbeddingBatch, List[Any]], None],
+        **request_kwargs: Any
+    ) -> None:
+        """Batch ``texts``, send the requests and pass each response to ``store``."""
         if not texts:
             raise ValueError("No texts provided for embedding generation")
             
-        embeddings = []
-        for text in texts:
-            response = await self.client.embeddings.create(
-                model=self.config.model_name,
-                input=text
+        batches = plan_batches(texts, self.config.batch_size, self.config.max_tokens_per_request)
+        semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        
+        async def dispatch(batch: EmbeddingBatch) -> None:
+            async with semaphore:
+                await self.rate_limiter.acquire(batch.tokens)
+                self.stats.request_started()
+                try:
+                    items = await self._embed_batch(batch, **request_kwargs)
+                finally:
+                    self.stats.request_ended()
+                self.stats.record(len(batch.texts), batch.tokens)
+            store(batch, items)
+        
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(dispatch(batch)) for batch in batches]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the remaining batches instead of leaving them running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            self.stats.elapsed_seconds += time.perf_counter() - start
+    
+    async def _embed_batch(self, batch: EmbeddingBatch, **request_kwargs: Any) -> List[Any]:
+        """Send one multi-input request and return its data items in request order."""
+        if self.config.dimensions:
+            request_kwargs["dimensions"] = self.config.dimensions
+        response = await self.client.embeddings.create(
+            model=self.config.model_name,
+            input=batch.texts,
+            **request_kwargs
+        )
+        if len(response.data) != len(batch.texts):
+            raise ValueError(
+                f"Expected {len(batch.texts)} embeddings in response, got {len(response.data)}"
             )
-            embeddings.append(response.data[0].embedding)
-        return embeddings
+        
+        # The API tags each item with the position of its input; fall back to
+        # response order when the tags are missing or inconsistent.
+        order = [getattr(item, "index", None) for item in response.data]
+        if sorted(i for i in order if isinstance(i, int)) != list(range(len(order))):
+            order = list(range(len(order)))
+        items: List[Any] = [None] * len(response.data)
+        for index, item in zip(order, response.data):
+            items[index] = item
+        return items
     
     async def get_model_info(self) -> dict:
         """Get information about the OpenAI embedding model."""
         return {
             "provider": "OpenAI",
             "model": self.config.model_name,
-            "dimensions": 1536  # OpenAI's embedding dimension
-        } 
\ No newline at end of file
+            "dimensions": self.config.dimensions or 1536  # OpenAI's default embedding dimension
+        } 
+
+
+def _decode_embedding(embedding: Union[str, List[float]]) -> np.ndarray:
+    """Decode a base64 float32 embedding, accepting plain float lists as well."""
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+    return np.asarray(embedding, dtype=np.float32)
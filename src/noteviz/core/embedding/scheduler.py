@@ -0,0 +1,126 @@
+"""
+Concurrency and rate limiting for embedding requests.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at a per-minute rate.
+
+    The bucket starts full, so up to ``capacity`` units can be spent in a
+    burst before callers have to wait for the refill.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be greater than 0")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else float(rate_per_minute)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until ``amount`` units are available and consume them.
+
+        Requests larger than the bucket capacity are clamped to the capacity
+        so that they wait for a full bucket instead of blocking forever.
+
+        Args:
+            amount: Number of units to consume.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        amount = min(amount, self.capacity)
+        # Waiters queue on the lock so tokens are granted in arrival order
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """Combined requests-per-minute and tokens-per-minute limiter."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one request carrying ``tokens`` tokens may be sent.
+
+        Args:
+            tokens: Estimated input tokens of the request.
+        """
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(tokens)
+
+
+@dataclass
+class EmbeddingStats:
+    """Throughput counters for an embedding service."""
+
+    requests: int = 0
+    """Number of completed API requests."""
+
+    texts: int = 0
+    """Number of texts embedded by those requests."""
+
+    tokens: int = 0
+    """Estimated input tokens sent."""
+
+    in_flight: int = 0
+    """Requests currently awaiting a response."""
+
+    peak_concurrency: int = 0
+    """Largest number of requests that were in flight at the same time."""
+
+    elapsed_seconds: float = 0.0
+    """Wall-clock time spent inside ``generate_embeddings`` calls."""
+
+    @property
+    def texts_per_second(self) -> float:
+        """Embedded texts per second of wall-clock time."""
+        return self.texts / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Estimated tokens per second of wall-clock time."""
+        return self.tokens / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def request_started(self) -> None:
+        """Record that a request was sent."""
+        self.in_flight += 1
+        self.peak_concurrency = max(self.peak_concurrency, self.in_flight)
+
+    def request_ended(self) -> None:
+        """Record that a request returned, successfully or not."""
+        self.in_flight -= 1
+
+    def record(self, texts: int, tokens: int) -> None:
+        """Record the texts and tokens of a successful request."""
+        self.requests += 1
+        self.texts += texts
+        self.tokens += tokens
+
+    def reset(self) -> None:
+        """Reset all counters except requests currently in flight."""
+        in_flight = self.in_flight
+        self.__init__()
+        self.in_flight = in_flight
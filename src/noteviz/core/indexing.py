@@ -0,0 +1,395 @@
+"""
+Incremental indexing of revised PDF documents.
+
+A ``DocumentIndexer`` keeps a persisted retrieval index in step with one
+PDF. Each run fingerprints the pages and compares them with the manifest
+of the previous run; only pages whose fingerprint is new are extracted,
+only pages whose normalized text changed are chunked and embedded, the
+chunks of pages that disappeared are removed, and the existing index is
+patched instead of rebuilt.
+
+An indexer directory contains:
+
+- ``index/``: the retrieval index, as written by ``RetrievalService.save``.
+- ``pages/``: ``pages.json`` with the file key, chunking settings, page
+  fingerprints, normalized text hashes, chunk ids, near-duplicate aliases
+  and the PDF outline, plus the extracted page texts in the retrieval
+  storage text layout.
+"""
+import asyncio
+import hashlib
+import json
+import shutil
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .embedding import DeduplicatingEmbeddingService, EmbeddingService
+from .pdf import ChunkSpan, DocumentText, ExtractionCache, OutlineEntry, PDFProcessor
+from .retrieval import RetrievalService
+from .retrieval.storage import index_writer, load_texts, save_texts
+
+MANIFEST_FILE = "pages.json"
+MANIFEST_VERSION = 4
+
+
+@dataclass
+class PageRecord:
+    """What the previous run stored about one page."""
+
+    fingerprint: str
+    """Fingerprint returned by ``PDFProcessor.fingerprint_pages``."""
+
+    chunk_ids: List[str] = field(default_factory=list)
+    """Ids of the page's chunks in the retrieval index."""
+
+    text_hash: str = ""
+    """Hash of the normalized page text the chunks were cut from."""
+
+
+@dataclass
+class IndexUpdate:
+    """Outcome of ``DocumentIndexer.update``."""
+
+    document: DocumentText
+    """Full text of the current revision."""
+
+    changed_pages: List[int]
+    """Pages that were chunked and embedded in this run."""
+
+    extracted_pages: List[int] = field(default_factory=list)
+    """Pages whose text was extracted in this run."""
+
+    chunks_added: int = 0
+    """Number of chunks embedded and added to the index."""
+
+    chunks_removed: int = 0
+    """Number of chunks of vanished pages removed from the index."""
+
+    chunks_reused: int = 0
+    """Number of chunks kept from the previous run."""
+
+    chunks_aliased: int = 0
+    """Number of added chunks recorded as near-duplicates instead of getting a row."""
+
+    outline: List[OutlineEntry] = field(default_factory=list)
+    """Outline of the current revision, for splitting it into sections."""
+
+    @property
+    def num_pages(self) -> int:
+        """Number of pages in the current revision."""
+        return self.document.num_pages
+
+    @property
+    def unchanged(self) -> bool:
+        """Whether the index was already up to date."""
+        return not self.changed_pages and not self.chunks_removed
+
+
+def diff_pages(
+    previous: Sequence[str], current: Sequence[str]
+) -> Tuple[Dict[int, int], List[int]]:
+    """Match the pages of two revisions by fingerprint.
+
+    Pages may move; a repeated fingerprint is matched in page order.
+
+    Args:
+        previous: Page fingerprints of the previous revision.
+        current: Page fingerprints of the current revision.
+
+    Returns:
+        Mapping from each current page with a match to its previous page,
+        and the previous pages without a match.
+    """
+    positions: Dict[str, List[int]] = defaultdict(list)
+    for page, fingerprint in enumerate(previous):
+        positions[fingerprint].append(page)
+    for pages in positions.values():
+        pages.reverse()
+
+    matches = {}
+    for page, fingerprint in enumerate(current):
+        if positions.get(fingerprint):
+            matches[page] = positions[fingerprint].pop()
+    matched = set(matches.values())
+    return matches, [page for page in range(len(previous)) if page not in matched]
+
+
+class DocumentIndexer:
+    """Keeps a persisted retrieval index up to date with revisions of one PDF.
+
+    Chunks never cross page boundaries, so unchanged pages keep their
+    chunks, embeddings and chunk ids across revisions. The processor must
+    support sessions with page fingerprints, and the retrieval service must
+    support ``add``, ``remove``, ``save`` and ``load``. With a
+    ``DeduplicatingEmbeddingService``, near-duplicate chunks share their
+    canonical chunk's row; ``occurrences`` expands a hit to all of them.
+    """
+
+    def __init__(
+        self,
+        processor: PDFProcessor,
+        embedding_service: EmbeddingService,
+        retrieval: RetrievalService,
+        directory: Path,
+    ):
+        self.processor = processor
+        self.embedding_service = embedding_service
+        self.retrieval = retrieval
+        self.directory = Path(directory)
+        # Ids of near-duplicate chunks without a row, mapped to their canonical chunk's id
+        self.aliases: Dict[str, str] = {}
+
+    @property
+    def settings(self) -> Dict[str, object]:
+        """Settings that invalidate the stored chunks when they change."""
+        return {
+            "chunker": self.processor.config.chunker,
+            "chunk_size": self.processor.config.chunk_size,
+            "chunk_overlap": self.processor.config.chunk_overlap,
+            "chunk_tokens": self.processor.config.chunk_tokens,
+            "chunk_overlap_tokens": self.processor.config.chunk_overlap_tokens,
+            "strip_boilerplate": self.processor.config.strip_boilerplate,
+            "boilerplate_min_fraction": self.processor.config.boilerplate_min_fraction,
+            "embedding_model": self.embedding_service.config.model_name,
+            "embedding_dimensions": self.embedding_service.config.dimensions,
+        }
+
+    async def update(self, pdf_path: Path) -> IndexUpdate:
+        """Bring the index up to date with the current content of a PDF.
+
+        Args:
+            pdf_path: Path to the PDF file.
+
+        Returns:
+            The current document text and what changed.
+        """
+        pdf_path = Path(pdf_path)
+        file_key = await asyncio.to_thread(ExtractionCache.key, pdf_path)
+        previous = self._load_previous()
+        if previous is not None and previous.file_key == file_key:
+            self.aliases = previous.aliases
+            return IndexUpdate(
+                DocumentText(pdf_path.name, self.processor.normalize_pages(previous.page_texts)),
+                changed_pages=[],
+                chunks_reused=sum(len(record.chunk_ids) for record in previous.records),
+                outline=previous.outline,
+            )
+
+        records = previous.records if previous is not None else []
+        old_texts = previous.page_texts if previous is not None else []
+        old_aliases = previous.aliases if previous is not None else {}
+        with self.processor.open(pdf_path) as session:
+            outline = session.outline()
+            fingerprints = await session.fingerprint_pages()
+            matches, vanished = diff_pages([record.fingerprint for record in records], fingerprints)
+            extract = [page for page in range(len(fingerprints)) if page not in matches]
+            extracted = await session.extract_pages(
+                None if len(extract) == len(fingerprints) else extract
+            )
+        fresh = dict(zip(extract, extracted))
+        page_texts = [
+            fresh[page] if page in fresh else old_texts[matches[page]]
+            for page in range(len(fingerprints))
+        ]
+        # Boilerplate is detected across pages, so an unchanged page's
+        # normalized text can still change; such pages are re-chunked too
+        normalized = self.processor.normalize_pages(page_texts)
+        document = DocumentText(pdf_path.name, normalized)
+        hashes = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in normalized]
+        kept = {
+            page: previous_page for page, previous_page in matches.items()
+            if records[previous_page].text_hash == hashes[page]
+        }
+        vanished = sorted(vanished + [page for page in matches.values() if page not in kept.values()])
+        removed = [chunk_id for page in vanished for chunk_id in records[page].chunk_ids]
+        removed_set = set(removed)
+        aliases = {
+            chunk_id: canonical for chunk_id, canonical in old_aliases.items() if chunk_id not in removed_set
+        }
+        # Kept duplicates of a removed canonical chunk lose their row and are embedded again
+        orphans = {chunk_id for chunk_id, canonical in aliases.items() if canonical in removed_set}
+
+        used_ids: Set[str] = {
+            chunk_id for page in kept.values() for chunk_id in records[page].chunk_ids
+        }
+        reused = len(used_ids) - len(orphans)
+        new_records = []
+        changed = []
+        texts: List[str] = []
+        ids: List[str] = []
+        for page, fingerprint in enumerate(fingerprints):
+            if page in kept:
+                page_ids = records[kept[page]].chunk_ids
+                new_records.append(PageRecord(fingerprint, page_ids, hashes[page]))
+                if orphans.intersection(page_ids):
+                    spans = self._page_spans(document, page)
+                    for chunk_id, span in zip(page_ids, spans):
+                        if chunk_id in orphans:
+                            texts.append(span.text)
+                            ids.append(chunk_id)
+                            del aliases[chunk_id]
+                continue
+            spans = self._page_spans(document, page)
+            page_ids = _chunk_ids(fingerprint, len(spans), used_ids)
+            new_records.append(PageRecord(fingerprint, page_ids, hashes[page]))
+            changed.append(page)
+            texts.extend(span.text for span in spans)
+            ids.extend(page_ids)
+
+        row_texts, embeddings, row_ids = await self._embed(texts, ids, aliases)
+        if all(chunk_id in old_aliases for chunk_id in _all_ids(records)):
+            if row_texts:
+                self.retrieval.index(row_texts, embeddings, ids=row_ids)
+            elif previous is None:
+                raise ValueError(f"No text extracted from {pdf_path}")
+        else:
+            removed_rows = [chunk_id for chunk_id in removed if chunk_id not in old_aliases]
+            if removed_rows:
+                self.retrieval.remove(removed_rows)
+            self.retrieval.add(row_texts, embeddings, ids=row_ids)
+
+        if any(chunk_id not in aliases for chunk_id in _all_ids(new_records)):
+            self.retrieval.save(self.directory / "index")
+        else:
+            # An index cannot be saved empty; the manifest alone records a revision without text
+            shutil.rmtree(self.directory / "index", ignore_errors=True)
+        self._save_manifest(_PreviousRun(file_key, new_records, page_texts, outline, aliases))
+        self.aliases = aliases
+        return IndexUpdate(
+            document,
+            changed_pages=changed,
+            extracted_pages=extract,
+            chunks_added=len(texts),
+            chunks_removed=len(removed),
+            chunks_reused=reused,
+            chunks_aliased=len(ids) - len(row_ids),
+            outline=outline,
+        )
+
+    def occurrences(self, chunk_id: str) -> List[str]:
+        """Resolve a chunk id returned by the index to every chunk it stands for.
+
+        Args:
+            chunk_id: Id of an indexed chunk.
+
+        Returns:
+            The id followed by the ids of its near-duplicates, which have no
+            row of their own.
+        """
+        return [chunk_id] + [alias for alias, canonical in self.aliases.items() if canonical == chunk_id]
+
+    def _page_spans(self, document: DocumentText, page: int) -> List[ChunkSpan]:
+        """Cut the chunks of one page."""
+        return self.processor.chunk_range(document, document.page_offsets[page], document.page_offsets[page + 1])
+
+    async def _embed(
+        self, texts: List[str], ids: List[str], aliases: Dict[str, str]
+    ) -> Tuple[List[str], np.ndarray, List[str]]:
+        """Embed new chunks, returning the texts, embeddings and ids of the rows to add.
+
+        With a ``DeduplicatingEmbeddingService`` only canonical chunks get a
+        row; their near-duplicates are recorded in ``aliases``.
+        """
+        if not texts:
+            return [], np.empty((0, 0), dtype=np.float32), []
+        if not isinstance(self.embedding_service, DeduplicatingEmbeddingService):
+            return texts, await self.embedding_service.generate_embedding_matrix(texts), ids
+        matrix, rows = await self.embedding_service.embed_canonical(texts)
+        canonical: Dict[int, int] = {}
+        for index, row in enumerate(rows):
+            if canonical.setdefault(row, index) != index:
+                aliases[ids[index]] = ids[canonical[row]]
+        keep = sorted(canonical.values())
+        return [texts[index] for index in keep], matrix, [ids[index] for index in keep]
+
+    def _load_previous(self) -> Optional["_PreviousRun"]:
+        """Load the previous run's manifest and index, or None to start over."""
+        pages_dir = self.directory / "pages"
+        manifest_path = pages_dir / MANIFEST_FILE
+        if not manifest_path.exists():
+            return None
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != self.settings:
+            return None
+        previous = _PreviousRun(
+            file_key=manifest["file_key"],
+            records=[
+                PageRecord(page["fingerprint"], page["chunk_ids"], page["text_hash"])
+                for page in manifest["pages"]
+            ],
+            page_texts=load_texts(pages_dir),
+            outline=[OutlineEntry(title, page, level) for title, page, level in manifest["outline"]],
+            aliases=manifest["aliases"],
+        )
+        if len(previous.page_texts) != len(previous.records):
+            return None
+        expected = {
+            chunk_id for chunk_id in _all_ids(previous.records) if chunk_id not in previous.aliases
+        }
+        if not expected:
+            # No page had text, so no index was saved
+            return previous
+        try:
+            self.retrieval.load(self.directory / "index")
+        except (OSError, ValueError):
+            return None
+        # A crash between saving the index and the manifest leaves them out of step
+        if set(self.retrieval.ids) != expected:
+            return None
+        return previous
+
+    def _save_manifest(self, run: "_PreviousRun") -> None:
+        """Write the manifest and page texts for the next run."""
+        with index_writer(self.directory / "pages") as directory:
+            save_texts(directory, run.page_texts)
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "file_key": run.file_key,
+                "settings": self.settings,
+                "pages": [
+                    {
+                        "fingerprint": record.fingerprint,
+                        "chunk_ids": record.chunk_ids,
+                        "text_hash": record.text_hash,
+                    }
+                    for record in run.records
+                ],
+                "outline": [[entry.title, entry.page, entry.level] for entry in run.outline],
+                "aliases": run.aliases,
+            }
+            (directory / MANIFEST_FILE).write_text(json.dumps(manifest), encoding="utf-8")
+
+
+@dataclass
+class _PreviousRun:
+    """What one run stored for the next."""
+
+    file_key: str
+    records: List[PageRecord]
+    page_texts: Sequence[str]
+    outline: List[OutlineEntry]
+    aliases: Dict[str, str]
+
+
+def _all_ids(records: Sequence[PageRecord]) -> List[str]:
+    """Ids of the chunks of every page, in page order."""
+    return [chunk_id for record in records for chunk_id in record.chunk_ids]
+
+
+def _chunk_ids(fingerprint: str, count: int, used: Set[str]) -> List[str]:
+    """Derive ids for a page's chunks from its fingerprint, avoiding ``used`` ids.
+
+    Repeated pages, such as blank ones, share a fingerprint and get a
+    distinguishing occurrence number.
+    """
+    occurrence = 0
+    while True:
+        ids = [f"{fingerprint[:16]}.{occurrence}.{n}" for n in range(count)]
+        if not used.intersection(ids):
+            used.update(ids)
+            return ids
+        occurrence += 1
@@ -1,19 +1,28 @@
 """
 LLM module for NoteViz.
 """
-from .base import LLMConfig, Topic, BaseLLMService, Summarizer, TopicExtractor, LLMService
+from .base import AnalysisResult, LLMConfig, Topic, BaseLLMService, Summarizer, TopicExtractor, LLMService
+from .cache import CachedChatClient, ResponseCache, SummaryCache, bypass_response_cache
 from .config import SummarizerConfig, TopicExtractorConfig
+from .mapreduce import MapReduceSummarizer, SummaryStage
 from .openai import OpenAISummarizer, OpenAITopicExtractor, OpenAILLMService
 
 __all__ = [
     'LLMConfig',
     'Topic',
+    'AnalysisResult',
     'BaseLLMService',
     'Summarizer',
     'TopicExtractor',
     'LLMService',
     'SummarizerConfig',
     'TopicExtractorConfig',
+    'MapReduceSummarizer',
+    'SummaryStage',
+    'SummaryCache',
+    'ResponseCache',
+    'CachedChatClient',
+    'bypass_response_cache',
     'OpenAISummarizer',
     'OpenAITopicExtractor',
     'OpenAILLMService'
@@ -2,12 +2,17 @@
 Base interface for LLM services.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
 
 from pydantic import BaseModel
 
+from ..stages import StageResult, run_stages
 from .config import LLMConfig
 
+# Names of the analysis stages reported to ``on_result`` callbacks
+ANALYSIS_STAGES = ("topics", "summary", "key_concepts")
+
 
 class Topic:
     """Represents a topic extracted from text."""
@@ -18,6 +23,26 @@ class Topic:
         self.keywords = keywords
 
 
+@dataclass
+class AnalysisResult:
+    """Topics, summary and key concepts of one text."""
+    
+    topics: List[Topic]
+    """Main topics of the text."""
+    
+    summary: str
+    """Summary of the text."""
+    
+    key_concepts: List[str]
+    """Key concepts of the text."""
+    
+    combined: bool = True
+    """Whether all three came from a single request rather than separate ones."""
+    
+    errors: Dict[str, Exception] = field(default_factory=dict)
+    """Exceptions of the stages that failed, by stage name; their fields are left empty."""
+
+
 class BaseLLMService(ABC):
     """Base class for LLM services."""
     def __init__(self, config: LLMConfig):
@@ -83,12 +108,16 @@ class LLMService(ABC):
         pass
     
     @abstractmethod
-    async def generate_summary(self, text: str, max_length: Optional[int] = None) -> str:
+    async def generate_summary(
+        self, text: str, max_length: Optional[int] = None, sections: Optional[Sequence[str]] = None
+    ) -> str:
         """Generate a summary of the text.
         
         Args:
             text: Text to summarize.
             max_length: Maximum length of the summary.
+            sections: The text split into consecutive parts such as
+                chapters, which services may summarize independently.
             
         Returns:
             Generated summary.
@@ -106,4 +135,66 @@ class LLMService(ABC):
         Returns:
             List of key concepts.
         """
-        pass 
\ No newline at end of file
+        pass
+    
+    async def analyze(
+        self,
+        text: str,
+        num_topics: int = 5,
+        num_concepts: int = 5,
+        max_length: Optional[int] = None,
+        on_result: Optional[Callable[[StageResult], None]] = None,
+        sections: Optional[Sequence[str]] = None
+    ) -> AnalysisResult:
+        """Extract topics, a summary and key concepts from the text.
+        
+        The default implementation makes the three separate calls
+        concurrently; a failing call does not stop the others and is
+        recorded in ``errors``. Services that can answer all three in one
+        request override it.
+        
+        Args:
+            text: Text to analyze.
+            num_topics: Number of topics to extract.
+            num_concepts: Number of concepts to identify.
+            max_length: Maximum length of the summary.
+            on_result: Called with the result of each stage (named as in
+                ``ANALYSIS_STAGES``) as soon as it is available.
+            sections: The text split into consecutive parts such as
+                chapters, passed on to ``generate_summary``.
+            
+        Returns:
+            The combined analysis.
+        """
+        return await self._analyze_separately(
+            text, num_topics, num_concepts, self.generate_summary(text, max_length, sections), on_result
+        )
+    
+    async def _analyze_separately(
+        self,
+        text: str,
+        num_topics: int,
+        num_concepts: int,
+        summary: Awaitable[str],
+        on_result: Optional[Callable[[StageResult], None]]
+    ) -> AnalysisResult:
+        """Make the three separate analysis calls concurrently.
+        
+        Topics and key concepts are extracted from ``text``; ``summary``
+        is the summary call, awaited alongside them.
+        """
+        results = await run_stages(
+            {
+                "topics": self.extract_topics(text, num_topics),
+                "summary": summary,
+                "key_concepts": self.identify_key_concepts(text, num_concepts),
+            },
+            on_result
+        )
+        return AnalysisResult(
+            topics=results["topics"].value or [],
+            summary=results["summary"].value or "",
+            key_concepts=results["key_concepts"].value or [],
+            combined=False,
+            errors={name: result.error for name, result in results.items() if not result.ok}
+        )
@@ -0,0 +1,185 @@
+"""
+Persistent caches for LLM results.
+"""
+import contextvars
+import hashlib
+import json
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+
+from ..cache import LRUStore
+
+# Set while responses must be requested from the API rather than the cache
+_BYPASS = contextvars.ContextVar("noteviz_bypass_response_cache", default=False)
+
+
+class SummaryCache:
+    """Disk cache mapping summary tree node keys to summary text.
+
+    Node keys are built by ``MapReduceSummarizer`` from the request settings
+    and the keys of the node's children, so a node is only recomputed when
+    something beneath it changed.
+    """
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None):
+        self.store = LRUStore(path, max_bytes=max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Return the cached summaries for the keys that are present."""
+        keys = list(keys)
+        found = {key: blob.decode("utf-8") for key, blob in self.store.get_many(keys).items()}
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put(self, key: str, summary: str) -> None:
+        """Store the summary of one node."""
+        self.store.put(key, summary.encode("utf-8"))
+
+
+@contextmanager
+def bypass_response_cache() -> Iterator[None]:
+    """Send the requests made in this context to the API instead of the response cache.
+
+    The fresh responses still replace the cached ones. The setting follows
+    the context into tasks started within it, so it covers concurrent
+    requests made by one call::
+
+        with bypass_response_cache():
+            summary = await service.generate_summary(text)
+    """
+    token = _BYPASS.set(True)
+    try:
+        yield
+    finally:
+        _BYPASS.reset(token)
+
+
+class ResponseCache:
+    """Disk cache of chat completion responses, keyed by a fingerprint of the request.
+
+    The fingerprint covers the model, temperature, token limit, messages
+    and any other request options, so a request is only answered from the
+    cache when it is identical to an earlier one. Only complete responses
+    (``finish_reason == "stop"``) are stored, zlib-compressed with their
+    finish reason; callers that find a cached response unusable remove it
+    with ``discard``. Entries are evicted least recently used first beyond
+    ``max_bytes`` and expire ``max_age`` seconds after they were stored.
+    """
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None, max_age: Optional[float] = None):
+        self.store = LRUStore(path, max_bytes=max_bytes, max_age=max_age)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        """Build the fingerprint of a ``chat.completions.create`` request.
+
+        Args:
+            request: Keyword arguments of the request.
+
+        Returns:
+            Hex digest of the canonical JSON form of the request.
+        """
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return the cached response text and finish reason, or None on a miss."""
+        blob = self.store.get(key)
+        if blob is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry = json.loads(zlib.decompress(blob).decode("utf-8"))
+        return entry["content"], entry["finish_reason"]
+
+    def put(self, key: str, content: str, finish_reason: str = "stop") -> None:
+        """Store the response text and finish reason of one request."""
+        entry = json.dumps({"content": content, "finish_reason": finish_reason}, ensure_ascii=False)
+        self.store.put(key, zlib.compress(entry.encode("utf-8")))
+
+    def discard(self, request: Dict[str, Any]) -> None:
+        """Remove the cached response of a request, e.g. because it could not be parsed.
+
+        Args:
+            request: Keyword arguments of the request.
+        """
+        self.store.delete(self.key(request))
+
+    def wrap(self, client: Any) -> "CachedChatClient":
+        """Wrap an OpenAI client so its chat completions go through this cache."""
+        return CachedChatClient(client, self)
+
+
+class _CachedCompletions:
+    """``chat.completions`` of a ``CachedChatClient``."""
+
+    def __init__(self, completions: Any, cache: ResponseCache):
+        self._completions = completions
+        self._cache = cache
+
+    async def create(self, **request: Any) -> Any:
+        """Answer a chat completion request from the cache, or send it and cache a complete response."""
+        key = self._cache.key(request)
+        if not _BYPASS.get():
+            cached = self._cache.get(key)
+            if cached is not None:
+                content, finish_reason = cached
+                return ChatCompletion(
+                    id=f"cached-{key[:24]}",
+                    created=0,
+                    model=str(request.get("model", "")),
+                    object="chat.completion",
+                    choices=[Choice(
+                        index=0,
+                        finish_reason=finish_reason,
+                        message=ChatCompletionMessage(role="assistant", content=content),
+                    )],
+                )
+        response = await self._completions.create(**request)
+        choice = response.choices[0]
+        if choice.finish_reason == "stop" and isinstance(choice.message.content, str):
+            self._cache.put(key, choice.message.content, choice.finish_reason)
+        else:
+            # Do not keep serving an older answer the fresh one was meant to replace
+            self._cache.store.delete(key)
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._completions, name)
+
+
+class _CachedChat:
+    """``chat`` of a ``CachedChatClient``."""
+
+    def __init__(self, chat: Any, cache: ResponseCache):
+        self._chat = chat
+        self.completions = _CachedCompletions(chat.completions, cache)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._chat, name)
+
+
+class CachedChatClient:
+    """OpenAI client wrapper answering repeated chat completion requests from a ``ResponseCache``.
+
+    Only ``chat.completions.create`` is cached; every other attribute is
+    the wrapped client's.
+    """
+
+    def __init__(self, client: Any, cache: ResponseCache):
+        self._client = client
+        self.cache = cache
+        self.chat = _CachedChat(client.chat, cache)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
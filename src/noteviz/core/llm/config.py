@@ -13,6 +13,9 @@ class LLMConfig(BaseModel):
 class SummarizerConfig(LLMConfig):
     """Configuration for text summarization."""
     max_summary_length: Optional[int] = Field(default=None, gt=0, description="Maximum length of the summary in words")
+    group_tokens: int = Field(default=6000, gt=0, description="Maximum estimated input tokens summarized by one request")
+    partial_summary_words: int = Field(default=200, gt=0, description="Target length in words of intermediate summaries")
+    max_concurrency: int = Field(default=4, gt=0, description="Maximum number of summarization requests in flight at once")
 
 
 class TopicExtractorConfig(LLMConfig):
@@ -0,0 +1,408 @@
+"""
+Map-reduce summarization of texts longer than a single request.
+
+The text is split into sentences, which are grouped into map inputs of at
+most ``SummarizerConfig.group_tokens`` estimated tokens. Each group is
+summarized concurrently (map), and the partial summaries are grouped and
+summarized again (reduce) until a single summary remains.
+
+The passes form a tree. Every node has a key derived from the request
+settings and the keys of its children, and group boundaries are chosen
+from the content of the grouped items rather than their position, so an
+edit only changes the keys of the nodes above it. With a
+``SummaryCache``, a re-run only requests the nodes whose key changed, and
+only the root depends on the target length. A text given as sections,
+such as chapters, gets one subtree per section below the nodes that
+combine them.
+"""
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from openai import AsyncOpenAI
+
+from ..pdf.chunking import sentence_bounds
+from ..tokens import estimate_tokens
+from .cache import SummaryCache
+from .config import SummarizerConfig
+
+SYSTEM_PROMPT = "You are a helpful assistant that summarizes text."
+
+# Extra passes allowed to bring an overlong final summary under the target length
+_MAX_CONDENSE_PASSES = 2
+
+
+@dataclass
+class SummaryStage:
+    """Calls, tokens and wall time of one summarization stage."""
+
+    name: str
+    """``"map"``, ``"reduce 1"``, ``"reduce 2"``, ... or ``"condense"``."""
+
+    calls: int = 0
+    """Number of completion requests."""
+
+    cached: int = 0
+    """Number of summaries served from the summary cache instead."""
+
+    input_tokens: int = 0
+    """Prompt tokens sent, as reported by the API or else estimated."""
+
+    output_tokens: int = 0
+    """Completion tokens received, as reported by the API or else estimated."""
+
+    seconds: float = 0.0
+    """Wall time of the stage, with its requests running concurrently."""
+
+
+@dataclass
+class SummaryNode:
+    """A text in the summary tree: an input sentence or a summary."""
+
+    key: str
+    """Hash of the text for inputs, or of the settings and child keys for summaries."""
+
+    text: str
+    """The text itself."""
+
+
+def text_key(text: str) -> str:
+    """Key of an input text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _ends_group(node: SummaryNode, max_tokens: int) -> bool:
+    """Whether a group may end after ``node``, judged from the node alone.
+
+    Chosen so that groups end after about half of ``max_tokens`` on average.
+    """
+    probability = 2 * estimate_tokens(node.text) / max_tokens
+    return int(node.key[:8], 16) < probability * 0x100000000
+
+
+def pack_groups(nodes: Sequence[SummaryNode], max_tokens: int, min_size: int = 1) -> List[List[SummaryNode]]:
+    """Pack nodes, in order, into groups of at most ``max_tokens`` estimated tokens.
+
+    Groups end after nodes selected by their key, so most boundaries do not
+    move when a node elsewhere changes; a group is also closed when the next
+    node would overflow it. A group is only closed once it holds
+    ``min_size`` nodes, so a reduce pass with ``min_size=2`` always at
+    least halves the number of nodes.
+
+    Args:
+        nodes: Nodes to pack.
+        max_tokens: Estimated token budget of a group.
+        min_size: Minimum number of nodes per group, except when there are fewer nodes.
+
+    Returns:
+        Groups of nodes, covering every node once.
+    """
+    groups: List[List[SummaryNode]] = []
+    group: List[SummaryNode] = []
+    tokens = 0
+    for node in nodes:
+        size = estimate_tokens(node.text)
+        if len(group) >= min_size and tokens + size > max_tokens:
+            groups.append(group)
+            group, tokens = [], 0
+        group.append(node)
+        tokens += size
+        if len(group) >= min_size and _ends_group(node, max_tokens):
+            groups.append(group)
+            group, tokens = [], 0
+    if group:
+        if len(group) < min_size and groups:
+            groups[-1].extend(group)
+        else:
+            groups.append(group)
+    return groups
+
+
+def _separator(level: int) -> str:
+    """Separator of the texts summarized together at a tree level.
+
+    Input chunks are consecutive text; summaries are separate paragraphs.
+    """
+    return "\n" if level == 0 else "\n\n"
+
+
+def summary_prompt(text: str, max_length: Optional[int] = None, partial: bool = False) -> str:
+    """Build the user prompt for one summarization request.
+
+    Args:
+        text: Text to summarize.
+        max_length: Maximum length of the summary in words.
+        partial: Whether the text is one part of a longer document.
+
+    Returns:
+        The prompt.
+    """
+    if partial:
+        prompt = "Please summarize the following part of a longer text, keeping its key facts and terms:\n\n"
+    else:
+        prompt = "Please summarize the following text:\n\n"
+    if max_length:
+        prompt += f"Keep the summary under {max_length} words.\n\n"
+    return prompt + text
+
+
+class MapReduceSummarizer:
+    """Summarizes texts of any length with concurrent, hierarchical requests.
+
+    A text that fits in one group is summarized with a single request.
+    ``stages`` holds the statistics of the last ``summarize`` or
+    ``condense`` call, and ``summarize_condensed`` adds its own to them.
+    """
+
+    def __init__(self, config: SummarizerConfig, client: AsyncOpenAI, cache: Optional[SummaryCache] = None):
+        self.config = config
+        self.client = client
+        self.cache = cache
+        self.stages: List[SummaryStage] = []
+        # Text returned by the last ``condense`` call, with the nodes under its root and their level
+        self._condensed: Optional[Tuple[str, List[SummaryNode], int]] = None
+
+    def split(self, text: str) -> List[str]:
+        """Split a text into the sentences that form the leaves of the tree.
+
+        Args:
+            text: Text to split.
+
+        Returns:
+            Sentences, with overlong ones split to at most ``config.group_tokens`` estimated tokens.
+        """
+        return [text[start:end] for start, end in sentence_bounds(text, 0, len(text), self.config.group_tokens)]
+
+    async def summarize(
+        self, text: str, max_length: Optional[int] = None, sections: Optional[Sequence[str]] = None
+    ) -> str:
+        """Summarize a text of any length.
+
+        Args:
+            text: Text to summarize.
+            max_length: Maximum length of the summary in words; defaults to
+                ``config.max_summary_length``.
+            sections: The text split into consecutive parts such as
+                chapters. Unless the text fits in one group, each part is
+                summarized by its own subtree, so its summaries are cached
+                independently of its neighbours.
+
+        Returns:
+            Generated summary.
+        """
+        if not text:
+            raise ValueError("No text provided for summarization")
+        self.stages = []
+        return await self._summarize(self._leaf_chunks(text, sections), max_length)
+
+    async def summarize_chunks(self, chunks: Sequence[str], max_length: Optional[int] = None) -> str:
+        """Summarize a document given as chunks, in document order.
+
+        Args:
+            chunks: Text chunks to summarize.
+            max_length: Maximum length of the summary in words; defaults to
+                ``config.max_summary_length``.
+
+        Returns:
+            Generated summary.
+        """
+        if not chunks:
+            raise ValueError("No text provided for summarization")
+        self.stages = []
+        return await self._summarize([chunks], max_length)
+
+    async def condense(self, text: str, sections: Optional[Sequence[str]] = None) -> str:
+        """Reduce a text until it fits in a single request.
+
+        A text within ``config.group_tokens`` is returned unchanged;
+        otherwise the lower levels of its summary tree are built (reusing
+        cached nodes) and the partial summaries under the root are returned.
+
+        Args:
+            text: Text to condense.
+            sections: The text split into consecutive parts such as
+                chapters, each reduced by its own subtree.
+
+        Returns:
+            Text of at most about ``config.group_tokens`` estimated tokens.
+        """
+        self.stages = []
+        self._condensed = None
+        if estimate_tokens(text) <= self.config.group_tokens:
+            return text
+        group, level = await self._reduce(
+            self._leaf_chunks(text, sections), asyncio.Semaphore(self.config.max_concurrency)
+        )
+        condensed = _separator(level).join(child.text for child in group)
+        self._condensed = (condensed, group, level)
+        return condensed
+
+    async def summarize_condensed(self, condensed: str, max_length: Optional[int] = None) -> str:
+        """Summarize a text returned by ``condense``.
+
+        The nodes under the root kept by the last ``condense`` call are
+        summarized with the root request alone instead of rebuilding the
+        tree, so the summary matches (and shares cached nodes with) that of
+        the full text. Its statistics are added to ``stages``.
+
+        Args:
+            condensed: Text returned by ``condense``.
+            max_length: Maximum length of the summary in words; defaults to
+                ``config.max_summary_length``.
+
+        Returns:
+            Generated summary.
+        """
+        if not condensed:
+            raise ValueError("No text provided for summarization")
+        if self._condensed is None or self._condensed[0] != condensed:
+            return await self._summarize(self._leaf_chunks(condensed, None), max_length)
+        _, group, level = self._condensed
+        return await self._summarize_root(group, level, max_length, asyncio.Semaphore(self.config.max_concurrency))
+
+    def _leaf_chunks(self, text: str, sections: Optional[Sequence[str]]) -> List[List[str]]:
+        """Split a text, or each of its non-blank sections, into leaf chunks."""
+        parts = [section for section in sections or [] if section.strip()] or [text]
+        return [self.split(part) or [part] for part in parts]
+
+    async def _summarize(self, sections: Sequence[Sequence[str]], max_length: Optional[int]) -> str:
+        """Summarize the chunks of one or more sections into a single summary."""
+        semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        group, level = await self._reduce(sections, semaphore)
+        return await self._summarize_root(group, level, max_length, semaphore)
+
+    async def _summarize_root(
+        self, group: List[SummaryNode], level: int, max_length: Optional[int], semaphore: asyncio.Semaphore
+    ) -> str:
+        """Summarize the nodes under the root, condensing the result until it fits ``max_length``."""
+        max_length = max_length or self.config.max_summary_length
+        (root,) = await self._run_stage(
+            "map" if level == 0 else f"reduce {level}",
+            [(
+                self._node_key("final", max_length, [child.key for child in group]),
+                summary_prompt(_separator(level).join(child.text for child in group), max_length),
+            )],
+            semaphore,
+        )
+        for _ in range(_MAX_CONDENSE_PASSES):
+            if not max_length or len(root.text.split()) <= max_length:
+                break
+            (root,) = await self._run_stage(
+                "condense",
+                [(self._node_key("condense", max_length, [root.key]), summary_prompt(root.text, max_length))],
+                semaphore,
+            )
+        return root.text
+
+    async def _reduce(
+        self, sections: Sequence[Sequence[str]], semaphore: asyncio.Semaphore
+    ) -> Tuple[List[SummaryNode], int]:
+        """Summarize groups level by level until the nodes fit in a single group.
+
+        With several sections that do not fit in one group together, each
+        is first reduced to a single node on its own, level by level
+        alongside the others, so no group spans two sections; the section
+        nodes are then reduced together.
+
+        Returns:
+            The nodes under the root and the level they are summarized at.
+        """
+        section_nodes = [[SummaryNode(text_key(chunk), chunk) for chunk in chunks] for chunks in sections]
+        groups = pack_groups([node for nodes in section_nodes for node in nodes], self.config.group_tokens)
+        level = 0
+        if len(section_nodes) > 1 and len(groups) > 1:
+            section_groups = [pack_groups(nodes, self.config.group_tokens) for nodes in section_nodes]
+            while any(len(groups) > 1 or len(groups[0]) > 1 for groups in section_groups):
+                pending = [groups for groups in section_groups if len(groups) > 1 or len(groups[0]) > 1]
+                nodes = iter(await self._run_stage(
+                    "map" if level == 0 else f"reduce {level}",
+                    [self._partial_request(group, level) for groups in pending for group in groups],
+                    semaphore,
+                ))
+                section_groups = [
+                    pack_groups([next(nodes) for _ in groups], self.config.group_tokens, min_size=2)
+                    if len(groups) > 1 or len(groups[0]) > 1 else groups
+                    for groups in section_groups
+                ]
+                level += 1
+            groups = pack_groups([groups[0][0] for groups in section_groups], self.config.group_tokens, min_size=2)
+
+        while len(groups) > 1:
+            nodes = await self._run_stage(
+                "map" if level == 0 else f"reduce {level}",
+                [self._partial_request(group, level) for group in groups],
+                semaphore,
+            )
+            groups = pack_groups(nodes, self.config.group_tokens, min_size=2)
+            level += 1
+        return groups[0], level
+
+    def _partial_request(self, group: List[SummaryNode], level: int) -> Tuple[str, str]:
+        """Key and prompt of the partial summary of a group at a tree level."""
+        target = self.config.partial_summary_words
+        return (
+            self._node_key("partial", target, [child.key for child in group]),
+            summary_prompt(_separator(level).join(child.text for child in group), target, partial=True),
+        )
+
+    def _node_key(self, kind: str, target: Optional[int], child_keys: List[str]) -> str:
+        """Key of a summary node: its request settings and the keys of its children."""
+        digest = hashlib.sha256()
+        digest.update(
+            f"{self.config.model_name}\0{self.config.temperature}\0{self.config.max_tokens}\0"
+            f"{kind}\0{target or ''}\0".encode("utf-8")
+        )
+        for key in child_keys:
+            digest.update(key.encode("ascii"))
+        return digest.hexdigest()
+
+    async def _run_stage(
+        self, name: str, requests: List[Tuple[str, str]], semaphore: asyncio.Semaphore
+    ) -> List[SummaryNode]:
+        """Answer ``(key, prompt)`` requests from the cache, sending the rest concurrently."""
+        cached = self.cache.get_many(key for key, _ in requests) if self.cache is not None else {}
+        missing = {key: prompt for key, prompt in requests if key not in cached}
+        stage = SummaryStage(name, calls=len(missing), cached=len(requests) - len(missing))
+        self.stages.append(stage)
+
+        start = time.perf_counter()
+        completions = await asyncio.gather(*(self._complete(prompt, semaphore) for prompt in missing.values()))
+        stage.seconds = time.perf_counter() - start
+        stage.input_tokens = sum(input_tokens for _, input_tokens, _ in completions)
+        stage.output_tokens = sum(output_tokens for _, _, output_tokens in completions)
+
+        for key, (summary, _, _) in zip(missing, completions):
+            cached[key] = summary
+            if self.cache is not None:
+                self.cache.put(key, summary)
+        return [SummaryNode(key, cached[key]) for key, _ in requests]
+
+    async def _complete(self, prompt: str, semaphore: asyncio.Semaphore) -> Tuple[str, int, int]:
+        """Send one summarization request.
+
+        Returns:
+            The summary and the prompt and completion token counts, taken
+            from the response's usage or estimated when it has none (as for
+            responses served from a ``ResponseCache``).
+        """
+        async with semaphore:
+            response = await self.client.chat.completions.create(
+                model=self.config.model_name,
+                temperature=self.config.temperature,
+                max_tokens=self.config.max_tokens,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ]
+            )
+        content = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        input_tokens = getattr(usage, "prompt_tokens", None)
+        output_tokens = getattr(usage, "completion_tokens", None)
+        if not isinstance(input_tokens, int):
+            input_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt)
+        if not isinstance(output_tokens, int):
+            output_tokens = estimate_tokens(content)
+        return content, input_tokens, output_tokens
@@ -3,12 +3,82 @@ OpenAI implementation of the LLM service.
 """
 import json
 import random
-from typing import List, Optional
+import time
+from typing import Callable, List, Optional, Sequence
 
 from openai import AsyncOpenAI
 
-from .base import LLMConfig, LLMService, Topic, Summarizer, TopicExtractor
+from .base import ANALYSIS_STAGES, AnalysisResult, LLMConfig, LLMService, Topic, Summarizer, TopicExtractor
+from ..stages import StageResult
+from .cache import ResponseCache, SummaryCache
 from .config import SummarizerConfig, TopicExtractorConfig
+from .mapreduce import MapReduceSummarizer
+
+
+def _make_client(client: Optional[AsyncOpenAI], response_cache: Optional[ResponseCache]) -> AsyncOpenAI:
+    """Return the client to use, answering repeated requests from ``response_cache`` if given."""
+    client = client or AsyncOpenAI()
+    return response_cache.wrap(client) if response_cache is not None else client
+
+
+def _discard(response_cache: Optional[ResponseCache], request: dict) -> None:
+    """Drop a response the caller could not use, so it is not served again."""
+    if response_cache is not None:
+        response_cache.discard(request)
+
+
+def _strip_code_fence(content: str) -> str:
+    """Remove markdown code block formatting around a JSON response, if present."""
+    if "```json" in content:
+        content = content.split("```json")[1]
+    if "```" in content:
+        content = content.split("```")[0]
+    return content.strip()
+
+
+def parse_analysis(content: str) -> AnalysisResult:
+    """Parse and validate the JSON response of a combined analysis request.
+    
+    Args:
+        content: Response text, optionally wrapped in a markdown code block.
+        
+    Returns:
+        The analysis.
+        
+    Raises:
+        ValueError: If the response is not valid JSON of the expected shape.
+    """
+    data = json.loads(_strip_code_fence(content))
+    if not isinstance(data, dict):
+        raise ValueError("Analysis response is not a JSON object")
+    topics, summary, concepts = data.get("topics"), data.get("summary"), data.get("key_concepts")
+    if not isinstance(summary, str) or not summary.strip():
+        raise ValueError("Analysis response has no summary")
+    if not isinstance(concepts, list) or not all(isinstance(concept, str) for concept in concepts):
+        raise ValueError("Analysis response key_concepts is not a list of strings")
+    if not isinstance(topics, list) or not all(isinstance(topic, dict) for topic in topics):
+        raise ValueError("Analysis response topics is not a list of objects")
+    for topic in topics:
+        if not (
+            isinstance(topic.get("name"), str)
+            and isinstance(topic.get("description"), str)
+            and isinstance(topic.get("confidence"), (int, float))
+            and isinstance(topic.get("keywords"), list)
+        ):
+            raise ValueError(f"Analysis response has an invalid topic: {topic!r}")
+    return AnalysisResult(
+        topics=[
+            Topic(
+                name=topic["name"],
+                description=topic["description"],
+                confidence=float(topic["confidence"]),
+                keywords=[str(keyword) for keyword in topic["keywords"]]
+            )
+            for topic in topics
+        ],
+        summary=summary.strip(),
+        key_concepts=[concept.strip() for concept in concepts if concept.strip()]
+    )
 
 
 class OpenAILLMService(LLMService):
@@ -18,40 +88,36 @@ class OpenAILLMService(LLMService):
         self,
         summarizer_config: SummarizerConfig,
         topic_extractor_config: TopicExtractorConfig,
-        client: Optional[AsyncOpenAI] = None
+        client: Optional[AsyncOpenAI] = None,
+        summary_cache: Optional[SummaryCache] = None,
+        response_cache: Optional[ResponseCache] = None
     ):
         super().__init__(summarizer_config, topic_extractor_config)
-        self.client = client or AsyncOpenAI()
+        self.client = _make_client(client, response_cache)
+        self.response_cache = response_cache
+        self.summarizer = MapReduceSummarizer(summarizer_config, self.client, summary_cache)
     
-    async def generate_summary(self, text: str, max_length: Optional[int] = None) -> str:
+    async def generate_summary(
+        self, text: str, max_length: Optional[int] = None, sections: Optional[Sequence[str]] = None
+    ) -> str:
         """Generate a summary of the text.
         
+        Texts longer than ``summarizer_config.group_tokens`` are summarized
+        by map-reduce, reusing cached tree nodes when a summary cache is set;
+        per-stage statistics are left in ``summarizer.stages``.
+        
         Args:
             text: Text to summarize.
             max_length: Maximum length of the summary.
+            sections: The text split into consecutive parts such as
+                chapters, each summarized by its own map-reduce subtree.
             
         Returns:
             Generated summary.
         """
         if not text:
             raise ValueError("No text provided for summarization")
-            
-        prompt = "Please summarize the following text:\n\n"
-        if max_length:
-            prompt += f"Keep the summary under {max_length} words.\n\n"
-        prompt += text
-        
-        response = await self.client.chat.completions.create(
-            model=self.summarizer_config.model_name,
-            temperature=self.summarizer_config.temperature,
-            max_tokens=self.summarizer_config.max_tokens,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that summarizes text."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        return response.choices[0].message.content
+        return await self.summarizer.summarize(text, max_length, sections)
     
     async def identify_key_concepts(self, text: str, num_concepts: int = 5) -> List[str]:
         """Identify key concepts in the text.
@@ -115,7 +181,7 @@ class OpenAILLMService(LLMService):
         {text}
         """
         
-        response = await self.client.chat.completions.create(
+        request = dict(
             model=self.topic_extractor_config.model_name,
             temperature=self.topic_extractor_config.temperature,
             max_tokens=self.topic_extractor_config.max_tokens,
@@ -124,39 +190,118 @@ class OpenAILLMService(LLMService):
                 {"role": "user", "content": prompt}
             ]
         )
+        response = await self.client.chat.completions.create(**request)
         
-        content = response.choices[0].message.content
+        try:
+            topics_data = json.loads(_strip_code_fence(response.choices[0].message.content))
+            return [
+                Topic(
+                    name=topic["name"],
+                    description=topic["description"],
+                    confidence=topic["confidence"],
+                    keywords=topic["keywords"]
+                )
+                for topic in topics_data
+            ]
+        except (KeyError, TypeError, ValueError):
+            _discard(self.response_cache, request)
+            raise
+    
+    async def analyze(
+        self,
+        text: str,
+        num_topics: int = 5,
+        num_concepts: int = 5,
+        max_length: Optional[int] = None,
+        on_result: Optional[Callable[[StageResult], None]] = None,
+        sections: Optional[Sequence[str]] = None
+    ) -> AnalysisResult:
+        """Extract topics, a summary and key concepts with a single request.
         
-        # Remove markdown code block formatting if present
-        if "```json" in content:
-            content = content.split("```json")[1]
-        if "```" in content:
-            content = content.split("```")[0]
+        Texts longer than ``summarizer_config.group_tokens`` are first
+        condensed by the map-reduce summarizer. If the response cannot be
+        parsed, the three separate calls are made concurrently instead on
+        the condensed text; the summary finishes the map-reduce tree built
+        by condensing, with its statistics added to ``summarizer.stages``.
         
-        # Strip whitespace and parse JSON
-        content = content.strip()
-        topics_data = json.loads(content)
+        Args:
+            text: Text to analyze.
+            num_topics: Number of topics to extract.
+            num_concepts: Number of concepts to identify.
+            max_length: Maximum length of the summary.
+            on_result: Called with the result of each stage (named as in
+                ``ANALYSIS_STAGES``) as soon as it is available.
+            sections: The text split into consecutive parts such as
+                chapters, each condensed by its own map-reduce subtree.
+            
+        Returns:
+            The combined analysis.
+        """
+        if not text:
+            raise ValueError("No text provided for analysis")
+        start = time.perf_counter()
         
-        return [
-            Topic(
-                name=topic["name"],
-                description=topic["description"],
-                confidence=topic["confidence"],
-                keywords=topic["keywords"]
+        condensed = await self.summarizer.condense(text, sections)
+        max_length = max_length or self.summarizer_config.max_summary_length
+        length = f" in under {max_length} words" if max_length else ""
+        prompt = f"""Analyze the following text and respond with a JSON object with exactly these keys:
+        - "topics": an array of EXACTLY {num_topics} topics, each an object with "name" (a short, descriptive name),
+          "description" (a brief explanation), "confidence" (a score between 0 and 1) and "keywords" (a list of relevant keywords)
+        - "summary": a summary of the text{length}
+        - "key_concepts": an array of the {num_concepts} most important concepts, each a string naming the concept
+          followed by a brief explanation
+        
+        Text to analyze:
+        {condensed}
+        """
+        
+        request = dict(
+            model=self.topic_extractor_config.model_name,
+            temperature=self.topic_extractor_config.temperature,
+            max_tokens=self.summarizer_config.max_tokens + self.topic_extractor_config.max_tokens,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant that analyzes text and answers in JSON."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        response = await self.client.chat.completions.create(**request)
+        
+        try:
+            result = parse_analysis(response.choices[0].message.content)
+        except (TypeError, ValueError):
+            _discard(self.response_cache, request)
+            return await self._analyze_separately(
+                condensed,
+                num_topics,
+                num_concepts,
+                self.summarizer.summarize_condensed(condensed, max_length),
+                on_result
             )
-            for topic in topics_data
-        ]
+        if on_result is not None:
+            seconds = time.perf_counter() - start
+            for name, value in zip(ANALYSIS_STAGES, (result.topics, result.summary, result.key_concepts)):
+                on_result(StageResult(name, value, seconds=seconds))
+        return result
 
 
 class OpenAISummarizer(Summarizer):
     """OpenAI implementation of text summarization."""
     
-    def __init__(self, config: SummarizerConfig):
+    def __init__(
+        self,
+        config: SummarizerConfig,
+        client: Optional[AsyncOpenAI] = None,
+        cache: Optional[SummaryCache] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
         super().__init__(config)
-        self.client = AsyncOpenAI()
+        self.client = _make_client(client, response_cache)
+        self.response_cache = response_cache
+        self.summarizer = MapReduceSummarizer(config, self.client, cache)
     
     async def summarize(self, text: str) -> str:
-        """Generate a summary of the text.
+        """Generate a summary of the text, by map-reduce if it is long.
         
         Args:
             text: Text to summarize.
@@ -164,27 +309,21 @@ class OpenAISummarizer(Summarizer):
         Returns:
             Generated summary.
         """
-        prompt = "Please summarize the following text:\n\n"
-        if self.config.max_summary_length:
-            prompt += f"Keep the summary under {self.config.max_summary_length} words.\n\n"
-        prompt += text
-        
-        response = await self.client.chat.completions.create(
-            model=self.config.model_name,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=self.config.max_tokens,
-            temperature=self.config.temperature
-        )
-        
-        return response.choices[0].message.content
+        return await self.summarizer.summarize(text)
 
 
 class OpenAITopicExtractor(TopicExtractor):
     """OpenAI implementation of topic extraction."""
     
-    def __init__(self, config: TopicExtractorConfig):
+    def __init__(
+        self,
+        config: TopicExtractorConfig,
+        client: Optional[AsyncOpenAI] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
         super().__init__(config)
-        self.client = AsyncOpenAI()
+        self.client = _make_client(client, response_cache)
+        self.response_cache = response_cache
     
     async def extract_topics(self, chunks: List[str]) -> List[Topic]:
         """Extract topics from text chunks.
@@ -220,12 +359,13 @@ class OpenAITopicExtractor(TopicExtractor):
         {combined_text}
         """
         
-        response = await self.client.chat.completions.create(
+        request = dict(
             model=self.config.model_name,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=self.config.max_tokens,
             temperature=self.config.temperature
         )
+        response = await self.client.chat.completions.create(**request)
         
         content = response.choices[0].message.content
         
@@ -237,14 +377,17 @@ class OpenAITopicExtractor(TopicExtractor):
         
         # Strip whitespace and parse JSON
         content = content.strip()
-        topics_data = json.loads(content)
-        
-        return [
-            Topic(
-                name=topic["name"],
-                description=topic["description"],
-                confidence=topic["confidence"],
-                keywords=topic["keywords"]
-            )
-            for topic in topics_data
-        ] 
\ No newline at end of file
+        try:
+            topics_data = json.loads(content)
+            return [
+                Topic(
+                    name=topic["name"],
+                    description=topic["description"],
+                    confidence=topic["confidence"],
+                    keywords=topic["keywords"]
+                )
+                for topic in topics_data
+            ]
+        except (KeyError, TypeError, ValueError):
+            _discard(self.response_cache, request)
+            raise 
\ No newline at end of file
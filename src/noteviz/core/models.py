@@ -2,9 +2,10 @@
 Data models for the NoteViz application.
 """
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
-from pydantic import BaseModel, Field
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Document(BaseModel):
@@ -16,10 +17,16 @@ class Document(BaseModel):
 
 
 class TextChunk(BaseModel):
-    """Represents a chunk of text from a document."""
+    """Represents a chunk of text from a document.
+    
+    ``embedding`` may be a NumPy row, such as a view into the matrix returned
+    by ``EmbeddingService.generate_embedding_matrix``; it is stored as-is.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
     id: str = Field(..., description="Unique identifier for the chunk")
     content: str = Field(..., description="Text content of the chunk")
-    embedding: Optional[List[float]] = Field(None, description="Vector embedding of the chunk")
+    embedding: Optional[Union[np.ndarray, List[float]]] = Field(None, description="Vector embedding of the chunk")
     document_id: str = Field(..., description="ID of the parent document")
     metadata: Dict[str, str] = Field(default_factory=dict, description="Chunk metadata")
     importance: float = Field(default=1.0, description="Importance score of the chunk")
@@ -1,11 +1,25 @@
 """
 PDF processing module for NoteViz.
 """
-from .base import PDFConfig, PDFProcessor
-from .pypdf import PyPDFProcessor
+from .base import OutlineEntry, PDFConfig, PDFProcessor, PDFSession
+from .cache import ExtractionCache
+from .normalize import NormalizationReport, strip_boilerplate
+from .pypdf import PyPDFProcessor, PyPDFSession
+from .sections import Section, split_sections
+from .text import ChunkSpan, DocumentText
 
 __all__ = [
+    "ChunkSpan",
+    "DocumentText",
+    "ExtractionCache",
+    "NormalizationReport",
+    "OutlineEntry",
     "PDFConfig",
     "PDFProcessor",
+    "PDFSession",
     "PyPDFProcessor",
+    "PyPDFSession",
+    "Section",
+    "split_sections",
+    "strip_boilerplate",
 ] 
\ No newline at end of file
@@ -2,16 +2,114 @@
 Base interface for PDF processing services.
 """
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, List, Literal, Optional, Sequence
 
 from pydantic import BaseModel
 
+from .normalize import NormalizationReport, strip_boilerplate
+from .text import ChunkSpan, DocumentText
+
 
 class PDFConfig(BaseModel):
     """Configuration for PDF processing."""
+    chunker: Literal["characters", "tokens"] = "characters"  # Fixed character windows, or token budgets snapped to sentences
     chunk_size: int = 1000  # Number of characters per chunk
     chunk_overlap: int = 200  # Number of characters to overlap between chunks
+    chunk_tokens: int = 256  # Maximum estimated tokens per chunk with the "tokens" chunker
+    chunk_overlap_tokens: int = 32  # Estimated tokens to overlap between chunks with the "tokens" chunker
+    num_workers: int = 1  # Number of processes extracting page text; 1 extracts in-process
+    strip_boilerplate: bool = False  # Remove repeated headers/footers and page numbers, join hyphenated words
+    boilerplate_min_fraction: float = 0.5  # Fraction of pages an edge line must repeat on to be removed
+
+
+@dataclass(frozen=True)
+class OutlineEntry:
+    """One entry of a PDF outline (bookmark tree)."""
+    
+    title: str
+    """Title shown for the entry."""
+    
+    page: Optional[int]
+    """Zero-based page the entry points to, or None if it has no page destination."""
+    
+    level: int
+    """Nesting depth; top-level entries are at level 0."""
+
+
+class PDFSession(ABC):
+    """An open PDF file whose parsed structure is shared by every call.
+    
+    Sessions hold the file open until ``close`` is called; use them as
+    context managers.
+    """
+    
+    @property
+    @abstractmethod
+    def num_pages(self) -> int:
+        """Number of pages in the document."""
+        pass
+    
+    @abstractmethod
+    async def extract_pages(self, pages: Optional[Sequence[int]] = None) -> List[str]:
+        """Extract the text of every page, or of selected pages.
+        
+        Args:
+            pages: Zero-based indices of the pages to extract; all pages if omitted.
+            
+        Returns:
+            Text of each requested page, in the requested order.
+        """
+        pass
+    
+    async def iter_pages(self) -> AsyncIterator[str]:
+        """Yield the text of each page, in page order.
+        
+        Yields:
+            Text of each page.
+        """
+        for page_text in await self.extract_pages():
+            yield page_text
+    
+    @abstractmethod
+    async def fingerprint_pages(self) -> List[str]:
+        """Fingerprint every page without extracting its text.
+        
+        Pages with equal fingerprints extract to the same text.
+        
+        Returns:
+            Hex digest of each page, in page order.
+        """
+        pass
+    
+    @abstractmethod
+    async def extract_metadata(self) -> dict:
+        """Extract metadata from the document.
+        
+        Returns:
+            Dictionary containing PDF metadata.
+        """
+        pass
+    
+    def outline(self) -> List[OutlineEntry]:
+        """Return the document outline, flattened in reading order.
+        
+        Returns:
+            Outline entries; empty if the document has no outline.
+        """
+        return []
+    
+    @abstractmethod
+    def close(self) -> None:
+        """Release the file and everything parsed from it."""
+        pass
+    
+    def __enter__(self) -> "PDFSession":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
 
 class PDFProcessor(ABC):
@@ -19,6 +117,38 @@ class PDFProcessor(ABC):
     
     def __init__(self, config: PDFConfig):
         self.config = config
+        self.normalization = NormalizationReport()
+    
+    def normalize_pages(self, pages: Sequence[str]) -> List[str]:
+        """Apply the configured normalization to extracted page texts.
+        
+        With ``config.strip_boilerplate``, repeated headers and footers, page
+        numbers and hyphenated line breaks are removed, and the removed
+        amounts are added to ``normalization``.
+        
+        Args:
+            pages: Text of each page, in page order.
+            
+        Returns:
+            Normalized text of each page.
+        """
+        if not self.config.strip_boilerplate:
+            return list(pages)
+        normalized, report = strip_boilerplate(pages, self.config.boilerplate_min_fraction)
+        self.normalization.add(report)
+        return normalized
+    
+    @abstractmethod
+    def open(self, pdf_path: Path) -> PDFSession:
+        """Open a PDF file for several operations.
+        
+        Args:
+            pdf_path: Path to the PDF file.
+            
+        Returns:
+            Session to close, or to use as a context manager.
+        """
+        pass
     
     @abstractmethod
     async def process_pdf(self, pdf_path: Path) -> List[str]:
@@ -32,6 +162,89 @@ class PDFProcessor(ABC):
         """
         pass
     
+    async def iter_chunks(self, pdf_path: Path) -> AsyncIterator[str]:
+        """Yield chunks of text as they become available.
+        
+        The default implementation yields the result of ``process_pdf``;
+        processors that can extract incrementally override it.
+        
+        Args:
+            pdf_path: Path to the PDF file.
+            
+        Yields:
+            Text chunks, in document order.
+        """
+        for chunk in await self.process_pdf(pdf_path):
+            yield chunk
+    
+    async def extract_pages(self, pdf_path: Path, pages: Optional[Sequence[int]] = None) -> List[str]:
+        """Extract the text of every page, or of selected pages.
+        
+        Args:
+            pdf_path: Path to the PDF file.
+            pages: Zero-based indices of the pages to extract; all pages if omitted.
+            
+        Returns:
+            Text of each requested page, in the requested order.
+        """
+        with self.open(pdf_path) as session:
+            return await session.extract_pages(pages)
+    
+    async def fingerprint_pages(self, pdf_path: Path) -> List[str]:
+        """Fingerprint every page without extracting its text.
+        
+        Pages with equal fingerprints extract to the same text.
+        
+        Args:
+            pdf_path: Path to the PDF file.
+            
+        Returns:
+            Hex digest of each page, in page order.
+        """
+        with self.open(pdf_path) as session:
+            return await session.fingerprint_pages()
+    
+    async def extract_document(self, pdf_path: Path) -> DocumentText:
+        """Extract the full, normalized text of a PDF file into a single buffer.
+        
+        Args:
+            pdf_path: Path to the PDF file.
+            
+        Returns:
+            The document text with its page boundaries, identified by the file name.
+        """
+        return DocumentText(Path(pdf_path).name, self.normalize_pages(await self.extract_pages(pdf_path)))
+    
+    def chunk_document(self, document: DocumentText) -> List[ChunkSpan]:
+        """Split a document into chunk spans using the configured chunker.
+        
+        Args:
+            document: Document returned by ``extract_document``.
+            
+        Returns:
+            Chunk spans, in document order.
+        """
+        if self.config.chunker == "tokens":
+            return self.chunk_range(document, 0, len(document))
+        return document.chunk(self.config.chunk_size, self.config.chunk_overlap)
+    
+    def chunk_range(self, document: DocumentText, start: int, end: int) -> List[ChunkSpan]:
+        """Split part of a document, such as one page, using the configured chunker.
+        
+        Args:
+            document: Document returned by ``extract_document``.
+            start: Offset of the first character.
+            end: Offset one past the last character.
+            
+        Returns:
+            Chunk spans of the range, in order; none of them extends past ``end``.
+        """
+        if self.config.chunker == "tokens":
+            return document.chunk_range_tokens(
+                start, end, self.config.chunk_tokens, self.config.chunk_overlap_tokens
+            )
+        return document.chunk_range(start, end, self.config.chunk_size, self.config.chunk_overlap)
+    
     @abstractmethod
     async def extract_metadata(self, pdf_path: Path) -> dict:
         """Extract metadata from a PDF file.
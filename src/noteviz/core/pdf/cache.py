@@ -0,0 +1,99 @@
+"""
+Persistent cache of extracted page text, keyed by PDF content.
+"""
+import hashlib
+import json
+import mmap
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pypdf
+
+from ..cache import LRUStore
+
+# Size of the blocks read when hashing a PDF file
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+class ExtractionCache:
+    """Disk cache mapping (PDF content, pypdf version) to the text of every page.
+
+    Each entry is stored with a SHA-256 checksum of its payload. An entry
+    whose checksum does not match is discarded and treated as a miss, so a
+    damaged cache costs a re-extraction rather than wrong text.
+    """
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None):
+        self.store = LRUStore(path, max_bytes=max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0
+        # Extraction time recorded on cold runs and skipped by later hits
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key(pdf_path: Path) -> str:
+        """Build the content-addressed key for a PDF file.
+
+        Args:
+            pdf_path: Path to the PDF file.
+
+        Returns:
+            Hex digest of the file content and the pypdf version.
+        """
+        digest = ExtractionCache._digest()
+        with open(pdf_path, "rb") as pdf:
+            for block in iter(lambda: pdf.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def buffer_key(buffer: Union[bytes, mmap.mmap]) -> str:
+        """Build the key of ``key`` from the file content already in memory or mapped.
+
+        Args:
+            buffer: The complete PDF file content.
+
+        Returns:
+            Hex digest of the file content and the pypdf version.
+        """
+        digest = ExtractionCache._digest()
+        digest.update(buffer)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _digest() -> "hashlib._Hash":
+        return hashlib.sha256(f"pypdf-{pypdf.__version__}\0".encode("utf-8"))
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Return the cached page texts for ``key``, or None on a miss.
+
+        Args:
+            key: Key built by ``key``.
+
+        Returns:
+            Text of each page, in page order.
+        """
+        blob = self.store.get(key)
+        if blob is not None:
+            checksum, payload = blob[:32], blob[32:]
+            if hashlib.sha256(payload).digest() == checksum:
+                entry = json.loads(payload.decode("utf-8"))
+                self.hits += 1
+                self.saved_seconds += entry["seconds"]
+                return entry["pages"]
+            self.store.delete(key)
+            self.corrupt += 1
+        self.misses += 1
+        return None
+
+    def put(self, key: str, pages: List[str], seconds: float) -> None:
+        """Store the page texts of one PDF.
+
+        Args:
+            key: Key built by ``key``.
+            pages: Text of each page, in page order.
+            seconds: Time the extraction took, reported as saved on later hits.
+        """
+        payload = json.dumps({"pages": pages, "seconds": seconds}).encode("utf-8")
+        self.store.put(key, hashlib.sha256(payload).digest() + payload)
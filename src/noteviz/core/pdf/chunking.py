@@ -0,0 +1,141 @@
+"""
+Token-budgeted chunking that snaps to sentence and paragraph boundaries.
+"""
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Tuple
+
+from ..tokens import CHARS_PER_TOKEN
+
+# End of a sentence (with closing quotes or brackets) or a blank line; a
+# chunk may end where a match ends
+_BOUNDARY = re.compile(r"[.!?][\"'”)\]]*\s+|\n[ \t]*\n\s*")
+
+_NON_SPACE = re.compile(r"\S")
+
+_SPACE = re.compile(r"\s+")
+
+
+def token_chunk_bounds(
+    text: str, start: int, end: int, max_tokens: int, overlap_tokens: int
+) -> List[Tuple[int, int]]:
+    """Split ``text[start:end]`` into chunks of at most ``max_tokens`` estimated tokens.
+
+    Token counts use ``estimate_tokens``, so a budget of ``n`` tokens is a
+    budget of ``n * CHARS_PER_TOKEN`` characters. A chunk ends at the last
+    paragraph break in the second half of its budget, otherwise at the last
+    sentence end there, otherwise at the last whitespace, and only cuts a
+    word that is longer than the whole budget. The next chunk starts at the
+    first sentence (or, failing that, word) that begins within the last
+    ``overlap_tokens`` of the previous chunk. Chunks never start or end
+    with whitespace, and each ends past the end of the previous one.
+    Boundaries are found with one regex pass and binary searches, so the
+    cost is linear in the text length.
+
+    Args:
+        text: Text buffer.
+        start: Offset of the first character.
+        end: Offset one past the last character.
+        max_tokens: Maximum estimated tokens per chunk.
+        overlap_tokens: Estimated tokens of context repeated from the previous chunk.
+
+    Returns:
+        ``(start, end)`` offsets of each chunk, in order.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be greater than 0")
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+
+    cuts: List[int] = []
+    paragraphs: List[int] = []
+    for match in _BOUNDARY.finditer(text, start, end):
+        cuts.append(match.end())
+        if match.group().count("\n") >= 2:
+            paragraphs.append(match.end())
+
+    bounds = []
+    chunk_start = previous_end = start
+    while True:
+        first = _NON_SPACE.search(text, chunk_start, end)
+        if first is None:
+            break
+        chunk_start = first.start()
+        limit = chunk_start + max_chars
+        if limit >= end:
+            chunk_end = end
+        else:
+            # Every chunk must reach past the previous one, whatever the overlap
+            low = max(chunk_start + max_chars // 2, previous_end)
+            chunk_end = _snap(text, cuts, paragraphs, low, limit)
+        trimmed = chunk_end
+        while text[trimmed - 1].isspace():
+            trimmed -= 1
+        # A chunk that only adds whitespace lies within the previous one
+        if not bounds or trimmed > bounds[-1][1]:
+            bounds.append((chunk_start, trimmed))
+        if chunk_end >= end:
+            break
+        previous_end = chunk_end
+        chunk_start = _overlap_start(text, cuts, chunk_start, chunk_end, overlap_chars)
+    return bounds
+
+
+def sentence_bounds(text: str, start: int, end: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """Split ``text[start:end]`` into sentences and paragraph ends.
+
+    Unlike ``token_chunk_bounds``, each boundary only depends on the text
+    around it, so an edit leaves the other sentences' bounds in place
+    (shifted by the change in length). Sentences longer than
+    ``max_tokens`` are split with ``token_chunk_bounds``.
+
+    Args:
+        text: Text buffer.
+        start: Offset of the first character.
+        end: Offset one past the last character.
+        max_tokens: Maximum estimated tokens per piece.
+
+    Returns:
+        ``(start, end)`` offsets of each non-blank piece, without surrounding whitespace.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    cuts = [match.end() for match in _BOUNDARY.finditer(text, start, end)] + [end]
+    bounds: List[Tuple[int, int]] = []
+    for piece_start, piece_end in zip([start] + cuts, cuts):
+        first = _NON_SPACE.search(text, piece_start, piece_end)
+        if first is None:
+            continue
+        piece_start = first.start()
+        while text[piece_end - 1].isspace():
+            piece_end -= 1
+        if piece_end - piece_start > max_chars:
+            bounds.extend(token_chunk_bounds(text, piece_start, piece_end, max_tokens, 0))
+        else:
+            bounds.append((piece_start, piece_end))
+    return bounds
+
+
+def _snap(text: str, cuts: List[int], paragraphs: List[int], low: int, limit: int) -> int:
+    """Pick the end of a chunk that must end in ``(low, limit]``."""
+    index = bisect_right(paragraphs, limit) - 1
+    if index >= 0 and paragraphs[index] > low:
+        return paragraphs[index]
+    index = bisect_right(cuts, limit) - 1
+    if index >= 0 and cuts[index] > low:
+        return cuts[index]
+    space = max(text.rfind(" ", low, limit + 1), text.rfind("\n", low, limit + 1))
+    return space + 1 if space >= 0 else limit
+
+
+def _overlap_start(text: str, cuts: List[int], chunk_start: int, chunk_end: int, overlap_chars: int) -> int:
+    """Start of the chunk following ``[chunk_start, chunk_end)``."""
+    if not overlap_chars:
+        return chunk_end
+    target = max(chunk_end - overlap_chars, chunk_start + 1)
+    index = bisect_left(cuts, target)
+    if index < len(cuts) and cuts[index] < chunk_end:
+        return cuts[index]
+    space = _SPACE.search(text, target, chunk_end)
+    return space.end() if space is not None and space.end() < chunk_end else chunk_end
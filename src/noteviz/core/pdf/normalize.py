@@ -0,0 +1,144 @@
+"""
+Normalization of extracted page text before chunking.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from ..tokens import estimate_tokens
+
+_DIGITS = re.compile(r"\d+")
+
+# Bare page numbers such as "12", "xiv", "Page 3" or "3 of 120"
+_PAGE_NUMBER = re.compile(
+    r"^(?:page\s+)?(?:(\d+)|(?=[ivxlcdm])(m{0,3}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})))"
+    r"(?:\s*(?:of|/)\s*\d+)?$",
+    re.IGNORECASE,
+)
+
+_ROMAN_VALUES = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100, "d": 500, "m": 1000}
+
+# A word broken across lines with a hyphen, continued in lowercase
+_HYPHENATED = re.compile(r"(?<=[^\W\d_])-\n(?=[a-z])")
+
+
+@dataclass
+class NormalizationReport:
+    """What a normalization pass removed."""
+
+    lines_removed: int = 0
+    """Header, footer and page-number lines removed."""
+
+    hyphens_joined: int = 0
+    """Words rejoined across a hyphenated line break."""
+
+    chars_removed: int = 0
+    """Characters removed, including line breaks."""
+
+    tokens_removed: int = 0
+    """Estimated tokens in the removed lines."""
+
+    def add(self, other: "NormalizationReport") -> None:
+        """Accumulate the counts of another report."""
+        self.lines_removed += other.lines_removed
+        self.hyphens_joined += other.hyphens_joined
+        self.chars_removed += other.chars_removed
+        self.tokens_removed += other.tokens_removed
+
+
+def _line_key(line: str) -> str:
+    """Key under which a line counts as repeated; numbers are wildcards."""
+    return _DIGITS.sub("#", " ".join(line.split()).lower())
+
+
+def _page_number(line: str) -> Optional[Tuple[bool, int]]:
+    """Parse a page-number line into whether it is a roman numeral and its value."""
+    match = _PAGE_NUMBER.match(line.strip())
+    if match is None:
+        return None
+    if match.group(1) is not None:
+        return False, int(match.group(1))
+    digits = [_ROMAN_VALUES[char] for char in match.group(2).lower()]
+    value = sum(-digit if digit < following else digit for digit, following in zip(digits, digits[1:] + [0]))
+    return True, value
+
+
+def _numbered_lines(split: Sequence[Sequence[str]]) -> Set[Tuple[int, int]]:
+    """``(page, line)`` positions of the page numbers of a document.
+
+    A page number is the first or last non-blank line of a page, and only
+    counts if the same edge of the nearest page with a number there
+    continues the sequence: its number, of the same kind, differs by the
+    distance between the pages.
+    """
+    edges: Dict[str, List[Tuple[int, int, bool, int]]] = {"first": [], "last": []}
+    for page, lines in enumerate(split):
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        for edge, index in (("first", filled[:1]), ("last", filled[-1:])):
+            for i in index:
+                number = _page_number(lines[i])
+                if number is not None:
+                    edges[edge].append((page, i, *number))
+    found = set()
+    for numbers in edges.values():
+        for (page, i, roman, value), (next_page, next_i, next_roman, next_value) in zip(numbers, numbers[1:]):
+            if roman == next_roman and next_value - value == next_page - page:
+                found.update({(page, i), (next_page, next_i)})
+    return found
+
+
+def _edge_lines(lines: Sequence[str], edge_lines: int) -> List[int]:
+    """Indices of the first and last ``edge_lines`` non-blank lines."""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return sorted(set(filled[:edge_lines] + filled[-edge_lines:])) if edge_lines else []
+
+
+def strip_boilerplate(
+    pages: Sequence[str], min_fraction: float = 0.5, edge_lines: int = 3
+) -> Tuple[List[str], NormalizationReport]:
+    """Remove running headers, footers and page numbers, and join hyphenated words.
+
+    Only the first and last ``edge_lines`` non-blank lines of a page are
+    candidates. A candidate is removed if the same line, with numbers
+    treated as wildcards, is a candidate on at least ``min_fraction`` of the
+    pages (and on at least two). Bare numbers are never removed that way;
+    they are removed as page numbers only if they are the first or last
+    line of their page and continue the numbering of the neighbouring
+    pages. Both passes are linear in the text length.
+
+    Args:
+        pages: Text of each page, in page order.
+        min_fraction: Fraction of pages a line must repeat on to be removed.
+        edge_lines: Number of lines at the top and bottom of each page to consider.
+
+    Returns:
+        The normalized page texts and a report of what was removed.
+    """
+    split = [page.split("\n") for page in pages]
+    edges = [_edge_lines(lines, edge_lines) for lines in split]
+    counts: Counter = Counter()
+    for lines, indices in zip(split, edges):
+        counts.update({_line_key(lines[i]) for i in indices if _page_number(lines[i]) is None})
+    threshold = max(2, min_fraction * len(pages))
+    repeated = {key for key, count in counts.items() if count >= threshold}
+
+    numbered = _numbered_lines(split)
+
+    report = NormalizationReport()
+    normalized = []
+    for page, (lines, indices) in enumerate(zip(split, edges)):
+        drop = {
+            i for i in indices
+            if _line_key(lines[i]) in repeated or (page, i) in numbered
+        }
+        for i in drop:
+            report.lines_removed += 1
+            report.chars_removed += len(lines[i]) + 1
+            report.tokens_removed += estimate_tokens(lines[i].strip())
+        text = "\n".join(line for i, line in enumerate(lines) if i not in drop) if drop else "\n".join(lines)
+        text, joined = _HYPHENATED.subn("", text)
+        report.hyphens_joined += joined
+        report.chars_removed += 2 * joined
+        normalized.append(text)
+    return normalized, report
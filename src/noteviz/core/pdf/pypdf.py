@@ -1,16 +1,358 @@
 """
 pypdf implementation of the PDF processor.
 """
+import asyncio
+import hashlib
+import mmap
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import Any, AsyncIterator, List, Optional, Sequence, Set, Tuple
 
-from pypdf import PdfReader
+from pypdf import PageObject, PdfReader
+from pypdf.errors import PdfReadError, PdfStreamError
 
-from .base import PDFConfig, PDFProcessor
+from .base import OutlineEntry, PDFConfig, PDFProcessor, PDFSession
+from .cache import ExtractionCache
+from .sections import Section, split_sections
+from .text import DocumentText
+
+# Page ranges handed to each worker, per worker, so uneven pages balance out
+SHARDS_PER_WORKER = 4
+
+# Reader of a worker process, opened once by ``_open_worker_reader``
+_worker_reader: Optional[PdfReader] = None
+
+
+def _open_worker_reader(pdf_path: str) -> None:
+    """Open the reader a worker process extracts every one of its shards with.
+    
+    Args:
+        pdf_path: Path to the PDF file.
+    """
+    global _worker_reader
+    _worker_reader = PdfReader(pdf_path)
+
+
+def _extract_page_range(start: int, stop: int) -> List[str]:
+    """Extract the text of pages ``start`` to ``stop - 1``.
+    
+    Runs in worker processes started with ``_open_worker_reader``, so the
+    file is parsed once per worker rather than once per shard.
+    
+    Args:
+        start: Index of the first page to extract.
+        stop: Index one past the last page to extract.
+        
+    Returns:
+        Text of each page in the range, in page order.
+    """
+    assert _worker_reader is not None
+    return [_worker_reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+def _page_fingerprint(page: PageObject) -> str:
+    """Hash what a page's extracted text depends on.
+    
+    Covers the content stream, the rotation, each font's name and
+    ``/ToUnicode`` map, and the content and resources of every form
+    XObject the page can draw, which is much cheaper than extracting the
+    text.
+    
+    Args:
+        page: Page to fingerprint.
+        
+    Returns:
+        Hex digest of the page.
+    """
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    digest.update(f"\0rotate={page.get('/Rotate', 0)}".encode("utf-8"))
+    _hash_resources(digest, page.get("/Resources"), set())
+    return digest.hexdigest()
+
+
+def _hash_resources(digest: Any, resources: Any, seen: Set[Any]) -> None:
+    """Add the fonts and form XObjects of a resource dictionary to ``digest``.
+    
+    Forms are followed recursively; ``seen`` holds the references of the
+    forms already hashed, so shared and self-referencing forms are hashed once.
+    """
+    if resources is None:
+        return
+    resources = resources.get_object()
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        for name, font in sorted(fonts.get_object().items()):
+            font = font.get_object()
+            digest.update(f"\0{name}={font.get('/BaseFont')}".encode("utf-8"))
+            to_unicode = font.get("/ToUnicode")
+            if to_unicode is not None:
+                digest.update(to_unicode.get_object().get_data())
+    xobjects = resources.get("/XObject")
+    if xobjects is None:
+        return
+    for name, xobject in sorted(xobjects.get_object().items()):
+        form = xobject.get_object()
+        if form.get("/Subtype") != "/Form":
+            continue
+        digest.update(f"\0form {name}".encode("utf-8"))
+        reference = form.indirect_reference
+        key = (reference.idnum, reference.generation) if reference is not None else id(form)
+        if key in seen:
+            continue
+        seen.add(key)
+        digest.update(form.get_data())
+        _hash_resources(digest, form.get("/Resources"), seen)
+
+
+def _page_ranges(num_pages: int, num_shards: int) -> List[Tuple[int, int]]:
+    """Split ``num_pages`` pages into at most ``num_shards`` contiguous ranges."""
+    num_shards = max(1, min(num_shards, num_pages))
+    size, extra = divmod(num_pages, num_shards)
+    ranges = []
+    start = 0
+    for shard in range(num_shards):
+        stop = start + size + (1 if shard < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+class PyPDFSession(PDFSession):
+    """An open PDF file served by one shared ``PdfReader``.
+    
+    The file is memory-mapped instead of read into memory, and the reader,
+    which parses the cross-reference table, is only created on first use,
+    so a session answered entirely from the extraction cache never parses
+    the file.
+    """
+    
+    def __init__(self, processor: "PyPDFProcessor", pdf_path: Path):
+        self.processor = processor
+        self.path = Path(pdf_path)
+        self._file = open(self.path, "rb")
+        try:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped; let the reader report them
+            self._buffer = None
+        self._reader: Optional[PdfReader] = None
+        self._cache_key: Optional[str] = None
+    
+    @property
+    def reader(self) -> PdfReader:
+        """The parsed document, created on first use."""
+        if self._file.closed:
+            raise ValueError("PDF session is closed")
+        if self._reader is None:
+            self._reader = PdfReader(self._buffer if self._buffer is not None else self._file)
+        return self._reader
+    
+    @property
+    def num_pages(self) -> int:
+        """Number of pages in the document."""
+        return len(self.reader.pages)
+    
+    @property
+    def cache_key(self) -> str:
+        """Extraction cache key of the file, hashed from the mapped bytes."""
+        if self._cache_key is None:
+            self._cache_key = ExtractionCache.buffer_key(self._buffer if self._buffer is not None else b"")
+        return self._cache_key
+    
+    async def iter_pages(self) -> AsyncIterator[str]:
+        """Yield the text of each page, in page order.
+        
+        Pages come from the extraction cache when it holds this file's
+        content. Otherwise they are extracted, and stored in the cache once
+        every page has been read.
+        
+        Yields:
+            Text of each page.
+        """
+        cache = self.processor.cache
+        if cache is None:
+            async for page_text in self._extract_pages():
+                yield page_text
+            return
+        
+        key = await asyncio.to_thread(lambda: self.cache_key)
+        cached = cache.get(key)
+        if cached is not None:
+            for page_text in cached:
+                yield page_text
+            return
+        
+        pages = []
+        start = time.perf_counter()
+        async for page_text in self._extract_pages():
+            pages.append(page_text)
+            yield page_text
+        cache.put(key, pages, time.perf_counter() - start)
+    
+    async def _extract_pages(self) -> AsyncIterator[str]:
+        """Parse the PDF and yield the text of each page.
+        
+        Serial extraction runs in a worker thread so the event loop stays
+        responsive between pages. With ``config.num_workers`` greater than 1,
+        page ranges are sharded across a process pool where each worker opens
+        its own reader once; only a small window of shards is in flight at
+        once. Stopping early cancels the queued shards without waiting for
+        the running ones, so the event loop is never blocked.
+        """
+        config = self.processor.config
+        reader = self.reader
+        if config.num_workers <= 1 or len(reader.pages) < 2:
+            for page in reader.pages:
+                yield await asyncio.to_thread(page.extract_text)
+            return
+        
+        ranges = iter(_page_ranges(len(reader.pages), config.num_workers * SHARDS_PER_WORKER))
+        loop = asyncio.get_running_loop()
+        executor = ProcessPoolExecutor(
+            max_workers=config.num_workers, initializer=_open_worker_reader, initargs=(str(self.path),)
+        )
+        
+        def submit(page_range: Tuple[int, int]) -> asyncio.Future:
+            return loop.run_in_executor(executor, _extract_page_range, *page_range)
+        
+        pending = deque(submit(page_range) for page_range in islice(ranges, config.num_workers * 2))
+        try:
+            while pending:
+                shard = await pending.popleft()
+                for page_range in islice(ranges, 1):
+                    pending.append(submit(page_range))
+                for page_text in shard:
+                    yield page_text
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def extract_pages(self, pages: Optional[Sequence[int]] = None) -> List[str]:
+        """Extract the text of every page, or of selected pages.
+        
+        Selected pages are served from the extraction cache when it holds the
+        whole file, and are otherwise extracted one by one; a partial
+        extraction is not cached.
+        
+        Args:
+            pages: Zero-based indices of the pages to extract; all pages if omitted.
+            
+        Returns:
+            Text of each requested page, in the requested order.
+        """
+        if pages is None:
+            return [page_text async for page_text in self.iter_pages()]
+        cache = self.processor.cache
+        if cache is not None:
+            cached = cache.get(await asyncio.to_thread(lambda: self.cache_key))
+            if cached is not None:
+                return [cached[i] for i in pages]
+        reader = self.reader
+        return [await asyncio.to_thread(reader.pages[i].extract_text) for i in pages]
+    
+    async def fingerprint_pages(self) -> List[str]:
+        """Fingerprint every page without extracting its text.
+        
+        Returns:
+            Hex digest of each page, in page order.
+        """
+        reader = self.reader
+        return await asyncio.to_thread(lambda: [_page_fingerprint(page) for page in reader.pages])
+    
+    async def extract_metadata(self) -> dict:
+        """Extract the document information dictionary and page count.
+        
+        Returns:
+            Dictionary containing PDF metadata.
+        """
+        metadata = self.reader.metadata or {}
+        
+        return {
+            "title": metadata.get("/Title", ""),
+            "author": metadata.get("/Author", ""),
+            "subject": metadata.get("/Subject", ""),
+            "keywords": metadata.get("/Keywords", ""),
+            "creator": metadata.get("/Creator", ""),
+            "producer": metadata.get("/Producer", ""),
+            "num_pages": self.num_pages,
+        }
+    
+    def outline(self) -> List[OutlineEntry]:
+        """Return the document outline (bookmarks), flattened in reading order.
+        
+        Returns:
+            Outline entries with their nesting level; empty if the PDF has none.
+        """
+        entries: List[OutlineEntry] = []
+        
+        def walk(items: List[Any], level: int) -> None:
+            for item in items:
+                if isinstance(item, list):
+                    walk(item, level + 1)
+                    continue
+                try:
+                    page = self.reader.get_destination_page_number(item)
+                except (PdfReadError, PdfStreamError):
+                    # A destination whose page reference cannot be resolved
+                    page = None
+                entries.append(OutlineEntry(title=str(item.title), page=page, level=level))
+        
+        walk(self.reader.outline, 0)
+        return entries
+    
+    async def extract_sections(self, max_level: int = 0) -> List[Section]:
+        """Extract the text and split it into sections such as chapters.
+        
+        Sections follow the outline when the PDF has one, and detected
+        chapter headings otherwise.
+        
+        Args:
+            max_level: Deepest outline level that starts a new section.
+            
+        Returns:
+            Sections covering the whole document, in document order.
+        """
+        document = DocumentText(self.path.name, self.processor.normalize_pages(await self.extract_pages()))
+        return split_sections(document, self.outline(), max_level)
+    
+    def close(self) -> None:
+        """Release the reader, the memory map and the file."""
+        self._reader = None
+        if self._buffer is not None:
+            self._buffer.close()
+        self._file.close()
 
 
 class PyPDFProcessor(PDFProcessor):
-    """pypdf implementation of the PDF processor."""
+    """pypdf implementation of the PDF processor.
+    
+    Every call opens a ``PyPDFSession``; use ``open`` to share one parsed
+    document across several calls. With an ``ExtractionCache``, the page
+    text of a PDF whose content was extracted before is read from the cache
+    without parsing the file.
+    """
+    
+    def __init__(self, config: PDFConfig, cache: Optional[ExtractionCache] = None):
+        super().__init__(config)
+        self.cache = cache
+    
+    def open(self, pdf_path: Path) -> PyPDFSession:
+        """Open a PDF file for several operations.
+        
+        Args:
+            pdf_path: Path to the PDF file.
+            
+        Returns:
+            Session to close, or to use as a context manager.
+        """
+        return PyPDFSession(self, pdf_path)
     
     async def process_pdf(self, pdf_path: Path) -> List[str]:
         """Process a PDF file and return chunks of text.
@@ -21,24 +363,81 @@ class PyPDFProcessor(PDFProcessor):
         Returns:
             List of text chunks.
         """
-        reader = PdfReader(pdf_path)
-        text = ""
+        return [chunk async for chunk in self.iter_chunks(pdf_path)]
+    
+    async def iter_chunks(self, pdf_path: Path) -> AsyncIterator[str]:
+        """Yield chunks of text as pages are extracted.
         
-        # Extract text from all pages
-        for page in reader.pages:
-            page_text = page.extract_text()
-            text += page_text + "\n"
+        Only the text not yet covered by a complete chunk is buffered, so
+        memory stays bounded to about one chunk plus the current page, and
+        overlap is carried across page boundaries. The chunks are identical
+        to those returned by ``process_pdf``. With ``config.strip_boilerplate``
+        or the ``"tokens"`` chunker, all pages are extracted before the first
+        chunk is yielded.
         
-        # Split text into chunks
-        chunks = []
+        Args:
+            pdf_path: Path to the PDF file.
+            
+        Yields:
+            Text chunks, in document order.
+        """
+        if self.config.chunker == "tokens":
+            document = await self.extract_document(pdf_path)
+            for span in self.chunk_document(document):
+                yield span.text
+            return
+        
+        pages = self.iter_pages(pdf_path)
+        if self.config.strip_boilerplate:
+            # Repeated lines are only known once every page is extracted
+            normalized = self.normalize_pages(await self.extract_pages(pdf_path))
+            
+            async def replay() -> AsyncIterator[str]:
+                for page_text in normalized:
+                    yield page_text
+            pages = replay()
+        
+        step = self.config.chunk_size - self.config.chunk_overlap
+        buffer = ""
+        async for page_text in pages:
+            buffer += page_text + "\n"
+            start = 0
+            while start + self.config.chunk_size <= len(buffer):
+                yield buffer[start:start + self.config.chunk_size]
+                start += step
+            buffer = buffer[start:]
+        
+        # Flush the tail, including chunks that lie within the overlap
         start = 0
-        while start < len(text):
-            end = start + self.config.chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start = end - self.config.chunk_overlap
+        while start < len(buffer):
+            yield buffer[start:start + self.config.chunk_size]
+            start += step
+    
+    async def iter_pages(self, pdf_path: Path) -> AsyncIterator[str]:
+        """Yield the text of each page, in page order.
+        
+        Args:
+            pdf_path: Path to the PDF file.
+            
+        Yields:
+            Text of each page.
+        """
+        with self.open(pdf_path) as session:
+            async for page_text in session.iter_pages():
+                yield page_text
+    
+    async def extract_sections(self, pdf_path: Path, max_level: int = 0) -> List[Section]:
+        """Extract the text of a PDF file split into sections such as chapters.
+        
+        Args:
+            pdf_path: Path to the PDF file.
+            max_level: Deepest outline level that starts a new section.
             
-        return chunks
+        Returns:
+            Sections covering the whole document, in document order.
+        """
+        with self.open(pdf_path) as session:
+            return await session.extract_sections(max_level)
     
     async def extract_metadata(self, pdf_path: Path) -> dict:
         """Extract metadata from a PDF file.
@@ -49,15 +448,5 @@ class PyPDFProcessor(PDFProcessor):
         Returns:
             Dictionary containing PDF metadata.
         """
-        reader = PdfReader(pdf_path)
-        metadata = reader.metadata
-        
-        return {
-            "title": metadata.get("/Title", ""),
-            "author": metadata.get("/Author", ""),
-            "subject": metadata.get("/Subject", ""),
-            "keywords": metadata.get("/Keywords", ""),
-            "creator": metadata.get("/Creator", ""),
-            "producer": metadata.get("/Producer", ""),
-            "num_pages": len(reader.pages),
-        } 
\ No newline at end of file
+        with self.open(pdf_path) as session:
+            return await session.extract_metadata()
@@ -0,0 +1,167 @@
+"""
+Splitting extracted documents into sections such as chapters.
+"""
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from .base import OutlineEntry
+from .text import ChunkSpan, DocumentText
+
+# Whole lines such as "Chapter 3", "CHAPTER IV: Results" or "Part Two Methods";
+# a lowercase word after the number ("Part one of the ...") is ordinary prose
+_HEADING_PATTERN = re.compile(
+    r"^[ \t]*("
+    r"(?:Chapter|CHAPTER|Part|PART)[ \t]+"
+    r"(?:\d+|[IVXLCDM]+|(?i:one|two|three|four|five|six|seven|eight|nine|ten))\b"
+    r"(?:[ \t]*[:.\-\u2013\u2014][ \t]*[^\n]{0,60}|[ \t]+[A-Z][^\n]{0,60})?"
+    r")[ \t]*$",
+    re.MULTILINE,
+)
+
+
+class Section:
+    """A titled, contiguous part of a document, such as a chapter."""
+
+    __slots__ = ("title", "level", "span")
+
+    def __init__(self, title: str, level: int, span: ChunkSpan):
+        self.title = title
+        self.level = level
+        self.span = span
+
+    @property
+    def document(self) -> DocumentText:
+        """Document the section belongs to."""
+        return self.span.document
+
+    @property
+    def start_page(self) -> int:
+        """Zero-based page the section starts on."""
+        return self.span.page
+
+    @property
+    def text(self) -> str:
+        """Materialize the section text."""
+        return self.span.text
+
+    def chunk(self, chunk_size: int, chunk_overlap: int) -> List[ChunkSpan]:
+        """Split the section into chunk spans that stay within it.
+
+        Args:
+            chunk_size: Number of characters per chunk.
+            chunk_overlap: Number of characters to overlap between chunks.
+
+        Returns:
+            Chunk spans, in document order.
+        """
+        return self.document.chunk_range(self.span.start, self.span.end, chunk_size, chunk_overlap)
+
+    def __repr__(self) -> str:
+        return f"Section(title={self.title!r}, level={self.level}, start={self.span.start}, end={self.span.end})"
+
+
+def _build_sections(document: DocumentText, starts: Sequence[Tuple[int, str, int]]) -> List[Section]:
+    """Turn sorted (offset, title, level) section starts into sections covering the document.
+
+    Text before the first start becomes a "Front matter" section if it is
+    not blank, and is otherwise folded into the first section.
+    """
+    bounds = list(starts)
+    if bounds[0][0] > 0:
+        if document.text[:bounds[0][0]].strip():
+            bounds.insert(0, (0, "Front matter", 0))
+        else:
+            bounds[0] = (0,) + tuple(bounds[0][1:])
+    ends = [start for start, _, _ in bounds[1:]] + [len(document)]
+    return [
+        Section(title, level, ChunkSpan(document, document.page_at(start), start, end))
+        for (start, title, level), end in zip(bounds, ends)
+        if end > start
+    ]
+
+
+def _heading_offset(document: DocumentText, page: int, title: str) -> int:
+    """Find where an outline entry's heading starts on its page.
+
+    The title is matched at the start of a line, ignoring case and
+    differences in whitespace; the page start is used if it is not found.
+    """
+    start, end = document.page_offsets[page], document.page_offsets[page + 1]
+    words = title.split()
+    if words:
+        pattern = re.compile(r"^[ \t]*" + r"\s+".join(map(re.escape, words)), re.IGNORECASE | re.MULTILINE)
+        match = pattern.search(document.text, start, end)
+        if match is not None:
+            return match.start()
+    return start
+
+
+def sections_from_outline(
+    document: DocumentText, outline: Sequence[OutlineEntry], max_level: int = 0
+) -> List[Section]:
+    """Split a document at the headings its outline entries point to.
+
+    Each section starts at its heading when the entry's title is found on
+    the page the entry points to, and at the start of that page otherwise.
+
+    Args:
+        document: Extracted document text.
+        outline: Outline returned by ``PDFSession.outline``.
+        max_level: Deepest outline level that starts a new section.
+
+    Returns:
+        Sections in document order, or an empty list if no usable entry exists.
+    """
+    starts = {}
+    for entry in outline:
+        if entry.level > max_level or entry.page is None or not 0 <= entry.page < document.num_pages:
+            continue
+        # Entries starting at the same offset start a single section named after the first
+        offset = _heading_offset(document, entry.page, entry.title)
+        starts.setdefault(offset, (entry.title.strip() or f"Page {entry.page + 1}", entry.level))
+    bounds = [(offset, title, level) for offset, (title, level) in sorted(starts.items())]
+    return _build_sections(document, bounds) if bounds else []
+
+
+def sections_from_headings(document: DocumentText) -> List[Section]:
+    """Split a document at lines that look like chapter or part headings.
+
+    Used for PDFs without an outline; recognises lines such as
+    ``Chapter 3`` or ``PART IV: Results``.
+
+    Args:
+        document: Extracted document text.
+
+    Returns:
+        Sections in document order, or an empty list if no heading is found.
+    """
+    bounds = [
+        (match.start(), " ".join(match.group(1).split()), 0)
+        for match in _HEADING_PATTERN.finditer(document.text)
+    ]
+    return _build_sections(document, bounds) if bounds else []
+
+
+def split_sections(
+    document: DocumentText, outline: Optional[Sequence[OutlineEntry]] = None, max_level: int = 0
+) -> List[Section]:
+    """Split a document into sections.
+
+    The outline is used when it has usable entries; otherwise chapter
+    headings are detected in the text. A document without either becomes a
+    single section titled after the document.
+
+    Args:
+        document: Extracted document text.
+        outline: Outline returned by ``PDFSession.outline``, if any.
+        max_level: Deepest outline level that starts a new section.
+
+    Returns:
+        Sections covering the whole document, in document order.
+    """
+    sections = sections_from_outline(document, outline or [], max_level)
+    if not sections:
+        sections = sections_from_headings(document)
+    if not sections and len(document):
+        sections = [Section(document.doc_id, 0, ChunkSpan(document, 0, 0, len(document)))]
+    return sections
@@ -0,0 +1,202 @@
+"""
+Offset-based views of extracted document text.
+"""
+from bisect import bisect_right
+from typing import Iterable, List, Sequence
+
+from .chunking import token_chunk_bounds
+
+
+class ChunkSpan:
+    """A chunk stored as offsets into its document's text buffer.
+
+    The chunk text is only sliced out of the shared buffer when ``text`` is
+    read, so building and holding chunks does not copy the document, and
+    overlapping chunks do not duplicate the overlapping characters.
+    """
+
+    __slots__ = ("document", "page", "start", "end")
+
+    def __init__(self, document: "DocumentText", page: int, start: int, end: int):
+        self.document = document
+        self.page = page
+        self.start = start
+        self.end = end
+
+    @property
+    def doc_id(self) -> str:
+        """ID of the document the chunk belongs to."""
+        return self.document.doc_id
+
+    @property
+    def text(self) -> str:
+        """Materialize the chunk text."""
+        return self.document.text[self.start:self.end]
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ChunkSpan):
+            return NotImplemented
+        return (self.document is other.document and self.page == other.page
+                and self.start == other.start and self.end == other.end)
+
+    def __hash__(self) -> int:
+        return hash((id(self.document), self.page, self.start, self.end))
+
+    def __repr__(self) -> str:
+        return f"ChunkSpan(doc_id={self.doc_id!r}, page={self.page}, start={self.start}, end={self.end})"
+
+
+class DocumentText:
+    """The full text of a document in a single buffer, with page boundaries.
+
+    Each page's text is followed by a newline, matching the text chunked by
+    ``PDFProcessor.process_pdf``.
+    """
+
+    def __init__(self, doc_id: str, pages: Iterable[str]):
+        """Build the buffer from page texts with a single join.
+
+        Args:
+            doc_id: Identifier of the document.
+            pages: Text of each page, in page order.
+        """
+        self.doc_id = doc_id
+        self.page_offsets: List[int] = [0]
+        parts = []
+        for page_text in pages:
+            parts.append(page_text)
+            parts.append("\n")
+            self.page_offsets.append(self.page_offsets[-1] + len(page_text) + 1)
+        self.text = "".join(parts)
+
+    @property
+    def num_pages(self) -> int:
+        """Number of pages in the document."""
+        return len(self.page_offsets) - 1
+
+    def page_at(self, offset: int) -> int:
+        """Return the zero-based page containing the character at ``offset``."""
+        if not 0 <= offset < len(self.text):
+            raise IndexError("offset out of range")
+        return bisect_right(self.page_offsets, offset) - 1
+
+    def page_span(self, page: int) -> ChunkSpan:
+        """Return a span covering one page, including its trailing newline."""
+        return ChunkSpan(self, page, self.page_offsets[page], self.page_offsets[page + 1])
+
+    def chunk(self, chunk_size: int, chunk_overlap: int) -> List[ChunkSpan]:
+        """Split the text into fixed-size, overlapping chunk spans.
+
+        The spans cover the same characters as the chunks returned by
+        ``PDFProcessor.process_pdf`` for the same sizes. Each span is
+        attributed to the page its first character is on.
+
+        Args:
+            chunk_size: Number of characters per chunk.
+            chunk_overlap: Number of characters to overlap between chunks.
+
+        Returns:
+            Chunk spans, in document order.
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        length = len(self.text)
+        return [
+            ChunkSpan(self, self.page_at(start), start, min(start + chunk_size, length))
+            for start in range(0, length, chunk_size - chunk_overlap)
+        ]
+
+    def chunk_page(self, page: int, chunk_size: int, chunk_overlap: int) -> List[ChunkSpan]:
+        """Split one page into fixed-size, overlapping chunk spans.
+
+        Unlike ``chunk``, no span crosses into a neighbouring page, so the
+        chunks of a page only depend on that page's text. Whitespace-only
+        chunks, such as those of blank pages, are skipped.
+
+        Args:
+            page: Zero-based page index.
+            chunk_size: Number of characters per chunk.
+            chunk_overlap: Number of characters to overlap between chunks.
+
+        Returns:
+            Chunk spans of the page, in order.
+        """
+        return self.chunk_range(
+            self.page_offsets[page], self.page_offsets[page + 1], chunk_size, chunk_overlap
+        )
+
+    def chunk_range(self, start: int, end: int, chunk_size: int, chunk_overlap: int) -> List[ChunkSpan]:
+        """Split ``text[start:end]`` into fixed-size, overlapping chunk spans.
+
+        No span extends past ``end``, each span is attributed to the page its
+        first character is on, and whitespace-only chunks are skipped.
+
+        Args:
+            start: Offset of the first character.
+            end: Offset one past the last character.
+            chunk_size: Number of characters per chunk.
+            chunk_overlap: Number of characters to overlap between chunks.
+
+        Returns:
+            Chunk spans of the range, in order.
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        spans = []
+        for chunk_start in range(start, end, chunk_size - chunk_overlap):
+            chunk_end = min(chunk_start + chunk_size, end)
+            if not self.text[chunk_start:chunk_end].isspace():
+                spans.append(ChunkSpan(self, self.page_at(chunk_start), chunk_start, chunk_end))
+        return spans
+
+    def chunk_range_tokens(self, start: int, end: int, max_tokens: int, overlap_tokens: int) -> List[ChunkSpan]:
+        """Split ``text[start:end]`` into token-budgeted chunk spans at sentence boundaries.
+
+        See ``token_chunk_bounds`` for how chunk ends are chosen. Each span
+        is attributed to the page its first character is on.
+
+        Args:
+            start: Offset of the first character.
+            end: Offset one past the last character.
+            max_tokens: Maximum estimated tokens per chunk.
+            overlap_tokens: Estimated tokens of context repeated from the previous chunk.
+
+        Returns:
+            Chunk spans of the range, in order.
+        """
+        return [
+            ChunkSpan(self, self.page_at(chunk_start), chunk_start, chunk_end)
+            for chunk_start, chunk_end in token_chunk_bounds(self.text, start, end, max_tokens, overlap_tokens)
+        ]
+
+    def join(self, spans: Sequence[ChunkSpan]) -> str:
+        """Return the text covered by a run of spans from this document.
+
+        Overlapping or adjacent spans are merged, so overlap is not
+        repeated; a contiguous run is a single slice of the buffer, and
+        separate runs are joined with a newline.
+
+        Args:
+            spans: Spans of this document, in document order.
+
+        Returns:
+            The covered text.
+        """
+        runs = []
+        for span in spans:
+            if span.document is not self:
+                raise ValueError(f"Span belongs to document {span.doc_id!r}, not {self.doc_id!r}")
+            if runs and span.start <= runs[-1][1]:
+                runs[-1][1] = max(runs[-1][1], span.end)
+            else:
+                runs.append([span.start, span.end])
+        return "\n".join(self.text[start:end] for start, end in runs)
+
+    def __len__(self) -> int:
+        return len(self.text)
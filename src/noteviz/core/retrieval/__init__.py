@@ -1,9 +1,17 @@
 """Retrieval module for finding relevant text chunks."""
 from .base import RetrievalConfig, RetrievalService
+from .bm25 import BM25Index
 from .cosine import CosineRetrieval
+from .hybrid import HybridConfig, HybridRetrieval
+from .ivf import IVFConfig, IVFRetrieval
 
 __all__ = [
     "RetrievalConfig",
     "RetrievalService",
-    "CosineRetrieval"
+    "CosineRetrieval",
+    "IVFConfig",
+    "IVFRetrieval",
+    "BM25Index",
+    "HybridConfig",
+    "HybridRetrieval",
 ] 
\ No newline at end of file
@@ -1,7 +1,13 @@
 """Base classes for retrieval services."""
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List, Tuple
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+Embeddings = Union[np.ndarray, Sequence[Sequence[float]]]
+"""A 2-D float matrix or a sequence of embedding vectors."""
 
 
 @dataclass
@@ -14,12 +20,22 @@ class RetrievalConfig:
     max_results: int = 5
     """Maximum number of results to return."""
     
+    block_size: int = 1024
+    """Number of query rows and corpus rows scored together in batch queries."""
+    
+    compaction_threshold: float = 0.25
+    """Fraction of removed rows that triggers compaction of an incremental index."""
+    
     def __post_init__(self):
         """Validate configuration values."""
         if not 0 <= self.similarity_threshold <= 1:
             raise ValueError("similarity_threshold must be between 0 and 1")
         if self.max_results <= 0:
             raise ValueError("max_results must be greater than 0")
+        if self.block_size <= 0:
+            raise ValueError("block_size must be greater than 0")
+        if not 0 < self.compaction_threshold <= 1:
+            raise ValueError("compaction_threshold must be between 0 and 1")
 
 
 class RetrievalService(ABC):
@@ -29,12 +45,12 @@ class RetrievalService(ABC):
         self.config = config
     
     @abstractmethod
-    def index(self, texts: List[str], embeddings: List[List[float]]) -> None:
+    def index(self, texts: List[str], embeddings: Embeddings) -> None:
         """Index the texts and their embeddings.
         
         Args:
             texts: List of text chunks.
-            embeddings: List of embedding vectors.
+            embeddings: Embedding vectors, one per text, as a list or a 2-D array.
         """
         pass
     
@@ -48,4 +64,61 @@ class RetrievalService(ABC):
         Returns:
             List of tuples containing (text, similarity_score).
         """
-        pass 
\ No newline at end of file
+        pass 
+    
+    def find_relevant_chunks_batch(self, query_matrix: Embeddings) -> List[List[Tuple[str, float]]]:
+        """Find relevant text chunks for several queries at once.
+        
+        The default implementation answers each query separately; backends
+        that can score queries together should override it.
+        
+        Args:
+            query_matrix: Query embedding vectors, one per row.
+            
+        Returns:
+            One list of (text, similarity_score) tuples per query, in query order.
+        """
+        return [self.find_relevant_chunks(query) for query in query_matrix]
+    
+    @abstractmethod
+    def add(
+        self, texts: List[str], embeddings: Embeddings, ids: Optional[Sequence[str]] = None
+    ) -> List[str]:
+        """Add texts to the index without rebuilding it.
+        
+        Args:
+            texts: List of text chunks.
+            embeddings: Embedding vectors, one per text.
+            ids: Unique ids for the new chunks; generated if omitted.
+            
+        Returns:
+            The ids of the added chunks.
+        """
+        pass
+    
+    @abstractmethod
+    def remove(self, ids: Sequence[str]) -> None:
+        """Remove chunks from the index by id.
+        
+        Args:
+            ids: Ids of the chunks to remove.
+        """
+        pass
+    
+    @abstractmethod
+    def save(self, path: Path) -> None:
+        """Persist the index to a directory.
+        
+        Args:
+            path: Directory to write the index to; it is replaced if it exists.
+        """
+        pass
+    
+    @abstractmethod
+    def load(self, path: Path) -> None:
+        """Replace the current index with one persisted by ``save``.
+        
+        Args:
+            path: Directory the index was saved to.
+        """
+        pass
@@ -0,0 +1,126 @@
+"""Compact inverted index with BM25 scoring."""
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens.
+
+    Args:
+        text: Text to tokenize.
+
+    Returns:
+        List of tokens in text order.
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index over a fixed set of documents, scored with Okapi BM25.
+
+    Postings are stored in CSR form: the documents and term frequencies of
+    term ``t`` are ``doc_ids[offsets[t]:offsets[t + 1]]`` and
+    ``term_freqs[offsets[t]:offsets[t + 1]]``.
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        freqs: List[int] = []
+        lengths = np.empty(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[doc] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc)
+                freqs.append(count)
+
+        order = np.argsort(np.asarray(term_ids, dtype=np.int64), kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.term_freqs = np.minimum(np.asarray(freqs, dtype=np.int64), np.iinfo(np.uint16).max)
+        self.term_freqs = self.term_freqs.astype(np.uint16)[order]
+        doc_freqs = np.bincount(np.asarray(term_ids, dtype=np.int64), minlength=len(self.vocabulary))
+        self.offsets = np.concatenate([[0], np.cumsum(doc_freqs)]).astype(np.int64)
+        self.doc_lengths = lengths
+        self._compute_weights()
+
+    @classmethod
+    def from_arrays(
+        cls,
+        vocabulary: Sequence[str],
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        offsets: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> "BM25Index":
+        """Rebuild an index from the arrays of a previously built one.
+
+        Args:
+            vocabulary: Terms in term-id order.
+            doc_ids: CSR posting documents.
+            term_freqs: CSR posting term frequencies.
+            offsets: CSR offsets, one more than the number of terms.
+            doc_lengths: Token count of each document.
+            k1: Term-frequency saturation parameter.
+            b: Document-length normalization parameter.
+
+        Returns:
+            The index, sharing the given arrays.
+        """
+        if len(offsets) != len(vocabulary) + 1 or not len(doc_ids) == len(term_freqs) == int(offsets[-1]):
+            raise ValueError("BM25 arrays do not match the vocabulary")
+        index = cls.__new__(cls)
+        index.k1 = k1
+        index.b = b
+        index.vocabulary = {term: term_id for term_id, term in enumerate(vocabulary)}
+        index.doc_ids = doc_ids
+        index.term_freqs = term_freqs
+        index.offsets = offsets
+        index.doc_lengths = doc_lengths
+        index._compute_weights()
+        return index
+
+    def _compute_weights(self) -> None:
+        """Derive the idf and length normalization from the postings and lengths."""
+        self.num_docs = len(self.doc_lengths)
+        doc_freqs = np.diff(self.offsets)
+        average_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+        # Per-document part of the BM25 denominator, computed once
+        self._length_norm = (
+            self.k1 * (1 - self.b + self.b * self.doc_lengths / average_length)
+            if average_length else np.full(self.num_docs, self.k1, dtype=np.float32)
+        )
+        self.idf = np.log(1 + (self.num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    def score(self, query: str) -> np.ndarray:
+        """Score every document against a query.
+
+        Args:
+            query: Query text.
+
+        Returns:
+            BM25 score for each document; zero for documents sharing no terms.
+        """
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end].astype(np.float32)
+            # Each document appears at most once per posting list
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self._length_norm[docs])
+        return scores
@@ -1,32 +1,320 @@
 """Cosine similarity-based retrieval service."""
-from typing import List, Tuple
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 import numpy as np
 
-from .base import RetrievalConfig, RetrievalService
+from .base import Embeddings, RetrievalConfig, RetrievalService
+from .storage import (
+    index_writer,
+    load_array,
+    load_texts,
+    read_manifest,
+    save_arrays,
+    save_texts,
+    write_manifest,
+)
+
+# Rows whose norms are within this distance of 1 are treated as normalized
+_UNIT_NORM_TOLERANCE = 1e-3
+
+# Smallest row capacity allocated when an index starts growing
+_MIN_CAPACITY = 64
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale every row of a float32 matrix to unit length.
+    
+    Matrices that are already row-normalized, like OpenAI embeddings, are
+    returned unchanged without a copy. All-zero rows stay zero.
+    
+    Args:
+        matrix: 2-D float32 array.
+        
+    Returns:
+        Row-normalized float32 array.
+    """
+    norms = np.linalg.norm(matrix, axis=1)
+    if np.all(np.abs(norms - 1) <= _UNIT_NORM_TOLERANCE):
+        return matrix
+    norms[norms == 0] = 1
+    return (matrix / norms[:, np.newaxis]).astype(np.float32, copy=False)
+
+
+def prepare_query(query_embedding: List[float], dimensions: int) -> np.ndarray:
+    """Validate a query vector and scale it to unit length.
+    
+    Args:
+        query_embedding: Embedding vector of the query.
+        dimensions: Dimensionality of the indexed vectors.
+        
+    Returns:
+        Unit-length float32 query vector (all zeros if the query is zero).
+    """
+    query = np.asarray(query_embedding, dtype=np.float32)
+    if query.shape != (dimensions,):
+        raise ValueError(f"Query embedding has shape {query.shape}, expected ({dimensions},)")
+    norm = np.linalg.norm(query)
+    return query / norm if norm else query
+
+
+def top_k(scores: np.ndarray, k: int, threshold: float) -> np.ndarray:
+    """Select the indices of the ``k`` best scores at or above ``threshold``.
+    
+    Uses ``argpartition`` so only the selected candidates are fully sorted.
+    
+    Args:
+        scores: 1-D array of similarity scores.
+        k: Maximum number of indices to return.
+        threshold: Minimum score for an index to be selected.
+        
+    Returns:
+        Selected indices, ordered by descending score.
+    """
+    candidates = np.flatnonzero(scores >= threshold)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+@dataclass(frozen=True)
+class _IndexState:
+    """Immutable view of a CosineRetrieval index that queries read from.
+    
+    Writers publish a new state instead of mutating the visible one, so a
+    query that started on an older state keeps a consistent view even while
+    rows are appended or the index is compacted.
+    """
+    
+    matrix: np.ndarray
+    """Row buffer; only the first ``size`` rows are in use."""
+    
+    size: int
+    """Number of rows in use, including removed rows."""
+    
+    texts: Sequence[str]
+    """Texts aligned with the rows in use."""
+    
+    ids: Sequence[str]
+    """Chunk ids aligned with the rows in use."""
+    
+    alive: np.ndarray
+    """Tombstone mask; False marks a removed row."""
+    
+    removed: int = 0
+    """Number of removed rows awaiting compaction."""
+    
+    owned: bool = False
+    """Whether the buffers belong to the index and may be written in place."""
+    
+    @property
+    def rows(self) -> np.ndarray:
+        return self.matrix[:self.size]
+
+
+def _empty_state() -> _IndexState:
+    return _IndexState(
+        matrix=np.empty((0, 0), dtype=np.float32),
+        size=0,
+        texts=[],
+        ids=[],
+        alive=np.empty(0, dtype=bool),
+        owned=True,
+    )
 
 
 class CosineRetrieval(RetrievalService):
-    """Cosine similarity-based retrieval service."""
+    """Cosine similarity-based retrieval service.
+    
+    ``index`` stores a row-normalized float32 matrix, so each query costs a
+    single matrix-vector product followed by a partial top-k selection.
+    
+    The index can also be updated in place: ``add`` appends rows to a buffer
+    that grows geometrically, and ``remove`` marks rows with tombstones that
+    are dropped by a compaction once ``config.compaction_threshold`` of the
+    rows are removed.
+    """
     
     def __init__(self, config: RetrievalConfig):
         super().__init__(config)
-        self.texts = []
-        self.embeddings = []
+        self._state = _empty_state()
+        self._rows: Optional[Dict[str, int]] = {}
+        self._next_id = 0
+        self._write_lock = threading.Lock()
+    
+    @property
+    def texts(self) -> Sequence[str]:
+        """Indexed texts, aligned with ``embeddings`` (includes removed rows until compaction)."""
+        return self._state.texts
+    
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Row-normalized float32 matrix of the indexed rows."""
+        return self._state.rows
     
-    def index(self, texts: List[str], embeddings: List[List[float]]) -> None:
-        """Index the texts and their embeddings.
+    @property
+    def ids(self) -> Sequence[str]:
+        """Chunk ids, aligned with ``embeddings``."""
+        return self._state.ids
+    
+    def __len__(self) -> int:
+        state = self._state
+        return state.size - state.removed
+    
+    def index(
+        self, texts: List[str], embeddings: Embeddings, ids: Optional[Sequence[str]] = None
+    ) -> None:
+        """Index the texts and their embeddings, replacing any previous index.
+        
+        Row-normalized float32 matrices are indexed as-is, without copying;
+        anything else is converted and normalized once here.
         
         Args:
             texts: List of text chunks.
-            embeddings: List of embedding vectors.
+            embeddings: Embedding vectors, one per text, as a list or a 2-D array.
+            ids: Unique ids for the chunks; ``"0"`` to ``str(len(texts) - 1)`` if omitted.
         """
         if len(texts) != len(embeddings):
             raise ValueError("Number of texts and embeddings must match")
         if not texts:
             raise ValueError("No texts provided for indexing")
+        if ids is None:
+            ids = [str(i) for i in range(len(texts))]
+        elif len(ids) != len(texts):
+            raise ValueError("Number of texts and ids must match")
+        elif len(set(ids)) != len(ids):
+            raise ValueError("Chunk ids must be unique")
             
-        self.texts = texts
-        self.embeddings = embeddings
+        matrix = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        with self._write_lock:
+            self._state = _IndexState(
+                matrix=matrix,
+                size=len(matrix),
+                texts=texts,
+                ids=[str(chunk_id) for chunk_id in ids],
+                alive=np.ones(len(matrix), dtype=bool),
+            )
+            self._rows = None
+            self._next_id = len(texts)
+    
+    def add(
+        self, texts: List[str], embeddings: Embeddings, ids: Optional[Sequence[str]] = None
+    ) -> List[str]:
+        """Append texts to the index without rebuilding it.
+        
+        Rows are written into spare buffer capacity; when the buffer is full
+        it is reallocated at twice its size, so appends are amortized O(1)
+        per row.
+        
+        Args:
+            texts: List of text chunks.
+            embeddings: Embedding vectors, one per text.
+            ids: Unique ids for the new chunks; generated if omitted.
+            
+        Returns:
+            The ids of the added chunks.
+        """
+        if len(texts) != len(embeddings):
+            raise ValueError("Number of texts and embeddings must match")
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("Number of texts and ids must match")
+        if not texts:
+            return []
+            
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        with self._write_lock:
+            state = self._state
+            if state.size and vectors.shape[1] != state.matrix.shape[1]:
+                raise ValueError(
+                    f"Embeddings have {vectors.shape[1]} dimensions, index has {state.matrix.shape[1]}"
+                )
+            rows = self._row_map()
+            if ids is None:
+                ids = []
+                while len(ids) < len(texts):
+                    if str(self._next_id) not in rows:
+                        ids.append(str(self._next_id))
+                    self._next_id += 1
+            ids = [str(chunk_id) for chunk_id in ids]
+            if len(set(ids)) != len(ids) or any(chunk_id in rows for chunk_id in ids):
+                raise ValueError("Chunk ids must be unique")
+                
+            size = state.size + len(texts)
+            if state.owned and size <= len(state.matrix):
+                matrix, alive, all_texts, all_ids = state.matrix, state.alive, state.texts, state.ids
+            else:
+                capacity = max(size, 2 * len(state.matrix), _MIN_CAPACITY)
+                matrix = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+                matrix[:state.size] = state.rows
+                alive = np.zeros(capacity, dtype=bool)
+                alive[:state.size] = state.alive[:state.size]
+                all_texts, all_ids = list(state.texts), list(state.ids)
+                
+            # Rows past state.size are invisible to queries until the new state is published
+            matrix[state.size:size] = vectors
+            alive[state.size:size] = True
+            all_texts.extend(texts)
+            all_ids.extend(ids)
+            for offset, chunk_id in enumerate(ids):
+                rows[chunk_id] = state.size + offset
+            self._state = _IndexState(matrix, size, all_texts, all_ids, alive, state.removed, owned=True)
+        return ids
+    
+    def remove(self, ids: Sequence[str]) -> None:
+        """Remove chunks from the index by id.
+        
+        Removed rows are tombstoned and skipped by queries immediately. Once
+        the removed fraction exceeds ``config.compaction_threshold``, the
+        live rows are copied into a new buffer that replaces the old one.
+        
+        Args:
+            ids: Ids of the chunks to remove.
+        """
+        with self._write_lock:
+            rows = self._row_map()
+            unknown = [chunk_id for chunk_id in ids if chunk_id not in rows]
+            if unknown:
+                raise ValueError(f"Unknown chunk ids: {unknown[:5]}")
+            state = self._state
+            # The published mask may be read by running queries, so tombstone a copy
+            alive = state.alive.copy()
+            for chunk_id in set(ids):
+                alive[rows.pop(chunk_id)] = False
+            state = _IndexState(
+                state.matrix, state.size, state.texts, state.ids, alive,
+                state.removed + len(set(ids)), state.owned
+            )
+            self._state = state
+            if state.removed > self.config.compaction_threshold * state.size:
+                self._compact(state)
+    
+    def compact(self) -> None:
+        """Drop removed rows from the index now."""
+        with self._write_lock:
+            self._compact(self._state)
+    
+    def _compact(self, state: _IndexState) -> None:
+        """Build a tombstone-free state and publish it; requires the write lock."""
+        keep = np.flatnonzero(state.alive[:state.size])
+        capacity = max(2 * len(keep), _MIN_CAPACITY)
+        matrix = np.empty((capacity, state.matrix.shape[1]), dtype=np.float32)
+        matrix[:len(keep)] = state.rows[keep]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(keep)] = True
+        texts = [state.texts[i] for i in keep]
+        ids = [state.ids[i] for i in keep]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self._state = _IndexState(matrix, len(keep), texts, ids, alive, 0, owned=True)
+    
+    def _row_map(self) -> Dict[str, int]:
+        """Return the id-to-row mapping, building it on first use after a reset."""
+        if self._rows is None:
+            state = self._state
+            self._rows = {
+                chunk_id: row for row, chunk_id in enumerate(state.ids) if state.alive[row]
+            }
+        return self._rows
     
     def find_relevant_chunks(self, query_embedding: List[float]) -> List[Tuple[str, float]]:
         """Find relevant text chunks based on cosine similarity.
@@ -37,27 +325,132 @@ class CosineRetrieval(RetrievalService):
         Returns:
             List of tuples containing (text, similarity_score).
         """
-        if not self.texts or not self.embeddings:
+        state = self._state
+        return [(state.texts[row], score) for row, score in self._search(state, query_embedding)]
+    
+    def find_relevant_rows(self, query_embedding: List[float]) -> List[Tuple[int, float]]:
+        """Like ``find_relevant_chunks``, but return row positions instead of texts.
+        
+        Args:
+            query_embedding: Embedding vector of the query.
+            
+        Returns:
+            List of tuples containing (row, similarity_score).
+        """
+        return self._search(self._state, query_embedding)
+    
+    def _search(self, state: _IndexState, query_embedding: List[float]) -> List[Tuple[int, float]]:
+        if state.size == state.removed:
+            raise ValueError("No indexed texts available")
+            
+        query = prepare_query(query_embedding, state.matrix.shape[1])
+        similarities = state.rows @ query
+        if state.removed:
+            similarities[~state.alive[:state.size]] = -np.inf
+        indices = top_k(similarities, self.config.max_results, self.config.similarity_threshold)
+        return [(int(i), min(float(similarities[i]), 1.0)) for i in indices]
+    
+    def find_relevant_chunks_batch(self, query_matrix: Embeddings) -> List[List[Tuple[str, float]]]:
+        """Find relevant text chunks for several queries with matrix products.
+        
+        Queries and corpus rows are scored in blocks of ``config.block_size``
+        rows, so at most ``block_size * block_size`` scores are held at once.
+        Each block keeps only its per-query top-k candidates, which are merged
+        with the running best candidates before the next block.
+        
+        Args:
+            query_matrix: Query embedding vectors, one per row.
+            
+        Returns:
+            One list of (text, similarity_score) tuples per query, in query order.
+        """
+        state = self._state
+        if state.size == state.removed:
             raise ValueError("No indexed texts available")
             
-        # Convert embeddings to numpy arrays for efficient computation
-        query_array = np.array(query_embedding)
-        embeddings_array = np.array(self.embeddings)
-        
-        # Compute cosine similarities
-        similarities = np.dot(embeddings_array, query_array) / (
-            np.linalg.norm(embeddings_array, axis=1) * np.linalg.norm(query_array)
-        )
-        
-        # Sort by similarity and filter by threshold
-        indices = np.argsort(similarities)[::-1]
-        results = []
-        for idx in indices:
-            similarity = similarities[idx]
-            if similarity < self.config.similarity_threshold:
-                break
-            if len(results) >= self.config.max_results:
-                break
-            results.append((self.texts[idx], float(similarity)))
-        
-        return results 
\ No newline at end of file
+        dimensions = state.matrix.shape[1]
+        queries = np.asarray(query_matrix, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != dimensions:
+            raise ValueError(f"Query matrix has shape {queries.shape}, expected (n, {dimensions})")
+        queries = normalize_rows(queries)
+        
+        corpus = state.rows
+        k = self.config.max_results
+        block = self.config.block_size
+        results: List[List[Tuple[str, float]]] = []
+        for q_start in range(0, len(queries), block):
+            query_block = queries[q_start:q_start + block]
+            best_scores = np.empty((len(query_block), 0), dtype=np.float32)
+            best_indices = np.empty((len(query_block), 0), dtype=np.int64)
+            for c_start in range(0, len(corpus), block):
+                scores = query_block @ corpus[c_start:c_start + block].T
+                if state.removed:
+                    scores[:, ~state.alive[c_start:c_start + scores.shape[1]]] = -np.inf
+                indices = np.broadcast_to(np.arange(c_start, c_start + scores.shape[1]), scores.shape)
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_indices = np.concatenate([best_indices, indices], axis=1)
+                if best_scores.shape[1] > k:
+                    keep = np.argpartition(best_scores, -k, axis=1)[:, -k:]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_indices = np.take_along_axis(best_indices, keep, axis=1)
+                    
+            for row_scores, row_indices in zip(best_scores, best_indices):
+                selected = top_k(row_scores, k, self.config.similarity_threshold)
+                results.append([
+                    (state.texts[row_indices[i]], min(float(row_scores[i]), 1.0))
+                    for i in selected
+                ])
+        return results
+    
+    def save(self, path: Path) -> None:
+        """Persist the normalized matrix, texts and ids to a directory.
+        
+        Removed rows are not written, so the saved index is compacted.
+        
+        Args:
+            path: Directory to write the index to; it is replaced if it exists.
+        """
+        state = self._state
+        if state.size == state.removed:
+            raise ValueError("No indexed texts available")
+        embeddings, texts, ids = state.rows, state.texts, state.ids
+        if state.removed:
+            keep = np.flatnonzero(state.alive[:state.size])
+            embeddings = embeddings[keep]
+            texts = [texts[i] for i in keep]
+            ids = [ids[i] for i in keep]
+        with index_writer(path) as directory:
+            save_arrays(directory, embeddings=embeddings)
+            save_texts(directory, texts)
+            save_texts(directory, ids, name="ids")
+            write_manifest(
+                directory, "cosine", count=len(texts), dimensions=int(embeddings.shape[1])
+            )
+    
+    def load(self, path: Path) -> None:
+        """Memory-map an index persisted by ``save``.
+        
+        Opening is independent of the index size; rows and texts are paged in
+        from disk as queries touch them. The first ``add`` copies the mapped
+        rows into a writable buffer.
+        
+        Args:
+            path: Directory the index was saved to.
+        """
+        directory = Path(path)
+        manifest = read_manifest(directory, "cosine")
+        embeddings = load_array(directory, "embeddings")
+        texts = load_texts(directory)
+        ids = load_texts(directory, name="ids")
+        if not len(texts) == len(ids) == len(embeddings) == manifest["count"]:
+            raise ValueError(f"Index at {directory} has mismatched texts and embeddings")
+        with self._write_lock:
+            self._state = _IndexState(
+                matrix=embeddings,
+                size=len(embeddings),
+                texts=texts,
+                ids=ids,
+                alive=np.ones(len(embeddings), dtype=bool),
+            )
+            self._rows = None
+            self._next_id = len(embeddings)
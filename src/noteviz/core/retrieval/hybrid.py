@@ -0,0 +1,314 @@
+"""Hybrid lexical (BM25) and dense (cosine) retrieval service."""
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .base import Embeddings, RetrievalConfig, RetrievalService
+from .bm25 import BM25Index
+from .cosine import CosineRetrieval, top_k
+from .storage import (
+    index_writer,
+    load_array,
+    load_texts,
+    read_manifest,
+    save_arrays,
+    save_texts,
+    write_manifest,
+)
+
+
+@dataclass
+class HybridConfig(RetrievalConfig):
+    """Configuration for the hybrid retrieval service.
+
+    ``similarity_threshold`` applies to the dense cosine candidates only.
+    """
+
+    k1: float = 1.5
+    """BM25 term-frequency saturation parameter."""
+
+    b: float = 0.75
+    """BM25 document-length normalization parameter."""
+
+    rrf_k: int = 60
+    """Reciprocal rank fusion constant; larger values flatten rank differences."""
+
+    candidates: int = 50
+    """Number of candidates taken from each ranker before fusion."""
+
+    def __post_init__(self):
+        """Validate configuration values."""
+        super().__post_init__()
+        if self.k1 < 0:
+            raise ValueError("k1 must not be negative")
+        if not 0 <= self.b <= 1:
+            raise ValueError("b must be between 0 and 1")
+        if self.rrf_k <= 0:
+            raise ValueError("rrf_k must be greater than 0")
+        if self.candidates < self.max_results:
+            raise ValueError("candidates must be at least max_results")
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int) -> Dict[int, float]:
+    """Fuse several rankings with reciprocal rank fusion.
+
+    Each item scores ``sum(1 / (k + rank))`` over the rankings it appears in,
+    with ranks starting at 1.
+
+    Args:
+        rankings: Item ids ordered from best to worst, one sequence per ranker.
+        k: Fusion constant.
+
+    Returns:
+        Mapping from item id to fused score.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+class HybridRetrieval(RetrievalService):
+    """Retrieval that fuses BM25 keyword matches with cosine similarity.
+
+    Exact-term queries such as names and formulas are found by the BM25
+    inverted index even when their embeddings are not close. ``search``
+    without a query embedding runs in lexical-only mode and needs no
+    embedding API call.
+
+    ``add`` and ``remove`` update the dense index in place. BM25 weights
+    depend on the whole corpus, so the inverted index is rebuilt from the
+    remaining texts on each update.
+    """
+
+    def __init__(self, config: HybridConfig):
+        super().__init__(config)
+        self.texts: Sequence[str] = []
+        self.ids: Sequence[str] = []
+        self.lexical: Optional[BM25Index] = None
+        self.dense = CosineRetrieval(replace(config, max_results=config.candidates))
+        self._has_embeddings = False
+        self._positions: Dict[str, int] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def index(
+        self,
+        texts: List[str],
+        embeddings: Optional[Embeddings] = None,
+        ids: Optional[Sequence[str]] = None
+    ) -> None:
+        """Build the inverted index and, if embeddings are given, the dense index.
+
+        Args:
+            texts: List of text chunks.
+            embeddings: Embedding vectors, one per text; omit for a lexical-only index.
+            ids: Unique ids for the chunks; ``"0"`` to ``str(len(texts) - 1)`` if omitted.
+        """
+        if not texts:
+            raise ValueError("No texts provided for indexing")
+        if ids is None:
+            ids = [str(i) for i in range(len(texts))]
+        elif len(ids) != len(texts):
+            raise ValueError("Number of texts and ids must match")
+        elif len(set(ids)) != len(ids):
+            raise ValueError("Chunk ids must be unique")
+        if embeddings is not None:
+            self.dense.index(texts, embeddings, ids=ids)
+        self._has_embeddings = embeddings is not None
+        self._set_texts(texts, [str(chunk_id) for chunk_id in ids])
+        self._next_id = len(texts)
+
+    def add(
+        self,
+        texts: List[str],
+        embeddings: Optional[Embeddings] = None,
+        ids: Optional[Sequence[str]] = None
+    ) -> List[str]:
+        """Add texts to the dense index in place and rebuild the inverted index.
+
+        Args:
+            texts: List of text chunks.
+            embeddings: Embedding vectors, one per text; required unless the
+                index is lexical-only.
+            ids: Unique ids for the new chunks; generated if omitted.
+
+        Returns:
+            The ids of the added chunks.
+        """
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("Number of texts and ids must match")
+        if not texts:
+            return []
+        if self.lexical is None:
+            ids = [str(i) for i in range(len(texts))] if ids is None else ids
+            self.index(texts, embeddings, ids)
+            return list(self.ids)
+        if (embeddings is not None) != self._has_embeddings:
+            raise ValueError(
+                "Embeddings are required for this index" if self._has_embeddings
+                else "This index is lexical-only and takes no embeddings"
+            )
+
+        if self._has_embeddings:
+            ids = self.dense.add(texts, embeddings, ids)
+        else:
+            if ids is None:
+                ids = []
+                while len(ids) < len(texts):
+                    if str(self._next_id) not in self._positions:
+                        ids.append(str(self._next_id))
+                    self._next_id += 1
+            ids = [str(chunk_id) for chunk_id in ids]
+            if len(set(ids)) != len(ids) or any(chunk_id in self._positions for chunk_id in ids):
+                raise ValueError("Chunk ids must be unique")
+        self._set_texts(list(self.texts) + list(texts), list(self.ids) + ids)
+        return ids
+
+    def remove(self, ids: Sequence[str]) -> None:
+        """Remove chunks by id from the dense index and rebuild the inverted index.
+
+        Args:
+            ids: Ids of the chunks to remove.
+        """
+        unknown = [chunk_id for chunk_id in ids if chunk_id not in self._positions]
+        if unknown:
+            raise ValueError(f"Unknown chunk ids: {unknown[:5]}")
+        if self._has_embeddings:
+            self.dense.remove(ids)
+        removed = {self._positions[chunk_id] for chunk_id in ids}
+        keep = [i for i in range(len(self.texts)) if i not in removed]
+        self._set_texts([self.texts[i] for i in keep], [self.ids[i] for i in keep])
+
+    def _set_texts(self, texts: Sequence[str], ids: Sequence[str]) -> None:
+        """Replace the indexed texts and rebuild the inverted index over them."""
+        self.texts = texts
+        self.ids = ids
+        self._positions = {chunk_id: position for position, chunk_id in enumerate(ids)}
+        self.lexical = BM25Index(texts, k1=self.config.k1, b=self.config.b) if texts else None
+
+    def find_relevant_chunks(self, query_embedding: List[float]) -> List[Tuple[str, float]]:
+        """Find relevant text chunks by cosine similarity alone.
+
+        Use ``search`` to include keyword matches.
+
+        Args:
+            query_embedding: Embedding vector of the query.
+
+        Returns:
+            List of tuples containing (text, similarity_score).
+        """
+        if not self._has_embeddings:
+            raise ValueError("No indexed embeddings available")
+        return self.dense.find_relevant_chunks(query_embedding)[:self.config.max_results]
+
+    def search(
+        self, query: str, query_embedding: Optional[List[float]] = None
+    ) -> List[Tuple[str, float]]:
+        """Find relevant text chunks for a text query.
+
+        Without ``query_embedding`` (or for a lexical-only index) results are
+        ranked by BM25 and scored with it. Otherwise the BM25 and cosine
+        candidate lists are fused with reciprocal rank fusion and scored with
+        the fused value.
+
+        Args:
+            query: Query text.
+            query_embedding: Embedding vector of the query, if available.
+
+        Returns:
+            List of tuples containing (text, score).
+        """
+        if self.lexical is None:
+            raise ValueError("No indexed texts available")
+
+        bm25 = self.lexical.score(query)
+        lexical = top_k(bm25, self.config.candidates, np.finfo(np.float32).tiny)
+        if query_embedding is None or not self._has_embeddings:
+            return [
+                (self.texts[i], float(bm25[i])) for i in lexical[:self.config.max_results]
+            ]
+
+        dense_ids = self.dense.ids
+        dense = [self._positions[dense_ids[row]] for row, _ in self.dense.find_relevant_rows(query_embedding)]
+        fused = reciprocal_rank_fusion([lexical.tolist(), dense], self.config.rrf_k)
+        ranked = sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.texts[i], score) for i, score in ranked[:self.config.max_results]]
+
+    def save(self, path: Path) -> None:
+        """Persist the BM25 postings, texts and dense index to a directory.
+
+        The BM25 index is written as its CSR arrays and vocabulary; the
+        dense index, if any, is written by ``CosineRetrieval.save`` to the
+        ``dense`` subdirectory.
+
+        Args:
+            path: Directory to write the index to; it is replaced if it exists.
+        """
+        if self.lexical is None:
+            raise ValueError("No indexed texts available")
+        lexical = self.lexical
+        with index_writer(path) as directory:
+            save_arrays(
+                directory,
+                doc_ids=lexical.doc_ids,
+                term_freqs=lexical.term_freqs,
+                offsets=lexical.offsets,
+                doc_lengths=lexical.doc_lengths,
+            )
+            save_texts(directory, lexical.vocabulary, name="vocabulary")
+            save_texts(directory, self.texts)
+            save_texts(directory, self.ids, name="ids")
+            if self._has_embeddings:
+                self.dense.save(directory / "dense")
+            write_manifest(
+                directory,
+                "hybrid",
+                count=len(self.texts),
+                terms=len(lexical.vocabulary),
+                has_embeddings=self._has_embeddings,
+            )
+
+    def load(self, path: Path) -> None:
+        """Load an index persisted by ``save``.
+
+        Postings, texts and the dense rows are memory-mapped; the
+        vocabulary is read into a dictionary.
+
+        Args:
+            path: Directory the index was saved to.
+        """
+        directory = Path(path)
+        manifest = read_manifest(directory, "hybrid")
+        texts = load_texts(directory)
+        if len(texts) != manifest["count"]:
+            raise ValueError(f"Index at {directory} has mismatched texts")
+        lexical = BM25Index.from_arrays(
+            load_texts(directory, name="vocabulary"),
+            load_array(directory, "doc_ids"),
+            load_array(directory, "term_freqs"),
+            np.asarray(load_array(directory, "offsets")),
+            np.asarray(load_array(directory, "doc_lengths")),
+            k1=self.config.k1,
+            b=self.config.b,
+        )
+        if lexical.num_docs != len(texts):
+            raise ValueError(f"Index at {directory} has mismatched texts and postings")
+        ids = load_texts(directory, name="ids")
+        if len(ids) != len(texts):
+            raise ValueError(f"Index at {directory} has mismatched texts and ids")
+        if manifest["has_embeddings"]:
+            self.dense.load(directory / "dense")
+            if len(self.dense) != len(texts):
+                raise ValueError(f"Index at {directory} has mismatched texts and embeddings")
+        self.lexical = lexical
+        self.texts = texts
+        self.ids = ids
+        self._positions = {chunk_id: position for position, chunk_id in enumerate(ids)}
+        self._has_embeddings = manifest["has_embeddings"]
+        self._next_id = len(texts)
@@ -0,0 +1,376 @@
+"""Inverted-file (IVF) approximate nearest-neighbour retrieval service."""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .base import Embeddings, RetrievalConfig, RetrievalService
+from .cosine import normalize_rows, prepare_query, top_k
+from .storage import (
+    index_writer,
+    load_array,
+    load_texts,
+    read_manifest,
+    save_arrays,
+    save_texts,
+    write_manifest,
+)
+
+
+@dataclass
+class IVFConfig(RetrievalConfig):
+    """Configuration for the IVF retrieval service."""
+
+    n_lists: Optional[int] = None
+    """Number of k-means clusters (inverted lists); defaults to sqrt(corpus size).
+
+    Capped at the number of training rows.
+    """
+
+    nprobe: int = 8
+    """Number of closest lists scanned per query; higher is slower but more accurate."""
+
+    kmeans_iterations: int = 20
+    """Number of k-means refinement iterations when training the coarse quantizer."""
+
+    training_sample: int = 50_000
+    """Maximum number of rows used to train the coarse quantizer."""
+
+    seed: int = 0
+    """Random seed for centroid initialization and training sampling."""
+
+    def __post_init__(self):
+        """Validate configuration values."""
+        super().__post_init__()
+        if self.n_lists is not None and self.n_lists <= 0:
+            raise ValueError("n_lists must be greater than 0")
+        if self.nprobe <= 0:
+            raise ValueError("nprobe must be greater than 0")
+        if self.kmeans_iterations < 0:
+            raise ValueError("kmeans_iterations must not be negative")
+        if self.training_sample <= 0:
+            raise ValueError("training_sample must be greater than 0")
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, block_size: int) -> np.ndarray:
+    """Assign each unit vector to the centroid with the highest cosine similarity.
+
+    Args:
+        vectors: Row-normalized float32 matrix.
+        centroids: Row-normalized float32 centroid matrix.
+        block_size: Number of vectors scored at once.
+
+    Returns:
+        Centroid index for every vector.
+    """
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        scores = vectors[start:start + block_size] @ centroids.T
+        assignments[start:start + block_size] = np.argmax(scores, axis=1)
+    return assignments
+
+
+def train_centroids(
+    vectors: np.ndarray, n_lists: int, iterations: int, rng: np.random.Generator, block_size: int
+) -> np.ndarray:
+    """Train a spherical k-means coarse quantizer.
+
+    Args:
+        vectors: Row-normalized float32 training matrix.
+        n_lists: Number of centroids to learn.
+        iterations: Number of assignment/update rounds.
+        rng: Random generator for initialization and empty-cluster reseeding.
+        block_size: Number of vectors scored at once.
+
+    Returns:
+        Row-normalized float32 centroid matrix of shape ``(n_lists, dim)``.
+    """
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids, block_size)
+        counts = np.bincount(assignments, minlength=n_lists)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)])[nonempty]
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(vectors[np.argsort(assignments, kind="stable")], starts, axis=0)
+        empty = counts == 0
+        if empty.any():
+            # Reseed empty clusters with random training vectors
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFRetrieval(RetrievalService):
+    """Approximate cosine retrieval with an inverted-file index.
+
+    A spherical k-means coarse quantizer partitions the corpus into
+    ``n_lists`` clusters. Rows are stored contiguously per cluster, and a
+    query only scores the rows of the ``nprobe`` clusters whose centroids
+    are most similar to it.
+
+    ``add`` assigns new rows to their nearest list without retraining the
+    quantizer, and ``remove`` tombstones rows until
+    ``config.compaction_threshold`` of them are removed.
+    """
+
+    def __init__(self, config: IVFConfig):
+        super().__init__(config)
+        self.texts: Sequence[str] = []
+        self.ids: Sequence[str] = []
+        self.alive = np.empty(0, dtype=bool)
+        self.removed = 0
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.embeddings = np.empty((0, 0), dtype=np.float32)
+        self.row_ids = np.empty(0, dtype=np.int64)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self._rows: Optional[Dict[str, int]] = None
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.texts) - self.removed
+
+    def index(
+        self, texts: List[str], embeddings: Embeddings, ids: Optional[Sequence[str]] = None
+    ) -> None:
+        """Train the coarse quantizer and build the inverted lists.
+
+        Args:
+            texts: List of text chunks.
+            embeddings: Embedding vectors, one per text, as a list or a 2-D array.
+            ids: Unique ids for the chunks; ``"0"`` to ``str(len(texts) - 1)`` if omitted.
+        """
+        if len(texts) != len(embeddings):
+            raise ValueError("Number of texts and embeddings must match")
+        if not texts:
+            raise ValueError("No texts provided for indexing")
+        if ids is None:
+            ids = [str(i) for i in range(len(texts))]
+        elif len(ids) != len(texts):
+            raise ValueError("Number of texts and ids must match")
+        elif len(set(ids)) != len(ids):
+            raise ValueError("Chunk ids must be unique")
+
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        rng = np.random.default_rng(self.config.seed)
+        training = vectors
+        if len(vectors) > self.config.training_sample:
+            training = vectors[rng.choice(len(vectors), self.config.training_sample, replace=False)]
+        # k-means initializes every centroid from a distinct training row
+        n_lists = min(self.config.n_lists or max(1, int(np.sqrt(len(vectors)))), len(training))
+        self.centroids = train_centroids(
+            training, n_lists, self.config.kmeans_iterations, rng, self.config.block_size
+        )
+
+        assignments = nearest_centroids(vectors, self.centroids, self.config.block_size)
+        self._layout(vectors, np.arange(len(vectors)), assignments)
+        self.texts = texts
+        self.ids = [str(chunk_id) for chunk_id in ids]
+        self.alive = np.ones(len(texts), dtype=bool)
+        self.removed = 0
+        self._rows = None
+        self._next_id = len(texts)
+
+    def add(
+        self, texts: List[str], embeddings: Embeddings, ids: Optional[Sequence[str]] = None
+    ) -> List[str]:
+        """Assign texts to their nearest lists without retraining the quantizer.
+
+        The lists are laid out again with the new rows in place, which
+        copies the stored rows once per call, so rows are best added in
+        batches. An empty index is built with ``index`` instead.
+
+        Args:
+            texts: List of text chunks.
+            embeddings: Embedding vectors, one per text.
+            ids: Unique ids for the new chunks; generated if omitted.
+
+        Returns:
+            The ids of the added chunks.
+        """
+        if len(texts) != len(embeddings):
+            raise ValueError("Number of texts and embeddings must match")
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("Number of texts and ids must match")
+        if not texts:
+            return []
+        if not len(self.texts):
+            ids = [str(i) for i in range(len(texts))] if ids is None else ids
+            self.index(texts, embeddings, ids)
+            return list(self.ids)
+
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if vectors.shape[1] != self.embeddings.shape[1]:
+            raise ValueError(
+                f"Embeddings have {vectors.shape[1]} dimensions, index has {self.embeddings.shape[1]}"
+            )
+        rows = self._row_map()
+        if ids is None:
+            ids = []
+            while len(ids) < len(texts):
+                if str(self._next_id) not in rows:
+                    ids.append(str(self._next_id))
+                self._next_id += 1
+        ids = [str(chunk_id) for chunk_id in ids]
+        if len(set(ids)) != len(ids) or any(chunk_id in rows for chunk_id in ids):
+            raise ValueError("Chunk ids must be unique")
+
+        size = len(self.texts)
+        assignments = np.concatenate([
+            self._assignments(),
+            nearest_centroids(vectors, self.centroids, self.config.block_size),
+        ])
+        self._layout(
+            np.concatenate([self.embeddings, vectors]),
+            np.concatenate([self.row_ids, np.arange(size, size + len(texts))]),
+            assignments,
+        )
+        self.texts = list(self.texts) + list(texts)
+        self.ids = list(self.ids) + ids
+        self.alive = np.concatenate([self.alive, np.ones(len(texts), dtype=bool)])
+        for offset, chunk_id in enumerate(ids):
+            rows[chunk_id] = size + offset
+        return ids
+
+    def remove(self, ids: Sequence[str]) -> None:
+        """Remove chunks from the index by id.
+
+        Removed rows are tombstoned and skipped by queries immediately. Once
+        the removed fraction exceeds ``config.compaction_threshold``, the
+        live rows are laid out again without them.
+
+        Args:
+            ids: Ids of the chunks to remove.
+        """
+        rows = self._row_map()
+        unknown = [chunk_id for chunk_id in ids if chunk_id not in rows]
+        if unknown:
+            raise ValueError(f"Unknown chunk ids: {unknown[:5]}")
+        alive = self.alive.copy()
+        for chunk_id in set(ids):
+            alive[rows.pop(chunk_id)] = False
+        self.alive = alive
+        self.removed += len(set(ids))
+        if self.removed > self.config.compaction_threshold * len(self.texts):
+            self.compact()
+
+    def compact(self) -> None:
+        """Drop removed rows from the index now."""
+        if not self.removed:
+            return
+        keep = np.flatnonzero(self.alive)
+        renumber = np.full(len(self.texts), -1, dtype=np.int64)
+        renumber[keep] = np.arange(len(keep))
+        live = self.alive[self.row_ids]
+        self._layout(
+            np.asarray(self.embeddings)[live], renumber[self.row_ids[live]], self._assignments()[live]
+        )
+        self.texts = [self.texts[i] for i in keep]
+        self.ids = [self.ids[i] for i in keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.removed = 0
+        self._rows = None
+
+    def _assignments(self) -> np.ndarray:
+        """List index of every stored row, in storage order."""
+        return np.repeat(np.arange(len(self.centroids)), np.diff(self.list_offsets))
+
+    def _layout(self, vectors: np.ndarray, row_ids: np.ndarray, assignments: np.ndarray) -> None:
+        """Store each list's rows contiguously so a probe scans one slice."""
+        order = np.argsort(assignments, kind="stable")
+        self.embeddings = vectors[order]
+        self.row_ids = np.asarray(row_ids, dtype=np.int64)[order]
+        self.list_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignments, minlength=len(self.centroids)))]
+        )
+
+    def _row_map(self) -> Dict[str, int]:
+        """Return the id-to-row mapping, building it on first use after a reset."""
+        if self._rows is None:
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids) if self.alive[row]}
+        return self._rows
+
+    def find_relevant_chunks(self, query_embedding: List[float]) -> List[Tuple[str, float]]:
+        """Find relevant text chunks by scanning the closest inverted lists.
+
+        Args:
+            query_embedding: Embedding vector of the query.
+
+        Returns:
+            List of tuples containing (text, similarity_score).
+        """
+        if not len(self):
+            raise ValueError("No indexed texts available")
+
+        query = prepare_query(query_embedding, self.embeddings.shape[1])
+        nprobe = min(self.config.nprobe, len(self.centroids))
+        probes = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+        rows = []
+        scores = []
+        for probe in probes:
+            start, end = self.list_offsets[probe], self.list_offsets[probe + 1]
+            rows.append(np.arange(start, end))
+            scores.append(self.embeddings[start:end] @ query)
+        rows = np.concatenate(rows)
+        similarities = np.concatenate(scores)
+        if self.removed:
+            similarities[~self.alive[self.row_ids[rows]]] = -np.inf
+        selected = top_k(similarities, self.config.max_results, self.config.similarity_threshold)
+        return [
+            (self.texts[self.row_ids[rows[i]]], min(float(similarities[i]), 1.0))
+            for i in selected
+        ]
+
+    def save(self, path: Path) -> None:
+        """Persist the quantizer, inverted lists, texts and ids to a directory.
+
+        Removed rows are compacted away first.
+
+        Args:
+            path: Directory to write the index to; it is replaced if it exists.
+        """
+        if not len(self):
+            raise ValueError("No indexed texts available")
+        self.compact()
+        with index_writer(path) as directory:
+            save_arrays(
+                directory,
+                embeddings=self.embeddings,
+                centroids=self.centroids,
+                row_ids=self.row_ids,
+                list_offsets=self.list_offsets,
+            )
+            save_texts(directory, self.texts)
+            save_texts(directory, self.ids, name="ids")
+            write_manifest(
+                directory,
+                "ivf",
+                count=len(self.texts),
+                dimensions=int(self.embeddings.shape[1]),
+                n_lists=len(self.centroids),
+            )
+
+    def load(self, path: Path) -> None:
+        """Memory-map an index persisted by ``save``.
+
+        Args:
+            path: Directory the index was saved to.
+        """
+        directory = Path(path)
+        read_manifest(directory, "ivf")
+        embeddings = load_array(directory, "embeddings")
+        texts = load_texts(directory)
+        ids = load_texts(directory, name="ids")
+        if not len(texts) == len(ids) == len(embeddings):
+            raise ValueError(f"Index at {directory} has mismatched texts and embeddings")
+        self.centroids = np.asarray(load_array(directory, "centroids"))
+        self.row_ids = load_array(directory, "row_ids")
+        self.list_offsets = np.asarray(load_array(directory, "list_offsets"))
+        self.embeddings = embeddings
+        self.texts = texts
+        self.ids = ids
+        self.alive = np.ones(len(texts), dtype=bool)
+        self.removed = 0
+        self._rows = None
+        self._next_id = len(texts)
@@ -0,0 +1,166 @@
+"""On-disk layout for persisted retrieval indexes.
+
+An index directory contains:
+
+- ``index.json``: format version, backend name and shape information.
+- ``*.npy``: raw NumPy arrays (embedding matrix and backend-specific arrays),
+  loaded with ``mmap_mode="r"`` so large indexes open without reading them.
+- ``texts.offsets.npy`` and ``texts.bin``: the chunk texts as one UTF-8 blob
+  plus an array of byte offsets, decoded lazily one text at a time. Other
+  string lists, such as chunk ids, use the same layout under their own name.
+"""
+import json
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Sequence, Union, overload
+
+import numpy as np
+
+FORMAT_NAME = "noteviz-retrieval"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "index.json"
+
+
+class TextStore(Sequence[str]):
+    """Read-only sequence of texts backed by a byte-offset array and a UTF-8 blob."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, Sequence[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("text index out of range")
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+
+@contextmanager
+def index_writer(path: Path) -> Iterator[Path]:
+    """Write an index into a temporary directory and swap it into place.
+
+    Readers that memory-mapped the previous index at ``path`` keep a valid
+    view of the old files until they reload.
+
+    Args:
+        path: Final index directory.
+
+    Yields:
+        Temporary directory to write the index files into.
+    """
+    path = Path(path)
+    staging = path.with_name(path.name + ".tmp")
+    previous = path.with_name(path.name + ".old")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    shutil.rmtree(previous, ignore_errors=True)
+    if path.exists():
+        path.rename(previous)
+    staging.rename(path)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def save_texts(directory: Path, texts: Iterable[str], name: str = "texts") -> None:
+    """Write texts as a UTF-8 blob and an offsets array.
+
+    Args:
+        directory: Index directory.
+        texts: Texts to write, in index order.
+        name: Base name of the blob and offsets files.
+    """
+    offsets = [0]
+    with open(directory / f"{name}.bin", "wb") as blob:
+        for text in texts:
+            encoded = text.encode("utf-8")
+            blob.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.save(directory / f"{name}.offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+
+def load_texts(directory: Path, name: str = "texts") -> TextStore:
+    """Memory-map the texts written by :func:`save_texts`.
+
+    Args:
+        directory: Index directory.
+        name: Base name of the blob and offsets files.
+
+    Returns:
+        Lazily decoding sequence of texts.
+    """
+    offsets = np.load(directory / f"{name}.offsets.npy", mmap_mode="r")
+    blob_path = directory / f"{name}.bin"
+    if blob_path.stat().st_size == 0:
+        # np.memmap cannot map an empty file
+        blob = np.empty(0, dtype=np.uint8)
+    else:
+        blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+    return TextStore(offsets, blob)
+
+
+def save_arrays(directory: Path, **arrays: np.ndarray) -> None:
+    """Write each array to ``<name>.npy`` in the index directory."""
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(array))
+
+
+def load_array(directory: Path, name: str) -> np.ndarray:
+    """Memory-map ``<name>.npy`` from the index directory read-only."""
+    return np.load(directory / f"{name}.npy", mmap_mode="r")
+
+
+def write_manifest(directory: Path, backend: str, **metadata: Any) -> None:
+    """Write ``index.json`` describing the persisted index.
+
+    Args:
+        directory: Index directory.
+        backend: Name of the retrieval backend that wrote the index.
+        **metadata: Additional JSON-serializable fields.
+    """
+    manifest = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "backend": backend}
+    manifest.update(metadata)
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def read_manifest(directory: Path, backend: str) -> Dict[str, Any]:
+    """Read and validate ``index.json``.
+
+    Args:
+        directory: Index directory.
+        backend: Backend name the caller expects.
+
+    Returns:
+        The manifest contents.
+
+    Raises:
+        ValueError: If the directory holds an unsupported format or another backend's index.
+    """
+    path = directory / MANIFEST_FILE
+    if not path.exists():
+        raise ValueError(f"No retrieval index found at {directory}")
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported retrieval index format at {directory}")
+    if manifest.get("backend") != backend:
+        raise ValueError(
+            f"Index at {directory} was written by {manifest.get('backend')!r}, not {backend!r}"
+        )
+    return manifest
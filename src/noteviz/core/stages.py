@@ -0,0 +1,70 @@
+"""
+Concurrent execution of independent pipeline stages.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+
+@dataclass
+class StageResult:
+    """Outcome of one stage run by ``run_stages``."""
+
+    name: str
+    """Name the stage was given."""
+
+    value: Any = None
+    """Value the stage returned, or None if it failed."""
+
+    error: Optional[Exception] = None
+    """Exception the stage raised, if any."""
+
+    seconds: float = 0.0
+    """Time from the start of the run until the stage finished."""
+
+    @property
+    def ok(self) -> bool:
+        """Whether the stage completed without raising."""
+        return self.error is None
+
+
+async def run_stages(
+    stages: Mapping[str, Awaitable[Any]],
+    on_result: Optional[Callable[[StageResult], None]] = None,
+) -> Dict[str, StageResult]:
+    """Run independent stages concurrently, isolating their failures.
+
+    An exception raised by one stage is recorded in its result and does not
+    stop the others. If the run itself is cancelled, or ``on_result``
+    raises, every unfinished stage is cancelled before the exception
+    propagates.
+
+    Args:
+        stages: Awaitables to run, by stage name.
+        on_result: Called with each result as soon as its stage finishes.
+
+    Returns:
+        The result of every stage, by name, in the order the stages were given.
+    """
+    start = time.perf_counter()
+
+    async def run(name: str, stage: Awaitable[Any]) -> StageResult:
+        try:
+            result = StageResult(name, value=await stage)
+        except Exception as error:
+            result = StageResult(name, error=error)
+        result.seconds = time.perf_counter() - start
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    tasks = [asyncio.ensure_future(run(name, stage)) for name, stage in stages.items()]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return {result.name: result for result in results}
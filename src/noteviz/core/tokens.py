@@ -0,0 +1,34 @@
+"""
+Lightweight token estimation helpers.
+
+The OpenAI models used by NoteViz average roughly four characters per token
+for English prose. These helpers use that ratio so request sizes can be
+budgeted locally without pulling in a tokenizer dependency.
+"""
+from typing import Iterable
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text.
+    
+    Args:
+        text: Text to estimate.
+        
+    Returns:
+        Estimated token count (at least 1 for non-empty text).
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_total_tokens(texts: Iterable[str]) -> int:
+    """Estimate the combined number of tokens in several texts.
+    
+    Args:
+        texts: Texts to estimate.
+        
+    Returns:
+        Sum of the estimated token counts.
+    """
+    return sum(estimate_tokens(text) for text in texts)
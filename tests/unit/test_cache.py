@@ -0,0 +1,101 @@
+"""Tests for the disk-backed LRU store."""
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from noteviz.core.cache import LRUStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Create a small LRU store."""
+    return LRUStore(tmp_path / "store.sqlite3", max_bytes=30)
+
+
+def test_put_and_get(store):
+    """Test storing and reading values."""
+    store.put("a", b"value a")
+    store.put_many([("b", b"value b"), ("c", b"value c")])
+    
+    assert store.get("a") == b"value a"
+    assert store.get_many(["b", "c", "missing"]) == {"b": b"value b", "c": b"value c"}
+    assert store.get("missing") is None
+    assert len(store) == 3
+    assert store.total_bytes == 21
+
+
+def test_replace_updates_size(store):
+    """Test that replacing a value does not double count its size."""
+    store.put("a", b"1234567890")
+    store.put("a", b"12345")
+    
+    assert store.total_bytes == 5
+    assert len(store) == 1
+
+
+def test_evicts_least_recently_used(store):
+    """Test that the least recently read entries are evicted first."""
+    store.put("a", b"x" * 10)
+    store.put("b", b"x" * 10)
+    store.put("c", b"x" * 10)
+    store.get("a")  # "b" is now the least recently used
+    
+    store.put("d", b"x" * 10)
+    
+    assert "b" not in store
+    assert "a" in store and "c" in store and "d" in store
+    assert store.total_bytes <= 30
+
+
+def test_persists_across_instances(tmp_path):
+    """Test that entries survive reopening the store."""
+    path = tmp_path / "store.sqlite3"
+    first = LRUStore(path)
+    first.put("a", b"persisted")
+    first.close()
+    
+    second = LRUStore(path)
+    assert second.get("a") == b"persisted"
+    assert second.total_bytes == len(b"persisted")
+
+
+def test_invalid_max_bytes(tmp_path):
+    """Test that a non-positive size cap is rejected."""
+    with pytest.raises(ValueError):
+        LRUStore(tmp_path / "store.sqlite3", max_bytes=0)
+
+
+def test_expires_entries_after_max_age(tmp_path):
+    """Test that entries older than max_age are missing and deleted on the next write."""
+    store = LRUStore(tmp_path / "store.sqlite3", max_age=60)
+    with patch("noteviz.core.cache.time.time", return_value=1000.0):
+        store.put("old", b"stale")
+    with patch("noteviz.core.cache.time.time", return_value=1050.0):
+        store.put("new", b"fresh")
+        assert store.get("old") == b"stale"
+    
+    with patch("noteviz.core.cache.time.time", return_value=1070.0):
+        assert "old" not in store
+        assert store.get_many(["old", "new"]) == {"new": b"fresh"}
+        store.put("newer", b"value")
+    
+    assert len(store) == 2
+    assert store.total_bytes == len(b"fresh") + len(b"value")
+
+
+def test_adds_creation_time_to_old_stores(tmp_path):
+    """Test that a store written without creation times is upgraded in place."""
+    path = tmp_path / "store.sqlite3"
+    conn = sqlite3.connect(str(path))
+    conn.executescript("""
+        CREATE TABLE entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL);
+        INSERT INTO entries VALUES ('a', x'6f6c64', 3, 1000.0);
+    """)
+    conn.close()
+    
+    store = LRUStore(path, max_age=60)
+    with patch("noteviz.core.cache.time.time", return_value=1030.0):
+        assert store.get("a") == b"old"
+    with patch("noteviz.core.cache.time.time", return_value=1100.0):
+        assert store.get("a") is None
@@ -1,4 +1,5 @@
 """Tests for the command-line interface."""
+import numpy as np
 import pytest
 import shutil
 from unittest.mock import AsyncMock, patch
@@ -11,8 +12,9 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph
 from pypdf import PdfReader
 
+from noteviz import cli
 from noteviz.cli import process_pdf, main
-from noteviz.core.llm import Topic
+from noteviz.core.llm import AnalysisResult, Topic
 
 
 # Configure test directories
@@ -86,16 +88,24 @@ def test_pdf_path():
 
 
 @pytest.fixture
-def mock_services():
+def mock_services(tmp_path):
     """Mock the OpenAI services for testing."""
     with patch("noteviz.cli.OpenAIEmbeddingService") as mock_embedding, \
          patch("noteviz.cli.OpenAILLMService") as mock_llm, \
-         patch("noteviz.cli.CosineRetrieval") as mock_retrieval:
+         patch.object(cli.config, "cache_dir", tmp_path / "cache"), \
+         patch.object(cli.config, "data_dir", tmp_path / "data"):
         
         # Mock embedding service
         mock_embedding_instance = AsyncMock()
-        mock_embedding_instance.generate_embeddings.return_value = [[0.1] * 1536] * 2
-        mock_embedding.return_value = mock_embedding_instance
+        mock_embedding_instance.generate_embeddings.side_effect = lambda texts: [[0.1] * 1536 for _ in texts]
+        mock_embedding_instance.generate_embedding_matrix.side_effect = (
+            lambda texts: np.full((len(texts), 1536), 0.1, dtype=np.float32)
+        )
+        
+        def create_embedding_service(embedding_config):
+            mock_embedding_instance.config = embedding_config
+            return mock_embedding_instance
+        mock_embedding.side_effect = create_embedding_service
         
         # Mock LLM service
         mock_llm_instance = AsyncMock()
@@ -104,17 +114,17 @@ def mock_services():
         mock_llm_instance.extract_topics.return_value = [
             Topic(name="Test Topic", description="A test topic", confidence=0.9, keywords=["test"])
         ]
+        mock_llm_instance.analyze.return_value = AnalysisResult(
+            topics=mock_llm_instance.extract_topics.return_value,
+            summary=mock_llm_instance.generate_summary.return_value,
+            key_concepts=mock_llm_instance.identify_key_concepts.return_value
+        )
         mock_llm.return_value = mock_llm_instance
         
-        # Mock retrieval service
-        mock_retrieval_instance = AsyncMock()
-        mock_retrieval_instance.find_relevant_chunks.return_value = []
-        mock_retrieval.return_value = mock_retrieval_instance
-        
         yield {
             "embedding": mock_embedding_instance,
             "llm": mock_llm_instance,
-            "retrieval": mock_retrieval_instance
+            "data_dir": tmp_path / "data"
         }
 
 
@@ -130,6 +140,73 @@ async def test_process_pdf(test_pdf_path, mock_services):
     assert len(result["topics"]) == 1
 
 
+@pytest.mark.asyncio
+async def test_process_pdf_reuses_cached_embeddings(test_pdf_path, mock_services):
+    """Test that a second run serves every chunk from the embedding cache."""
+    await process_pdf(test_pdf_path)
+    calls = mock_services["embedding"].generate_embedding_matrix.call_count
+    
+    await process_pdf(test_pdf_path)
+    
+    assert calls == 1
+    assert mock_services["embedding"].generate_embedding_matrix.call_count == calls
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_sends_document_text_without_repeated_overlap(test_pdf_path, mock_services):
+    """Test that the LLM receives the extracted text once, not re-joined chunks."""
+    await process_pdf(test_pdf_path)
+    
+    text = mock_services["llm"].analyze.call_args.args[0]
+    assert text == PdfReader(test_pdf_path).pages[0].extract_text() + "\n"
+    assert mock_services["llm"].analyze.call_args.kwargs["sections"] == [text]
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_skips_unchanged_pdf(test_pdf_path, mock_services, capsys):
+    """Test that a second run of an unchanged PDF does not parse it."""
+    await process_pdf(test_pdf_path)
+    assert "Extracted 1 of 1 pages" in capsys.readouterr().out
+    
+    with patch("noteviz.core.pdf.pypdf.PdfReader") as reader:
+        result = await process_pdf(test_pdf_path)
+    
+    reader.assert_not_called()
+    assert "Unchanged since the last run" in capsys.readouterr().out
+    assert (cli.index_directory(test_pdf_path) / "index" / "index.json").exists()
+    assert len(result["topics"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_keeps_same_named_files_apart(test_pdf_path, mock_services, tmp_path, capsys):
+    """Test that PDFs sharing a file name in different folders get separate indexes."""
+    other_path = tmp_path / "other" / "test.pdf"
+    other_path.parent.mkdir()
+    shutil.copy(test_pdf_path, other_path)
+    await process_pdf(test_pdf_path)
+    capsys.readouterr()
+    
+    await process_pdf(other_path)
+    
+    assert "Extracted 1 of 1 pages" in capsys.readouterr().out
+    assert cli.index_directory(test_pdf_path) != cli.index_directory(other_path)
+    assert len(list((mock_services["data_dir"] / "indexes").iterdir())) == 2
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_reuses_cached_page_text(test_pdf_path, mock_services, capsys):
+    """Test that page text comes from the extraction cache when the index is gone."""
+    await process_pdf(test_pdf_path)
+    shutil.rmtree(mock_services["data_dir"] / "indexes")
+    capsys.readouterr()
+    
+    with patch("noteviz.core.pdf.pypdf.PdfReader", wraps=PdfReader) as reader:
+        await process_pdf(test_pdf_path)
+    
+    assert reader.call_count == 1  # page fingerprints only
+    assert "Read cached page text, saved" in capsys.readouterr().out
+
+
 def test_main_invalid_command():
     """Test main function with invalid command."""
     with pytest.raises(SystemExit):
@@ -1,12 +1,21 @@
 """
 Unit tests for the embedding service.
 """
+import asyncio
+import base64
+import time
+
+import numpy as np
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from openai import APIError, RateLimitError, APIStatusError
 
 from noteviz.core.embedding.base import EmbeddingConfig
+from noteviz.core.embedding.batching import plan_batches
+from noteviz.core.embedding.cache import CachedEmbeddingService, EmbeddingCache
+from noteviz.core.embedding.dedup import DeduplicatingEmbeddingService, find_near_duplicates, lsh_bands
 from noteviz.core.embedding.openai import OpenAIEmbeddingService
+from noteviz.core.embedding.scheduler import TokenBucket
 
 
 @pytest.fixture
@@ -117,4 +126,247 @@ async def test_generate_embeddings_invalid_response(embedding_service, mock_open
     mock_openai_client.embeddings.create.return_value = mock_response
     
     with pytest.raises(AttributeError):
-        await embedding_service.generate_embeddings(texts) 
\ No newline at end of file
+        await embedding_service.generate_embeddings(texts) 
+
+def test_plan_batches_respects_batch_size_and_token_limit():
+    """Test that batches honor both the input count and token budget."""
+    texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 400, "e" * 40]
+    
+    batches = plan_batches(texts, batch_size=2, max_tokens=50)
+    
+    assert [batch.indices for batch in batches] == [[0, 1], [2], [3], [4]]
+    assert [text for batch in batches for text in batch.texts] == texts
+    assert all(len(batch.indices) <= 2 for batch in batches)
+
+
+@pytest.mark.asyncio
+async def test_generate_embeddings_batches_requests(embedding_service, mock_openai_client):
+    """Test that texts are sent as multi-input requests and mapped back in order."""
+    async def create(model, input):
+        # Return items out of order to check that results are mapped by index
+        items = [MagicMock(index=i, embedding=[float(text[-1])]) for i, text in enumerate(input)]
+        return MagicMock(data=list(reversed(items)))
+    
+    mock_openai_client.embeddings.create.side_effect = create
+    texts = ["text 1", "text 2", "text 3", "text 4", "text 5"]
+    
+    embeddings = await embedding_service.generate_embeddings(texts)
+    
+    assert embeddings == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert mock_openai_client.embeddings.create.call_count == 3
+    first_call = mock_openai_client.embeddings.create.call_args_list[0]
+    assert first_call.kwargs["input"] == ["text 1", "text 2"]
+
+
+@pytest.mark.asyncio
+async def test_generate_embeddings_response_size_mismatch(embedding_service, mock_openai_client):
+    """Test that a response with the wrong number of vectors is rejected."""
+    texts = ["text 1", "text 2"]
+    
+    with pytest.raises(ValueError) as exc_info:
+        await embedding_service.generate_embeddings(texts)
+    assert "Expected 2 embeddings" in str(exc_info.value)
+
+
+@pytest.mark.asyncio
+async def test_generate_embeddings_concurrent_dispatch(embedding_config, mock_openai_client):
+    """Test that concurrent dispatch bounds in-flight requests and keeps order."""
+    async def create(model, input):
+        # Later batches finish first to check that ordering survives concurrency
+        await asyncio.sleep(0.01 * (10 - int(input[0].split()[-1])) / 10)
+        return MagicMock(data=[MagicMock(index=i, embedding=[float(t.split()[-1])]) for i, t in enumerate(input)])
+    
+    mock_openai_client.embeddings.create.side_effect = create
+    config = embedding_config.model_copy(update={"max_concurrency": 3})
+    service = OpenAIEmbeddingService(config, client=mock_openai_client)
+    texts = [f"text {i}" for i in range(10)]
+    
+    embeddings = await service.generate_embeddings(texts)
+    
+    assert embeddings == [[float(i)] for i in range(10)]
+    assert service.stats.peak_concurrency == 3
+    assert service.stats.requests == 5
+    assert service.stats.texts == 10
+    assert service.stats.in_flight == 0
+    assert service.stats.texts_per_second > 0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    """Test that the token bucket delays callers once its burst is spent."""
+    bucket = TokenBucket(rate_per_minute=6000, capacity=1)  # 100 tokens per second
+    
+    start = time.monotonic()
+    for _ in range(3):
+        await bucket.acquire(1)
+    
+    assert time.monotonic() - start >= 0.015
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_limits_requests(embedding_config, mock_openai_client):
+    """Test that the requests-per-minute limit throttles embedding requests."""
+    mock_openai_client.embeddings.create.return_value = AsyncMock(
+        data=[AsyncMock(index=0, embedding=[0.1]), AsyncMock(index=1, embedding=[0.2])]
+    )
+    config = embedding_config.model_copy(update={"max_concurrency": 4, "requests_per_minute": 6000})
+    service = OpenAIEmbeddingService(config, client=mock_openai_client)
+    service.rate_limiter.requests.capacity = service.rate_limiter.requests.tokens = 1
+    
+    start = time.monotonic()
+    await service.generate_embeddings([f"text {i}" for i in range(6)])
+    
+    assert mock_openai_client.embeddings.create.call_count == 3
+    assert time.monotonic() - start >= 0.015
+
+
+@pytest.mark.asyncio
+async def test_cached_embedding_service(tmp_path, embedding_config):
+    """Test that the cache only forwards unseen texts to the wrapped service."""
+    inner = AsyncMock()
+    inner.config = embedding_config
+    inner.generate_embeddings.side_effect = lambda texts: [[float(len(t)), 0.5] for t in texts]
+    service = CachedEmbeddingService(inner, EmbeddingCache(tmp_path / "embeddings.sqlite3"))
+    
+    first = await service.generate_embeddings(["a", "bb", "a"])
+    second = await service.generate_embeddings(["bb", "ccc"])
+    
+    assert first == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert second == [[2.0, 0.5], [3.0, 0.5]]
+    assert inner.generate_embeddings.call_args_list[0].args[0] == ["a", "bb"]
+    assert inner.generate_embeddings.call_args_list[1].args[0] == ["ccc"]
+    assert service.hits == 2
+    assert service.misses == 3
+
+
+@pytest.mark.asyncio
+async def test_cached_embedding_service_cold_and_warm_runs_match(tmp_path, embedding_config):
+    """Test that fresh vectors come back at the precision the cache stores them in."""
+    inner = AsyncMock()
+    inner.config = embedding_config
+    inner.generate_embeddings.side_effect = lambda texts: [[0.1, 1 / 3] for _ in texts]
+    
+    cold = await CachedEmbeddingService(
+        inner, EmbeddingCache(tmp_path / "embeddings.sqlite3")
+    ).generate_embeddings(["a"])
+    warm = await CachedEmbeddingService(
+        inner, EmbeddingCache(tmp_path / "embeddings.sqlite3")
+    ).generate_embeddings(["a"])
+    
+    assert inner.generate_embeddings.await_count == 1
+    assert cold == warm
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache_key_includes_model_and_dimensions(tmp_path, embedding_config):
+    """Test that vectors are not shared across models or dimensions."""
+    key = EmbeddingCache.key(embedding_config.model_name, None, "text")
+    
+    assert key != EmbeddingCache.key("text-embedding-3-large", None, "text")
+    assert key != EmbeddingCache.key(embedding_config.model_name, 256, "text")
+    assert key == EmbeddingCache.key(embedding_config.model_name, None, "text")
+    
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite3")
+    cache.put_many({key: [0.25, 0.5]})
+    vector = cache.get_many([key])[key]
+    assert vector.dtype == np.float32
+    assert vector.tolist() == [0.25, 0.5]
+
+
+@pytest.mark.asyncio
+async def test_generate_embedding_matrix_decodes_base64(embedding_service, mock_openai_client):
+    """Test that base64 responses are decoded into a float32 matrix."""
+    vectors = np.array([[0.5, -1.0, 2.0], [1.5, 0.25, -0.75], [3.0, 0.0, 1.0]], dtype=np.float32)
+    
+    async def create(model, input, encoding_format):
+        assert encoding_format == "base64"
+        rows = [vectors[int(text.split()[-1])] for text in input]
+        return MagicMock(data=[
+            MagicMock(index=i, embedding=base64.b64encode(row.tobytes()).decode("ascii"))
+            for i, row in enumerate(rows)
+        ])
+    
+    mock_openai_client.embeddings.create.side_effect = create
+    
+    matrix = await embedding_service.generate_embedding_matrix(["text 0", "text 1", "text 2"])
+    
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(matrix, vectors)
+
+
+@pytest.mark.asyncio
+async def test_cached_embedding_matrix(tmp_path, embedding_config):
+    """Test that the cached service builds matrices from cached blobs."""
+    inner = AsyncMock()
+    inner.config = embedding_config
+    inner.generate_embedding_matrix.side_effect = (
+        lambda texts: np.array([[float(len(t)), 0.5] for t in texts], dtype=np.float32)
+    )
+    service = CachedEmbeddingService(inner, EmbeddingCache(tmp_path / "embeddings.sqlite3"))
+    
+    await service.generate_embedding_matrix(["a", "bb"])
+    matrix = await service.generate_embedding_matrix(["bb", "a", "ccc"])
+    
+    np.testing.assert_array_equal(matrix, [[2.0, 0.5], [1.0, 0.5], [3.0, 0.5]])
+    assert inner.generate_embedding_matrix.call_args_list[1].args[0] == ["ccc"]
+    assert service.hits == 2
+
+
+SIDEBAR = ("Sidebar: remember that every function in this chapter returns a new list "
+           "instead of modifying its argument, so callers can keep the original around.")
+
+
+def test_find_near_duplicates_maps_to_first_occurrence():
+    """Test that near-identical texts map to their first occurrence and distinct texts to themselves."""
+    texts = [
+        SIDEBAR,
+        "Lists can be sorted in place with the sort method or copied with sorted.",
+        SIDEBAR.replace("Sidebar:", "SIDEBAR -"),
+        "Dictionaries map keys to values and keep insertion order.",
+        SIDEBAR,
+    ]
+    
+    assert find_near_duplicates(texts, threshold=0.8) == [0, 1, 0, 3, 0]
+    assert find_near_duplicates(texts[1:2] * 2 + [""] * 2) == [0, 0, 2, 2]
+
+
+def test_find_near_duplicates_threshold():
+    """Test that the threshold controls how similar texts must be."""
+    edited = SIDEBAR.replace("returns a new list", "returns a fresh tuple")
+    
+    assert find_near_duplicates([SIDEBAR, edited], threshold=0.5) == [0, 0]
+    assert find_near_duplicates([SIDEBAR, edited], threshold=0.95) == [0, 1]
+    with pytest.raises(ValueError):
+        find_near_duplicates([SIDEBAR], threshold=0)
+
+
+def test_lsh_bands_cover_signature():
+    """Test that the band layout splits the signature evenly around the threshold."""
+    bands, rows = lsh_bands(128, 0.9)
+    
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.9) < 0.1
+
+
+@pytest.mark.asyncio
+async def test_deduplicating_service_embeds_duplicates_once(embedding_config):
+    """Test that duplicates share their canonical vector and skipped calls are counted."""
+    inner = AsyncMock()
+    inner.config = embedding_config
+    inner.generate_embedding_matrix.side_effect = (
+        lambda texts: np.array([[float(len(t)), 0.5] for t in texts], dtype=np.float32)
+    )
+    inner.generate_embeddings.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    service = DeduplicatingEmbeddingService(inner, threshold=0.8)
+    texts = [SIDEBAR, "A short unrelated note.", SIDEBAR + " ", SIDEBAR]
+    
+    matrix = await service.generate_embedding_matrix(texts)
+    vectors = await service.generate_embeddings(texts)
+    
+    assert inner.generate_embedding_matrix.call_args.args[0] == texts[:2]
+    np.testing.assert_array_equal(matrix, [[len(SIDEBAR), 0.5], [23, 0.5]] + [[len(SIDEBAR), 0.5]] * 2)
+    assert vectors == [[len(SIDEBAR)], [23.0], [len(SIDEBAR)], [len(SIDEBAR)]]
+    assert service.duplicates == 4
+    assert service.requests_saved == 2  # batch_size=2: one request instead of two, in each call
+    assert service.tokens_saved > 0
@@ -0,0 +1,298 @@
+"""Tests for incremental document indexing."""
+import zlib
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+from pypdf import PageObject, PdfReader
+from reportlab.pdfgen import canvas
+
+from noteviz.core.embedding import DeduplicatingEmbeddingService, EmbeddingConfig
+from noteviz.core.indexing import DocumentIndexer, diff_pages
+from noteviz.core.pdf import OutlineEntry, PDFConfig, PyPDFProcessor
+from noteviz.core.retrieval import CosineRetrieval, RetrievalConfig
+
+
+def write_pdf(path, pages, headers=()):
+    """Write a PDF with one line of text per page, under optional per-page headers."""
+    pdf = canvas.Canvas(str(path))
+    for page, text in enumerate(pages):
+        if page < len(headers) and headers[page]:
+            pdf.drawString(72, 780, headers[page])
+        pdf.drawString(72, 700, text)
+        pdf.showPage()
+    pdf.save()
+    return path
+
+
+def write_form_pdf(path, pages):
+    """Write a PDF whose page texts are drawn from form XObjects."""
+    pdf = canvas.Canvas(str(path))
+    for page, text in enumerate(pages):
+        pdf.beginForm(f"page{page}")
+        pdf.drawString(72, 700, text)
+        pdf.endForm()
+        pdf.doForm(f"page{page}")
+        pdf.showPage()
+    pdf.save()
+    return path
+
+
+def fake_embeddings(texts):
+    """Deterministic unit vectors derived from each text."""
+    rows = [
+        np.random.default_rng(zlib.crc32(text.encode("utf-8"))).normal(size=16)
+        for text in texts
+    ]
+    matrix = np.asarray(rows, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def embedding_service():
+    """Create a fake embedding service that records the texts it embeds."""
+    service = MagicMock()
+    service.config = EmbeddingConfig(model_name="test-model")
+    service.generate_embedding_matrix = AsyncMock(side_effect=fake_embeddings)
+    return service
+
+
+@pytest.fixture
+def make_indexer(tmp_path, embedding_service):
+    """Create indexers over the same directory, as successive runs would."""
+    def make(chunk_size=40, chunk_overlap=10, strip_boilerplate=False):
+        processor = PyPDFProcessor(PDFConfig(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, strip_boilerplate=strip_boilerplate
+        ))
+        retrieval = CosineRetrieval(RetrievalConfig(similarity_threshold=0.0, max_results=3))
+        return DocumentIndexer(processor, embedding_service, retrieval, tmp_path / "index")
+    return make
+
+
+PAGES = [f"Page {i} talks about topic number {i} in some detail." for i in range(6)]
+
+
+def embedded_texts(embedding_service):
+    """Return every text sent to the embedding service, call by call."""
+    return [call.args[0] for call in embedding_service.generate_embedding_matrix.call_args_list]
+
+
+def test_diff_pages_matches_moved_and_repeated_pages():
+    """Test page matching across insertions, removals and duplicates."""
+    matches, vanished = diff_pages(["a", "b", "c", "b"], ["x", "a", "b", "b", "b"])
+
+    assert matches == {1: 0, 2: 1, 3: 3}
+    assert vanished == [2]
+
+
+@pytest.mark.asyncio
+async def test_update_only_embeds_changed_pages(tmp_path, make_indexer, embedding_service):
+    """Test that a revision re-embeds the changed page and patches the index."""
+    first = await make_indexer().update(write_pdf(tmp_path / "book.pdf", PAGES))
+    assert first.changed_pages == list(range(6))
+    assert first.chunks_reused == 0
+
+    revised = list(PAGES)
+    revised[3] = "Page 3 was rewritten to discuss quantum entanglement instead."
+    indexer = make_indexer()
+    write_pdf(tmp_path / "book.pdf", revised)
+    with patch("noteviz.core.pdf.pypdf.PdfReader", wraps=PdfReader) as reader, \
+         patch.object(PageObject, "extract_text", autospec=True, side_effect=PageObject.extract_text) as extract:
+        update = await indexer.update(tmp_path / "book.pdf")
+
+    reader.assert_called_once()
+    assert extract.call_count == 1
+    assert update.changed_pages == [3]
+    assert update.chunks_reused == first.chunks_added - update.chunks_removed
+    assert all(text in update.document.page_span(3).text for text in embedded_texts(embedding_service)[-1])
+    assert "quantum" in update.document.text
+    assert len(indexer.retrieval) == update.chunks_reused + update.chunks_added
+
+    # The patched index is persisted and served to the next run
+    reloaded = make_indexer()
+    assert (await reloaded.update(tmp_path / "book.pdf")).unchanged
+    query = fake_embeddings(embedded_texts(embedding_service)[-1][:1])[0]
+    assert "quantum" in reloaded.retrieval.find_relevant_chunks(query)[0][0]
+
+
+@pytest.mark.asyncio
+async def test_update_detects_revised_form_xobject(tmp_path, make_indexer):
+    """Test that a page whose text lives in a form XObject is re-extracted when the form changes."""
+    await make_indexer().update(write_form_pdf(tmp_path / "book.pdf", ["Original chapter text", "Appendix"]))
+
+    update = await make_indexer().update(
+        write_form_pdf(tmp_path / "book.pdf", ["Revised chapter text here", "Appendix"])
+    )
+
+    assert update.changed_pages == [0]
+    assert "Revised chapter text here" in update.document.text
+    assert "Original" not in update.document.text
+
+
+@pytest.mark.asyncio
+async def test_update_handles_inserted_and_removed_pages(tmp_path, make_indexer):
+    """Test that shifting pages does not re-embed them."""
+    await make_indexer().update(write_pdf(tmp_path / "book.pdf", PAGES))
+
+    revised = PAGES[:2] + ["A brand new page about glaciers."] + PAGES[2:5]
+    update = await make_indexer().update(write_pdf(tmp_path / "book.pdf", revised))
+
+    assert update.changed_pages == [2]
+    assert update.chunks_removed > 0
+    assert update.num_pages == 6
+    assert update.document.text.count("glaciers") == 1
+    assert "topic number 5" not in update.document.text
+
+
+@pytest.mark.asyncio
+async def test_update_handles_revision_without_text(tmp_path, make_indexer):
+    """Test that a revision removing every chunk is saved and can gain text again."""
+    await make_indexer().update(write_pdf(tmp_path / "book.pdf", PAGES[:2]))
+
+    emptied = await make_indexer().update(write_pdf(tmp_path / "book.pdf", ["", ""]))
+    assert emptied.chunks_added == 0
+    assert emptied.chunks_removed > 0
+    assert not (tmp_path / "index" / "index").exists()
+    assert (await make_indexer().update(tmp_path / "book.pdf")).unchanged
+
+    indexer = make_indexer()
+    refilled = await indexer.update(write_pdf(tmp_path / "book.pdf", ["", "Fresh text about rivers."]))
+    assert refilled.changed_pages == [1]
+    assert len(indexer.retrieval) == refilled.chunks_added > 0
+
+
+@pytest.mark.asyncio
+async def test_update_indexes_near_duplicates_once(tmp_path, embedding_service):
+    """Test that near-duplicate chunks share one row and resolve back to every occurrence."""
+    def make():
+        processor = PyPDFProcessor(PDFConfig(chunk_size=40, chunk_overlap=10, strip_boilerplate=False))
+        retrieval = CosineRetrieval(RetrievalConfig(similarity_threshold=0.0, max_results=3))
+        dedup = DeduplicatingEmbeddingService(embedding_service)
+        return DocumentIndexer(processor, dedup, retrieval, tmp_path / "index")
+
+    indexer = make()
+    first = await indexer.update(write_pdf(tmp_path / "book.pdf", [PAGES[0], PAGES[1], PAGES[0]]))
+
+    assert first.chunks_aliased > 0
+    assert len(indexer.retrieval) == first.chunks_added - first.chunks_aliased
+    query = fake_embeddings([first.document.page_span(0).text.split(".")[0]])[0]
+    (hit,) = indexer.retrieval.find_relevant_rows(query)[:1]
+    assert len(indexer.occurrences(indexer.retrieval.ids[hit[0]])) == 2
+
+    reloaded = make()
+    assert (await reloaded.update(tmp_path / "book.pdf")).unchanged
+    assert reloaded.aliases == indexer.aliases
+
+    # Removing the canonical page gives its kept duplicates rows of their own
+    indexer = make()
+    update = await indexer.update(write_pdf(tmp_path / "book.pdf", [PAGES[1], PAGES[0]]))
+    assert update.changed_pages == []
+    assert not indexer.aliases
+    assert len(indexer.retrieval) == update.chunks_reused + update.chunks_added
+
+
+@pytest.mark.asyncio
+async def test_update_skips_unchanged_file(tmp_path, make_indexer, embedding_service):
+    """Test that an unchanged file is neither parsed nor embedded again."""
+    pdf_path = write_pdf(tmp_path / "book.pdf", PAGES)
+    first = await make_indexer().update(pdf_path)
+
+    indexer = make_indexer()
+    with patch("noteviz.core.pdf.pypdf.PdfReader") as reader:
+        update = await indexer.update(pdf_path)
+
+    reader.assert_not_called()
+    assert update.unchanged
+    assert update.chunks_reused == first.chunks_added
+    assert update.document.text == first.document.text
+    assert embedding_service.generate_embedding_matrix.await_count == 1
+    assert len(indexer.retrieval) == first.chunks_added
+
+
+@pytest.mark.asyncio
+async def test_update_keeps_outline_of_unchanged_file(tmp_path, make_indexer):
+    """Test that the outline is recorded, so an unchanged file can be split into sections unparsed."""
+    pdf_path = tmp_path / "book.pdf"
+    pdf = canvas.Canvas(str(pdf_path))
+    for page, text in enumerate(PAGES[:2]):
+        pdf.drawString(72, 700, text)
+        pdf.bookmarkPage(f"p{page}")
+        pdf.addOutlineEntry(f"Chapter {page + 1}", f"p{page}", level=0)
+        pdf.showPage()
+    pdf.save()
+    first = await make_indexer().update(pdf_path)
+    
+    with patch("noteviz.core.pdf.pypdf.PdfReader") as reader:
+        update = await make_indexer().update(pdf_path)
+    
+    reader.assert_not_called()
+    assert first.outline == [OutlineEntry("Chapter 1", 0, 0), OutlineEntry("Chapter 2", 1, 0)]
+    assert update.outline == first.outline
+
+
+@pytest.mark.asyncio
+async def test_update_rebuilds_when_chunking_changes(tmp_path, make_indexer):
+    """Test that changed chunk settings invalidate the previous run."""
+    pdf_path = write_pdf(tmp_path / "book.pdf", PAGES)
+    await make_indexer().update(pdf_path)
+
+    update = await make_indexer(chunk_size=30, chunk_overlap=5).update(pdf_path)
+
+    assert update.changed_pages == list(range(6))
+    assert update.chunks_reused == 0
+
+
+@pytest.mark.asyncio
+async def test_update_rebuilds_when_index_is_out_of_step(tmp_path, make_indexer):
+    """Test that an index not matching the manifest is rebuilt."""
+    pdf_path = write_pdf(tmp_path / "book.pdf", PAGES)
+    indexer = make_indexer()
+    await indexer.update(pdf_path)
+    indexer.retrieval.remove([indexer.retrieval.ids[0]])
+    indexer.retrieval.save(tmp_path / "index" / "index")
+
+    update = await make_indexer().update(pdf_path)
+
+    assert update.changed_pages == list(range(6))
+
+
+WORDS = ["rivers", "glaciers", "deserts", "forests", "oceans", "volcanoes"]
+HEADED_PAGES = [f"Notes on {word} and how they shape the land." for word in WORDS]
+HEADER = "A Treatise on Landscapes"
+
+
+@pytest.mark.asyncio
+async def test_update_embeds_text_without_boilerplate(tmp_path, make_indexer, embedding_service):
+    """Test that running headers are stripped before chunking and stay stripped across revisions."""
+    pdf_path = write_pdf(tmp_path / "book.pdf", HEADED_PAGES, headers=[HEADER] * 6)
+    first = await make_indexer(strip_boilerplate=True).update(pdf_path)
+
+    assert "Treatise" not in first.document.text
+    assert not any("Treatise" in text for text in embedded_texts(embedding_service)[0])
+
+    revised = list(HEADED_PAGES)
+    revised[3] = "Notes on quantum entanglement instead."
+    indexer = make_indexer(strip_boilerplate=True)
+    update = await indexer.update(write_pdf(tmp_path / "book.pdf", revised, headers=[HEADER] * 6))
+
+    assert update.extracted_pages == update.changed_pages == [3]
+    assert indexer.processor.normalization.lines_removed == 6
+    assert "Treatise" not in update.document.text
+
+
+@pytest.mark.asyncio
+async def test_update_rechunks_pages_whose_boilerplate_changed(tmp_path, make_indexer):
+    """Test that unchanged pages are re-chunked when the repeated lines around them change."""
+    headers = [HEADER, HEADER]
+    await make_indexer(strip_boilerplate=True).update(
+        write_pdf(tmp_path / "book.pdf", HEADED_PAGES[:4], headers=headers)
+    )
+
+    # With six pages, a header on two of them is no longer repeated often enough to strip
+    update = await make_indexer(strip_boilerplate=True).update(
+        write_pdf(tmp_path / "book.pdf", HEADED_PAGES, headers=headers)
+    )
+
+    assert update.extracted_pages == [4, 5]
+    assert update.changed_pages == [0, 1, 4, 5]
+    assert update.document.text.count("Treatise") == 2
@@ -1,16 +1,21 @@
 """Tests for the LLM services."""
+import asyncio
 import json
 import os
+import zlib
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from openai import APIError, RateLimitError, APIStatusError, AuthenticationError
 from openai.types.chat import ChatCompletion, ChatCompletionMessage, ChatCompletionChunk
 from openai.types.chat.chat_completion import Choice
 
 from noteviz.core.llm.config import SummarizerConfig, TopicExtractorConfig
-from noteviz.core.llm.base import Topic
-from noteviz.core.llm.openai import OpenAISummarizer, OpenAITopicExtractor
+from noteviz.core.llm.base import ANALYSIS_STAGES, Topic
+from noteviz.core.llm.cache import ResponseCache, SummaryCache, bypass_response_cache
+from noteviz.core.llm.mapreduce import MapReduceSummarizer, SummaryNode, pack_groups, summary_prompt, text_key
+from noteviz.core.llm.openai import OpenAILLMService, OpenAISummarizer, OpenAITopicExtractor, parse_analysis
+from noteviz.core.tokens import estimate_tokens
 
 
 @pytest.fixture(autouse=True)
@@ -159,4 +164,438 @@ async def test_extract_topics_empty_input(topic_extractor_config):
 
     with pytest.raises(ValueError) as exc_info:
         await service.extract_topics(chunks)
-    assert "No text chunks provided" in str(exc_info.value) 
\ No newline at end of file
+    assert "No text chunks provided" in str(exc_info.value) 
+
+def fake_completions(latency=0.01, analysis=None):
+    """Create a fake chat client that summarizes by keeping the first words of the text.
+    
+    Combined analysis requests are answered with ``analysis`` as JSON.
+    """
+    state = {"active": 0, "peak": 0, "prompts": []}
+    
+    async def create(model, messages, max_tokens, temperature, **kwargs):
+        prompt = messages[-1]["content"]
+        state["prompts"].append(prompt)
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(latency)
+        state["active"] -= 1
+        if analysis is not None and "respond with a JSON object" in prompt:
+            content = json.dumps(analysis)
+        else:
+            content = " ".join(prompt.split(" words.\n\n", 1)[-1].split()[:30])
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=content), finish_reason="stop")])
+    
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=create)
+    return client, state
+
+
+BOOK = " ".join(f"Sentence number {i} describes one more detail of the book." for i in range(200))
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_summarizes_long_text_hierarchically():
+    """Test that a long text is mapped concurrently and reduced to one summary."""
+    client, state = fake_completions()
+    config = SummarizerConfig(group_tokens=100, partial_summary_words=30, max_concurrency=3, max_summary_length=50)
+    summarizer = MapReduceSummarizer(config, client)
+    
+    summary = await summarizer.summarize(BOOK)
+    
+    stages = summarizer.stages
+    leaves = [SummaryNode(text_key(sentence), sentence) for sentence in summarizer.split(BOOK)]
+    assert len(leaves) == 200
+    assert [stage.name for stage in stages][:2] == ["map", "reduce 1"]
+    assert stages[0].calls == len(pack_groups(leaves, 100)) > 10
+    assert all(stage.calls < earlier.calls for earlier, stage in zip(stages, stages[1:]))
+    assert stages[-1].calls == 1
+    assert state["peak"] == 3
+    assert sum(stage.calls for stage in stages) == len(state["prompts"])
+    assert stages[0].input_tokens > estimate_tokens(BOOK) and stages[0].output_tokens > 0
+    assert all(stage.seconds > 0 for stage in stages)
+    assert "Keep the summary under 50 words." in state["prompts"][-1]
+    assert "Keep the summary under 30 words." in state["prompts"][0]
+    assert summary.startswith("Sentence number 0")
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_short_text_is_one_request():
+    """Test that a text within one group is summarized directly."""
+    client, state = fake_completions()
+    service = OpenAILLMService(SummarizerConfig(), TopicExtractorConfig(), client=client)
+    
+    summary = await service.generate_summary("A short text about rivers.", max_length=20)
+    
+    assert summary == "A short text about rivers."
+    assert [stage.name for stage in service.summarizer.stages] == ["map"]
+    assert state["prompts"] == [summary_prompt("A short text about rivers.", 20)]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_records_reported_token_usage():
+    """Test that stage token counts come from the responses' usage when it is reported."""
+    client, _ = fake_completions(latency=0)
+    create = client.chat.completions.create.side_effect
+    
+    async def create_with_usage(**kwargs):
+        response = await create(**kwargs)
+        response.usage = MagicMock(prompt_tokens=1000, completion_tokens=7)
+        return response
+    
+    client.chat.completions.create.side_effect = create_with_usage
+    summarizer = MapReduceSummarizer(SummarizerConfig(group_tokens=100, partial_summary_words=30), client)
+    
+    await summarizer.summarize(BOOK)
+    
+    for stage in summarizer.stages:
+        assert stage.input_tokens == 1000 * stage.calls
+        assert stage.output_tokens == 7 * stage.calls
+
+
+CHAPTERS = [
+    " ".join(f"{name} sentence {i} adds one more detail to the chapter." for i in range(count))
+    for name, count in [("Alpha", 60), ("Beta", 15), ("Gamma", 40)]
+]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_summarizes_sections_separately(tmp_path):
+    """Test that each section gets its own subtree, cached independently of the others."""
+    client, state = fake_completions(latency=0)
+    config = SummarizerConfig(group_tokens=100, partial_summary_words=30, max_summary_length=50)
+    summarizer = MapReduceSummarizer(config, client, SummaryCache(tmp_path / "summaries.sqlite3"))
+    
+    await summarizer.summarize(" ".join(CHAPTERS), sections=CHAPTERS)
+    
+    map_prompts = state["prompts"][:summarizer.stages[0].calls]
+    assert all(sum(name in prompt for name in ("Alpha", "Beta", "Gamma")) == 1 for prompt in map_prompts)
+    
+    calls = len(state["prompts"])
+    edited = CHAPTERS[:2] + [CHAPTERS[2].replace("Gamma sentence 0 ", "An edited opening ")]
+    await summarizer.summarize(" ".join(edited), sections=edited)
+    
+    assert all("Gamma" in prompt for prompt in state["prompts"][calls:])
+    assert summarizer.stages[0].cached > 0
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_short_sections_are_one_request():
+    """Test that sections which fit in one group together are summarized directly."""
+    client, state = fake_completions(latency=0)
+    summarizer = MapReduceSummarizer(SummarizerConfig(group_tokens=100), client)
+    sections = ["Rivers flow to the sea.", "Lakes hold still water.", "Rain fills both."]
+    
+    await summarizer.summarize(" ".join(sections), max_length=20, sections=sections)
+    
+    assert [stage.name for stage in summarizer.stages] == ["map"]
+    assert len(state["prompts"]) == 1
+
+
+def test_pack_groups_respects_budget_and_keeps_boundaries_after_edits():
+    """Test that groups stay within budget and an edit only regroups its neighbourhood."""
+    texts = [f"Item {i} of a long list of similar items." for i in range(300)]
+    nodes = [SummaryNode(text_key(text), text) for text in texts]
+    
+    groups = pack_groups(nodes, 100)
+    edited = list(nodes)
+    edited[150] = SummaryNode(text_key("An edited item."), "An edited item.")
+    edited_groups = pack_groups(edited, 100)
+    
+    assert [node for group in groups for node in group] == nodes
+    assert all(sum(estimate_tokens(node.text) for node in group) <= 100 for group in groups)
+    changed = [group for group in edited_groups if group not in groups]
+    assert 1 <= len(changed) <= 2
+    assert all(len(group) >= 2 for group in pack_groups(nodes[:5], 1, min_size=2))
+
+
+@pytest.mark.asyncio
+async def test_summary_tree_is_reused_across_runs(tmp_path):
+    """Test that re-runs only request the tree nodes whose inputs changed."""
+    client, state = fake_completions(latency=0)
+    config = SummarizerConfig(group_tokens=100, partial_summary_words=30, max_summary_length=50)
+    cache = SummaryCache(tmp_path / "summaries.sqlite3")
+    
+    first = await MapReduceSummarizer(config, client, cache).summarize(BOOK)
+    cold_calls = len(state["prompts"])
+    
+    summarizer = MapReduceSummarizer(config, client, SummaryCache(tmp_path / "summaries.sqlite3"))
+    assert await summarizer.summarize(BOOK) == first
+    assert len(state["prompts"]) == cold_calls
+    assert summarizer.stages[-1].cached == 1
+    
+    # An edit recomputes one or two map groups and the reduce nodes above them
+    await summarizer.summarize(BOOK.replace("Sentence number 120 ", "An edited sentence "))
+    stages = summarizer.stages
+    assert 1 <= stages[0].calls <= 2 and stages[0].cached > 0
+    assert all(stage.calls <= 2 for stage in stages)
+    
+    # A different target length only recomputes the root
+    calls = len(state["prompts"])
+    await summarizer.summarize(BOOK, max_length=40)
+    assert len(state["prompts"]) == calls + 1
+    assert [stage.calls for stage in summarizer.stages] == [0] * (len(summarizer.stages) - 1) + [1]
+
+
+ANALYSIS = {
+    "topics": [{"name": "Rivers", "description": "How rivers shape land", "confidence": 0.9, "keywords": ["erosion"]}],
+    "summary": "A text about rivers.",
+    "key_concepts": ["Erosion: wearing away of rock"],
+}
+
+
+def chat_client(*contents):
+    """Create a mock chat client returning the given contents in turn."""
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=[
+        MagicMock(choices=[MagicMock(message=MagicMock(content=content), finish_reason="stop")]) for content in contents
+    ])
+    return client
+
+
+def routed_chat_client(answers):
+    """Create a mock chat client answering by a phrase in the system prompt.
+    
+    An exception answer is raised instead of returned.
+    """
+    async def create(messages, **kwargs):
+        system = messages[0]["content"]
+        answer = next(answer for phrase, answer in answers.items() if phrase in system)
+        if isinstance(answer, Exception):
+            raise answer
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=answer), finish_reason="stop")])
+    
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=create)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_analyze_makes_one_request(summarizer_config, topic_extractor_config):
+    """Test that topics, summary and key concepts come from one structured request."""
+    client = chat_client("```json\n" + json.dumps(ANALYSIS) + "\n```")
+    service = OpenAILLMService(summarizer_config, topic_extractor_config, client=client)
+    
+    result = await service.analyze("Rivers carve valleys over time.", num_topics=1, num_concepts=1)
+    
+    assert result.combined
+    assert [topic.name for topic in result.topics] == ["Rivers"]
+    assert result.summary == "A text about rivers."
+    assert result.key_concepts == ["Erosion: wearing away of rock"]
+    client.chat.completions.create.assert_awaited_once()
+    request = client.chat.completions.create.call_args.kwargs
+    assert request["response_format"] == {"type": "json_object"}
+    assert "Rivers carve valleys over time." in request["messages"][-1]["content"]
+    assert "under 100 words" in request["messages"][-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_analyze_falls_back_to_separate_requests(summarizer_config, topic_extractor_config):
+    """Test that an unparseable combined response falls back to the three calls."""
+    broken = dict(ANALYSIS, topics=[{"name": "Rivers"}])
+    client = routed_chat_client({
+        "JSON": json.dumps(broken),
+        "extracts topics": json.dumps(ANALYSIS["topics"]),
+        "summarizes": "A summary.",
+        "key concepts": "1. Erosion",
+    })
+    service = OpenAILLMService(summarizer_config, topic_extractor_config, client=client)
+    results = []
+    
+    result = await service.analyze(
+        "Rivers carve valleys over time.", num_topics=1, num_concepts=1, on_result=results.append
+    )
+    
+    assert not result.combined
+    assert not result.errors
+    assert client.chat.completions.create.await_count == 4
+    assert result.topics[0].name == "Rivers"
+    assert result.summary == "A summary."
+    assert result.key_concepts == ["Erosion"]
+    assert sorted(stage.name for stage in results) == sorted(ANALYSIS_STAGES)
+
+
+@pytest.mark.asyncio
+async def test_analyze_fallback_isolates_failed_stage(summarizer_config, topic_extractor_config):
+    """Test that a failing separate request leaves the other stages' results intact."""
+    client = routed_chat_client({
+        "JSON": "not json",
+        "extracts topics": json.dumps(ANALYSIS["topics"]),
+        "summarizes": RuntimeError("rate limited"),
+        "key concepts": "1. Erosion",
+    })
+    service = OpenAILLMService(summarizer_config, topic_extractor_config, client=client)
+    
+    result = await service.analyze("Rivers carve valleys over time.", num_topics=1, num_concepts=1)
+    
+    assert result.topics[0].name == "Rivers"
+    assert result.summary == ""
+    assert result.key_concepts == ["Erosion"]
+    assert list(result.errors) == ["summary"]
+    assert str(result.errors["summary"]) == "rate limited"
+
+
+@pytest.mark.asyncio
+async def test_analyze_reports_combined_stages(summarizer_config, topic_extractor_config):
+    """Test that a combined request reports all three stages to the callback."""
+    client = chat_client(json.dumps(ANALYSIS))
+    service = OpenAILLMService(summarizer_config, topic_extractor_config, client=client)
+    results = []
+    
+    await service.analyze("Rivers carve valleys over time.", num_topics=1, num_concepts=1, on_result=results.append)
+    
+    assert [stage.name for stage in results] == list(ANALYSIS_STAGES)
+    assert results[1].value == "A text about rivers."
+    assert all(stage.ok for stage in results)
+
+
+@pytest.mark.asyncio
+async def test_analyze_condenses_long_text(topic_extractor_config):
+    """Test that a text longer than one request is condensed before analysis."""
+    client, state = fake_completions(latency=0, analysis=ANALYSIS)
+    config = SummarizerConfig(group_tokens=100, partial_summary_words=30)
+    service = OpenAILLMService(config, topic_extractor_config, client=client)
+    
+    result = await service.analyze(BOOK)
+    
+    assert result.combined
+    (analysis_prompt,) = [prompt for prompt in state["prompts"] if "respond with a JSON object" in prompt]
+    assert "Sentence number 0" in analysis_prompt
+    assert estimate_tokens(analysis_prompt) < estimate_tokens(BOOK) / 2
+    assert service.summarizer.stages[0].name == "map"
+
+
+@pytest.mark.asyncio
+async def test_analyze_fallback_uses_condensed_text(topic_extractor_config):
+    """Test that the separate requests after an unparseable response reuse the condensed tree."""
+    client, state = fake_completions(latency=0, analysis={})
+    config = SummarizerConfig(group_tokens=100, partial_summary_words=30)
+    service = OpenAILLMService(config, topic_extractor_config, client=client)
+    
+    result = await service.analyze(BOOK)
+    
+    assert not result.combined
+    analysis_index = next(
+        index for index, prompt in enumerate(state["prompts"]) if "respond with a JSON object" in prompt
+    )
+    fallback_prompts = state["prompts"][analysis_index + 1:]
+    assert any("EXACTLY 5 topics" in prompt for prompt in fallback_prompts)
+    assert any("most important concepts" in prompt for prompt in fallback_prompts)
+    assert all(estimate_tokens(prompt) < estimate_tokens(BOOK) / 2 for prompt in fallback_prompts)
+    assert not any("part of a longer text" in prompt for prompt in fallback_prompts)
+    assert sum("Please summarize the following text" in prompt for prompt in fallback_prompts) == 1
+    stages = service.summarizer.stages
+    assert stages[0].name == "map"
+    assert sum(stage.calls for stage in stages) == len(state["prompts"]) - 3
+
+
+def test_parse_analysis_rejects_invalid_shapes():
+    """Test validation of the combined response."""
+    assert parse_analysis(json.dumps(ANALYSIS)).topics[0].confidence == 0.9
+    for invalid in ["not json", "[]", json.dumps(dict(ANALYSIS, summary="")),
+                    json.dumps(dict(ANALYSIS, key_concepts="Erosion"))]:
+        with pytest.raises(ValueError):
+            parse_analysis(invalid)
+
+
+@pytest.mark.asyncio
+async def test_response_cache_makes_warm_runs_free(tmp_path, topic_extractor_config):
+    """Test that re-running an analysis with the same settings makes no API calls."""
+    config = SummarizerConfig(group_tokens=100, partial_summary_words=30)
+    client, state = fake_completions(latency=0, analysis=ANALYSIS)
+    cold = OpenAILLMService(
+        config, topic_extractor_config, client=client,
+        response_cache=ResponseCache(tmp_path / "responses.sqlite3")
+    )
+    first = await cold.analyze(BOOK, num_topics=1, num_concepts=1)
+    cold_calls = client.chat.completions.create.await_count
+    
+    cache = ResponseCache(tmp_path / "responses.sqlite3")
+    warm = OpenAILLMService(config, topic_extractor_config, client=client, response_cache=cache)
+    second = await warm.analyze(BOOK, num_topics=1, num_concepts=1)
+    
+    assert cold_calls > 1
+    assert client.chat.completions.create.await_count == cold_calls
+    assert cache.hits == cold_calls and cache.misses == 0
+    assert second.summary == first.summary and second.key_concepts == first.key_concepts
+    assert [topic.name for topic in second.topics] == [topic.name for topic in first.topics]
+
+
+@pytest.mark.asyncio
+async def test_response_cache_keys_on_request_settings(tmp_path):
+    """Test that a request differing in temperature, model or messages is not served from the cache."""
+    client, _ = fake_completions(latency=0)
+    cache = ResponseCache(tmp_path / "responses.sqlite3")
+    cached = cache.wrap(client)
+    request = dict(
+        model="gpt-3.5-turbo", temperature=0.7, max_tokens=100,
+        messages=[{"role": "user", "content": "Please summarize:\n\nRivers carve valleys."}]
+    )
+    
+    first = await cached.chat.completions.create(**request)
+    again = await cached.chat.completions.create(**dict(reversed(list(request.items()))))
+    await cached.chat.completions.create(**dict(request, temperature=0.2))
+    await cached.chat.completions.create(**dict(request, model="gpt-4o"))
+    await cached.chat.completions.create(**dict(request, messages=[{"role": "user", "content": "Other text."}]))
+    
+    assert client.chat.completions.create.await_count == 4
+    assert again.choices[0].message.content == first.choices[0].message.content
+    assert cache.hits == 1
+    assert again.choices[0].finish_reason == "stop"
+    entry = json.loads(zlib.decompress(cache.store.get(cache.key(request))))
+    assert entry == {"content": first.choices[0].message.content, "finish_reason": "stop"}
+
+
+@pytest.mark.asyncio
+async def test_response_cache_skips_incomplete_responses(tmp_path):
+    """Test that truncated responses are not cached."""
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=MagicMock(
+        choices=[MagicMock(message=MagicMock(content='{"summary": "cut'), finish_reason="length")]
+    ))
+    cache = ResponseCache(tmp_path / "responses.sqlite3")
+    cached = cache.wrap(client)
+    request = dict(model="gpt-3.5-turbo", temperature=0.7, max_tokens=5, messages=[{"role": "user", "content": "Hi"}])
+    
+    await cached.chat.completions.create(**request)
+    await cached.chat.completions.create(**request)
+    
+    assert client.chat.completions.create.await_count == 2
+    assert len(cache.store) == 0
+
+
+@pytest.mark.asyncio
+async def test_analyze_discards_unparseable_cached_response(tmp_path, summarizer_config, topic_extractor_config):
+    """Test that a combined response that failed to parse is requested again on the next run."""
+    answers = {
+        "JSON": "not json",
+        "extracts topics": json.dumps(ANALYSIS["topics"]),
+        "summarizes": "A summary.",
+        "key concepts": "1. Erosion",
+    }
+    client = routed_chat_client(answers)
+    cache = ResponseCache(tmp_path / "responses.sqlite3")
+    service = OpenAILLMService(summarizer_config, topic_extractor_config, client=client, response_cache=cache)
+    
+    assert not (await service.analyze("Rivers carve valleys over time.", num_topics=1, num_concepts=1)).combined
+    answers["JSON"] = json.dumps(ANALYSIS)
+    result = await service.analyze("Rivers carve valleys over time.", num_topics=1, num_concepts=1)
+    
+    assert result.combined
+    assert client.chat.completions.create.await_count == 5
+    assert result.summary == "A text about rivers."
+
+
+@pytest.mark.asyncio
+async def test_bypass_response_cache_refreshes_entries(tmp_path, summarizer_config):
+    """Test that bypassed requests reach the API and replace the cached response."""
+    client = chat_client("Old summary.", "New summary.")
+    summarizer = OpenAISummarizer(
+        summarizer_config, client=client, response_cache=ResponseCache(tmp_path / "responses.sqlite3")
+    )
+    
+    assert await summarizer.summarize("Rivers carve valleys.") == "Old summary."
+    with bypass_response_cache():
+        assert await summarizer.summarize("Rivers carve valleys.") == "New summary."
+    assert await summarizer.summarize("Rivers carve valleys.") == "New summary."
+    assert client.chat.completions.create.await_count == 2
@@ -1,12 +1,21 @@
 """
 Unit tests for the PDF processor.
 """
+import mmap
 import pytest
 from pathlib import Path
 from unittest.mock import AsyncMock, patch, MagicMock
+from reportlab.pdfgen import canvas
 
-from noteviz.core.pdf import PDFConfig
-from noteviz.core.pdf.pypdf import PyPDFProcessor
+from pypdf import PdfReader
+
+from noteviz.core.pdf import (
+    ChunkSpan, DocumentText, ExtractionCache, OutlineEntry, PDFConfig, PDFProcessor, PDFSession,
+    split_sections, strip_boilerplate
+)
+from noteviz.core.pdf.chunking import token_chunk_bounds
+from noteviz.core.pdf.pypdf import PyPDFProcessor, _page_ranges
+from noteviz.core.tokens import estimate_tokens
 
 
 @pytest.fixture
@@ -34,10 +43,25 @@ def mock_pdf_reader():
             "/Creator": "Test Creator",
             "/Producer": "Test Producer"
         }
+        # Record what the reader was opened on while the session still has it open
+        mock.sources = []
+        
+        def open_reader(source):
+            mock.sources.append(bytes(source[:]) if isinstance(source, mmap.mmap) else source)
+            return mock.return_value
         mock.return_value = reader
+        mock.side_effect = open_reader
         yield mock
 
 
+@pytest.fixture
+def pdf_path(tmp_path):
+    """Create a placeholder file for tests that mock the PDF reader."""
+    path = tmp_path / "test.pdf"
+    path.write_bytes(b"%PDF-1.4 placeholder")
+    return path
+
+
 @pytest.fixture
 def pdf_processor(pdf_config):
     """Create a test PDF processor."""
@@ -45,9 +69,8 @@ def pdf_processor(pdf_config):
 
 
 @pytest.mark.asyncio
-async def test_process_pdf(pdf_processor, mock_pdf_reader):
+async def test_process_pdf(pdf_processor, mock_pdf_reader, pdf_path):
     """Test PDF processing."""
-    pdf_path = Path("test.pdf")
     chunks = await pdf_processor.process_pdf(pdf_path)
     
     assert isinstance(chunks, list)
@@ -55,14 +78,14 @@ async def test_process_pdf(pdf_processor, mock_pdf_reader):
     assert all(isinstance(chunk, str) for chunk in chunks)
     assert all(len(chunk) <= pdf_processor.config.chunk_size for chunk in chunks)
     
-    # Verify reader was called correctly
-    mock_pdf_reader.assert_called_once_with(pdf_path)
+    # Verify the file was parsed once, from its mapped content
+    mock_pdf_reader.assert_called_once()
+    assert mock_pdf_reader.sources == [pdf_path.read_bytes()]
 
 
 @pytest.mark.asyncio
-async def test_extract_metadata(pdf_processor, mock_pdf_reader):
+async def test_extract_metadata(pdf_processor, mock_pdf_reader, pdf_path):
     """Test metadata extraction."""
-    pdf_path = Path("test.pdf")
     metadata = await pdf_processor.extract_metadata(pdf_path)
     
     assert isinstance(metadata, dict)
@@ -74,5 +97,541 @@ async def test_extract_metadata(pdf_processor, mock_pdf_reader):
     assert metadata["producer"] == "Test Producer"
     assert metadata["num_pages"] == 2
     
-    # Verify reader was called correctly
-    mock_pdf_reader.assert_called_once_with(pdf_path) 
\ No newline at end of file
+    # Verify the file was parsed once, from its mapped content
+    mock_pdf_reader.assert_called_once()
+    assert mock_pdf_reader.sources == [pdf_path.read_bytes()]
+
+@pytest.fixture
+def multi_page_pdf(tmp_path):
+    """Create a real PDF with several pages of distinct text."""
+    pdf_path = tmp_path / "book.pdf"
+    c = canvas.Canvas(str(pdf_path))
+    for page in range(1, 8):
+        c.drawString(100, 750, f"Page {page} heading")
+        c.drawString(100, 700, f"Body text for page number {page} of the test book.")
+        c.showPage()
+    c.save()
+    return pdf_path
+
+
+@pytest.mark.asyncio
+async def test_parallel_extraction_matches_serial(multi_page_pdf):
+    """Test that process-pool extraction returns pages in order."""
+    serial = PyPDFProcessor(PDFConfig(chunk_size=100, chunk_overlap=20))
+    parallel = PyPDFProcessor(PDFConfig(chunk_size=100, chunk_overlap=20, num_workers=2))
+    
+    serial_pages = await serial.extract_pages(multi_page_pdf)
+    parallel_pages = await parallel.extract_pages(multi_page_pdf)
+    
+    assert parallel_pages == serial_pages
+    assert len(parallel_pages) == 7
+    assert "Page 3 heading" in parallel_pages[2]
+    assert await parallel.process_pdf(multi_page_pdf) == await serial.process_pdf(multi_page_pdf)
+
+
+@pytest.mark.asyncio
+async def test_parallel_extraction_can_stop_early(multi_page_pdf):
+    """Test that closing a parallel page iterator early shuts the pool down."""
+    parallel = PyPDFProcessor(PDFConfig(chunk_size=100, chunk_overlap=20, num_workers=2))
+    
+    pages = parallel.iter_pages(multi_page_pdf)
+    first = await pages.__anext__()
+    await pages.aclose()
+    
+    assert "Page 1 heading" in first
+
+
+def test_page_ranges_cover_all_pages():
+    """Test that page sharding covers each page exactly once."""
+    ranges = _page_ranges(10, 4)
+    
+    assert ranges == [(0, 3), (3, 6), (6, 8), (8, 10)]
+    assert _page_ranges(2, 8) == [(0, 1), (1, 2)]
+
+
+def _reference_chunks(text, chunk_size, chunk_overlap):
+    """Chunk a whole document at once, as process_pdf originally did."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunks.append(text[start:start + chunk_size])
+        start += chunk_size - chunk_overlap
+    return chunks
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(100, 20), (7, 3), (1000, 200)])
+async def test_iter_chunks_matches_whole_document_chunking(mock_pdf_reader, pdf_path, chunk_size, chunk_overlap):
+    """Test that streamed chunks carry overlap across page boundaries."""
+    pages = [f"Page {i} " + "word " * (i * 7) for i in range(6)]
+    mock_pdf_reader.return_value.pages = [
+        MagicMock(**{"extract_text.return_value": text}) for text in pages
+    ]
+    processor = PyPDFProcessor(PDFConfig(chunk_size=chunk_size, chunk_overlap=chunk_overlap))
+    
+    chunks = [chunk async for chunk in processor.iter_chunks(pdf_path)]
+    
+    expected = _reference_chunks("".join(text + "\n" for text in pages), chunk_size, chunk_overlap)
+    assert chunks == expected
+    assert await processor.process_pdf(pdf_path) == expected
+
+
+@pytest.mark.asyncio
+async def test_iter_chunks_yields_before_all_pages_are_extracted(pdf_processor, mock_pdf_reader, pdf_path):
+    """Test that chunks are yielded while later pages are still pending."""
+    extracted = []
+    
+    def page(i):
+        def extract_text():
+            extracted.append(i)
+            return f"{i}" * 150
+        return MagicMock(**{"extract_text.side_effect": extract_text})
+    
+    mock_pdf_reader.return_value.pages = [page(i) for i in range(10)]
+    
+    chunks = pdf_processor.iter_chunks(pdf_path)
+    first = await chunks.__anext__()
+    await chunks.aclose()
+    
+    assert first == "0" * 100
+    assert extracted == [0]
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(100, 20), (7, 3), (1000, 200)])
+def test_document_chunks_match_process_pdf_chunks(chunk_size, chunk_overlap):
+    """Test that chunk spans cover the same text as string chunking."""
+    pages = [f"Page {i} " + "word " * (i * 7) for i in range(6)]
+    document = DocumentText("book.pdf", pages)
+    
+    spans = document.chunk(chunk_size, chunk_overlap)
+    
+    expected = _reference_chunks("".join(text + "\n" for text in pages), chunk_size, chunk_overlap)
+    assert [span.text for span in spans] == expected
+    assert all(span.doc_id == "book.pdf" for span in spans)
+    assert all(pages[span.page].startswith(document.text[document.page_offsets[span.page]:span.start])
+               for span in spans)
+
+
+def test_document_join_merges_overlapping_spans():
+    """Test that re-joining overlapping chunks does not repeat the overlap."""
+    document = DocumentText("doc", ["first page", "second page"])
+    spans = document.chunk(8, 3)
+    
+    assert document.join(spans) == document.text
+    assert document.join([spans[0], spans[-1]]) == spans[0].text + "\n" + spans[-1].text
+    assert document.page_span(1).text == "second page\n"
+    assert document.page_at(document.page_offsets[1]) == 1
+    
+    with pytest.raises(ValueError):
+        DocumentText("other", ["x"]).join(spans)
+    with pytest.raises(ValueError):
+        document.chunk(5, 5)
+
+
+def test_chunk_span_is_lazy_view():
+    """Test that spans hold offsets and compare by position."""
+    document = DocumentText("doc", ["abcdef"])
+    span = ChunkSpan(document, 0, 1, 4)
+    
+    assert str(span) == "bcd"
+    assert len(span) == 3
+    assert span == ChunkSpan(document, 0, 1, 4)
+    assert span != ChunkSpan(DocumentText("doc", ["abcdef"]), 0, 1, 4)
+
+
+@pytest.mark.asyncio
+async def test_extract_document_matches_process_pdf(multi_page_pdf, pdf_processor):
+    """Test that chunk spans of an extracted document match process_pdf."""
+    document = await pdf_processor.extract_document(multi_page_pdf)
+    spans = pdf_processor.chunk_document(document)
+    
+    assert document.doc_id == "book.pdf"
+    assert document.num_pages == 7
+    assert [span.text for span in spans] == await pdf_processor.process_pdf(multi_page_pdf)
+    assert spans[-1].page == 6
+
+
+class TextSession(PDFSession):
+    """Session over page texts held in memory."""
+    
+    def __init__(self, pages):
+        self.pages = pages
+    
+    @property
+    def num_pages(self):
+        return len(self.pages)
+    
+    async def extract_pages(self, pages=None):
+        return [self.pages[page] for page in (range(len(self.pages)) if pages is None else pages)]
+    
+    async def fingerprint_pages(self):
+        return [str(hash(text)) for text in self.pages]
+    
+    async def extract_metadata(self):
+        return {"num_pages": len(self.pages)}
+    
+    def close(self):
+        pass
+
+
+class TextProcessor(PDFProcessor):
+    """Processor that only implements the abstract methods."""
+    
+    def __init__(self, config, pages):
+        super().__init__(config)
+        self.pages = pages
+    
+    def open(self, pdf_path):
+        return TextSession(self.pages)
+    
+    async def process_pdf(self, pdf_path):
+        return []
+    
+    async def extract_metadata(self, pdf_path):
+        return {}
+
+
+@pytest.mark.asyncio
+async def test_processor_defaults_use_sessions(pdf_config):
+    """Test that page and document extraction work for any processor with sessions."""
+    processor = TextProcessor(pdf_config, ["First page.", "Second page."])
+    
+    document = await processor.extract_document(Path("notes.pdf"))
+    
+    assert await processor.extract_pages(Path("notes.pdf"), [1]) == ["Second page."]
+    assert len(await processor.fingerprint_pages(Path("notes.pdf"))) == 2
+    assert document.doc_id == "notes.pdf"
+    assert document.page_span(1).text == "Second page.\n"
+
+
+@pytest.mark.asyncio
+async def test_extraction_cache_skips_parsing_on_warm_run(multi_page_pdf, pdf_config, tmp_path):
+    """Test that a warm run serves page text without opening the PDF."""
+    cache = ExtractionCache(tmp_path / "extraction.sqlite3")
+    processor = PyPDFProcessor(pdf_config, cache=cache)
+    cold = await processor.process_pdf(multi_page_pdf)
+    
+    with patch("noteviz.core.pdf.pypdf.PdfReader") as reader:
+        warm = await processor.process_pdf(multi_page_pdf)
+    
+    reader.assert_not_called()
+    assert warm == cold
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.saved_seconds > 0
+
+
+@pytest.mark.asyncio
+async def test_extraction_cache_discards_corrupt_entries(multi_page_pdf, pdf_config, tmp_path):
+    """Test that an entry failing its checksum is treated as a miss."""
+    cache = ExtractionCache(tmp_path / "extraction.sqlite3")
+    processor = PyPDFProcessor(pdf_config, cache=cache)
+    pages = await processor.extract_pages(multi_page_pdf)
+    
+    key = ExtractionCache.key(multi_page_pdf)
+    blob = bytearray(cache.store.get(key))
+    blob[-5] ^= 0xFF
+    cache.store.put(key, bytes(blob))
+    
+    assert cache.get(key) is None
+    assert cache.corrupt == 1
+    assert key not in cache.store
+    assert await processor.extract_pages(multi_page_pdf) == pages
+
+
+@pytest.mark.asyncio
+async def test_extraction_cache_only_stores_complete_extractions(multi_page_pdf, pdf_config, tmp_path):
+    """Test that abandoning iteration early does not cache partial text."""
+    cache = ExtractionCache(tmp_path / "extraction.sqlite3")
+    processor = PyPDFProcessor(pdf_config, cache=cache)
+    
+    pages = processor.iter_pages(multi_page_pdf)
+    await pages.__anext__()
+    await pages.aclose()
+    
+    assert len(cache.store) == 0
+
+
+def test_extraction_cache_key_depends_on_content_and_pypdf_version(multi_page_pdf, tmp_path):
+    """Test that the key changes with the file bytes and the parser version."""
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(multi_page_pdf.read_bytes())
+    key = ExtractionCache.key(multi_page_pdf)
+    
+    assert ExtractionCache.key(copy) == key
+    with patch("noteviz.core.pdf.cache.pypdf.__version__", "0.0.0"):
+        assert ExtractionCache.key(multi_page_pdf) != key
+    copy.write_bytes(multi_page_pdf.read_bytes() + b"\n")
+    assert ExtractionCache.key(copy) != key
+
+
+def test_chunk_page_stays_within_page():
+    """Test that page chunks never cross into the next page."""
+    document = DocumentText("doc", ["a" * 25, "", "b" * 8])
+    
+    spans = document.chunk_page(0, 10, 2)
+    
+    assert [span.text for span in spans] == ["a" * 10, "a" * 10, "a" * 9 + "\n", "a\n"]
+    assert document.chunk_page(1, 10, 2) == []
+    assert [span.text for span in document.chunk_page(2, 10, 2)] == ["b" * 8 + "\n"]
+
+
+@pytest.mark.asyncio
+async def test_fingerprints_and_selected_pages(multi_page_pdf, pdf_processor):
+    """Test page fingerprints and extraction of selected pages."""
+    fingerprints = await pdf_processor.fingerprint_pages(multi_page_pdf)
+    pages = await pdf_processor.extract_pages(multi_page_pdf, pages=[4, 1])
+    
+    assert len(set(fingerprints)) == 7
+    assert "Page 5 heading" in pages[0]
+    assert "Page 2 heading" in pages[1]
+
+
+@pytest.mark.asyncio
+async def test_session_parses_the_file_once(multi_page_pdf, pdf_processor):
+    """Test that a session serves text, metadata and fingerprints from one reader."""
+    with patch("noteviz.core.pdf.pypdf.PdfReader", wraps=PdfReader) as reader:
+        with pdf_processor.open(multi_page_pdf) as session:
+            metadata = await session.extract_metadata()
+            pages = await session.extract_pages()
+            fingerprints = await session.fingerprint_pages()
+            assert session.num_pages == 7
+            assert session.outline() == []
+    
+    reader.assert_called_once()
+    assert metadata["num_pages"] == 7
+    assert len(pages) == len(fingerprints) == 7
+    with pytest.raises(ValueError):
+        session.num_pages
+
+
+@pytest.fixture
+def outlined_pdf(tmp_path):
+    """Create a PDF with a two-level bookmark outline."""
+    path = tmp_path / "outlined.pdf"
+    c = canvas.Canvas(str(path))
+    for page, (key, title, level) in enumerate([("c1", "Chapter 1", 0), ("s1", "Section 1.1", 1), ("c2", "Chapter 2", 0)]):
+        c.drawString(100, 750, title)
+        c.drawString(100, 700, f"Body of {title.lower()}.")
+        c.bookmarkPage(key)
+        c.addOutlineEntry(title, key, level=level)
+        c.showPage()
+    c.save()
+    return path
+
+
+@pytest.mark.asyncio
+async def test_session_outline(outlined_pdf, pdf_processor):
+    """Test that outline entries are flattened with their pages and levels."""
+    with pdf_processor.open(outlined_pdf) as session:
+        outline = session.outline()
+    
+    assert outline == [
+        OutlineEntry("Chapter 1", 0, 0),
+        OutlineEntry("Section 1.1", 1, 1),
+        OutlineEntry("Chapter 2", 2, 0),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_session_cache_hit_does_not_parse(multi_page_pdf, pdf_config, tmp_path):
+    """Test that a session answered from the extraction cache never parses the file."""
+    processor = PyPDFProcessor(pdf_config, cache=ExtractionCache(tmp_path / "extraction.sqlite3"))
+    pages = await processor.extract_pages(multi_page_pdf)
+    assert ExtractionCache.key(multi_page_pdf) in processor.cache.store
+    
+    with patch("noteviz.core.pdf.pypdf.PdfReader") as reader:
+        with processor.open(multi_page_pdf) as session:
+            assert await session.extract_pages() == pages
+            assert await session.extract_pages([3]) == [pages[3]]
+    
+    reader.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_extract_sections_follows_outline(outlined_pdf, pdf_processor):
+    """Test that top-level outline entries start sections."""
+    sections = await pdf_processor.extract_sections(outlined_pdf)
+    nested = await pdf_processor.extract_sections(outlined_pdf, max_level=1)
+    
+    assert [section.title for section in sections] == ["Chapter 1", "Chapter 2"]
+    assert "Body of section 1.1" in sections[0].text
+    assert sections[1].start_page == 2
+    assert [(section.title, section.level) for section in nested] == [
+        ("Chapter 1", 0), ("Section 1.1", 1), ("Chapter 2", 0)
+    ]
+
+
+def test_outline_sections_start_at_their_heading():
+    """Test that an outline section starting mid-page begins at its heading, not the page start."""
+    document = DocumentText("book.pdf", [
+        "Chapter 1\nOpening text.",
+        "End of chapter one.\nCHAPTER  2\nSecond chapter text.",
+    ])
+    outline = [OutlineEntry("Chapter 1", 0, 0), OutlineEntry("Chapter 2", 1, 0)]
+    
+    sections = split_sections(document, outline)
+    
+    assert [section.title for section in sections] == ["Chapter 1", "Chapter 2"]
+    assert sections[0].text.endswith("End of chapter one.\n")
+    assert sections[1].text == "CHAPTER  2\nSecond chapter text.\n"
+    assert sections[1].start_page == 1
+    assert "".join(section.text for section in sections) == document.text
+
+
+def test_split_sections_falls_back_to_headings():
+    """Test heading detection for documents without an outline."""
+    document = DocumentText("book.pdf", [
+        "Preface text.",
+        "Chapter 1: Beginnings\nPart one of the story starts here.",
+        "More of chapter one.",
+        "CHAPTER II\nThe end.",
+    ])
+    
+    sections = split_sections(document)
+    
+    assert [section.title for section in sections] == ["Front matter", "Chapter 1: Beginnings", "CHAPTER II"]
+    assert sections[1].text.startswith("Chapter 1: Beginnings")
+    assert "More of chapter one." in sections[1].text
+    assert "".join(section.text for section in sections) == document.text
+    assert all(
+        sections[1].span.start <= span.start and span.end <= sections[1].span.end
+        for span in sections[1].chunk(20, 5)
+    )
+
+
+def test_split_sections_without_structure():
+    """Test that an unstructured document becomes a single section."""
+    document = DocumentText("notes.pdf", ["Just some notes.", "More notes."])
+    
+    sections = split_sections(document, outline=[OutlineEntry("Broken", None, 0)])
+    
+    assert len(sections) == 1
+    assert sections[0].title == "notes.pdf"
+    assert sections[0].text == document.text
+
+
+TOPICS = ["Rivers", "Glaciers", "Winds", "Tides"]
+BOILERPLATE_PAGES = [
+    f"The Art of Testing - Chapter 2\n{topic} shape the land,\nand {topic.lower()} do so with a hyphen-\n"
+    f"ated {topic.lower()} persistence.\nPage {i + 10}\n"
+    for i, topic in enumerate(TOPICS)
+]
+CLEAN_FIRST_PAGE = "Rivers shape the land,\nand rivers do so with a hyphenated rivers persistence.\n"
+
+
+def test_strip_boilerplate_removes_repeated_lines():
+    """Test removal of running headers, footers, page numbers and line-break hyphens."""
+    pages, report = strip_boilerplate(BOILERPLATE_PAGES)
+    
+    assert pages[0] == CLEAN_FIRST_PAGE
+    assert report.lines_removed == 8
+    assert report.hyphens_joined == 4
+    assert report.chars_removed == sum(map(len, BOILERPLATE_PAGES)) - sum(map(len, pages))
+    assert report.tokens_removed > 0
+
+
+def test_strip_boilerplate_keeps_body_lines():
+    """Test that lines repeated in the body or on too few pages are kept."""
+    pages = ["Header\nIntro\nSame line\nbody\nmore\nmore\nmore\nend", "Other\nSame line\nOther body",
+             "Header\nAnother page", "Fourth\npage"]
+    
+    normalized, report = strip_boilerplate(pages, min_fraction=0.75)
+    
+    assert normalized[0].startswith("Header\nIntro\nSame line")
+    assert "Same line" in normalized[1]
+    assert report.lines_removed == 0
+
+
+def test_strip_boilerplate_keeps_numbers_that_are_not_page_numbers():
+    """Test that numeric and numeral-like lines are kept unless they continue a page numbering."""
+    pages = [
+        "Results\nTotal revenue by year:\n2019\n2020\n2021\nmix",
+        "I\nopened the door.\nShe did",
+        "Civil war\nbroke out.\n7",
+        "It ended\nbadly.\n3",
+    ]
+    normalized, report = strip_boilerplate(pages)
+    
+    assert normalized == pages
+    assert report.lines_removed == 0
+
+
+def test_strip_boilerplate_removes_page_number_sequences():
+    """Test that roman and arabic page numbers continuing across pages are removed."""
+    pages = ["iv\nPreface text.", "v\nMore preface.", "Chapter one.\n1", "Blank page.", "Chapter two.\n3"]
+    
+    normalized, report = strip_boilerplate(pages)
+    
+    assert normalized == ["Preface text.", "More preface.", "Chapter one.", "Blank page.", "Chapter two."]
+    assert report.lines_removed == 4
+
+
+@pytest.mark.asyncio
+async def test_processor_normalizes_only_when_enabled(multi_page_pdf):
+    """Test that boilerplate stripping is opt-in and reported by the processor."""
+    plain = PyPDFProcessor(PDFConfig(chunk_size=100, chunk_overlap=20))
+    assert plain.normalize_pages(BOILERPLATE_PAGES) == BOILERPLATE_PAGES
+    
+    processor = PyPDFProcessor(PDFConfig(chunk_size=100, chunk_overlap=20, strip_boilerplate=True))
+    document = await processor.extract_document(multi_page_pdf)
+    chunks = await processor.process_pdf(multi_page_pdf)
+    
+    assert processor.normalize_pages(BOILERPLATE_PAGES)[0] == CLEAN_FIRST_PAGE
+    assert chunks == [span.text for span in document.chunk(100, 20)]
+    assert processor.normalization.lines_removed >= 8
+
+
+PROSE = "\n\n".join(
+    " ".join(f"Sentence {p}.{s} says something about topic {p} at some length." for s in range(6))
+    for p in range(12)
+)
+
+
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(40, 0), (64, 16), (200, 50)])
+def test_token_chunks_respect_budget_and_sentences(max_tokens, overlap_tokens):
+    """Test that token chunks fit the budget, end at sentence ends and cover the text."""
+    document = DocumentText("prose.pdf", [PROSE])
+    
+    spans = document.chunk_range_tokens(0, len(document), max_tokens, overlap_tokens)
+    
+    assert all(estimate_tokens(span.text) <= max_tokens for span in spans)
+    assert all(span.text.endswith(".") and span.text[0].isupper() for span in spans)
+    assert all(later.start > earlier.start and later.end > earlier.end for earlier, later in zip(spans, spans[1:]))
+    assert document.join(spans).split() == PROSE.split()
+    if overlap_tokens:
+        assert all(later.start < earlier.end for earlier, later in zip(spans, spans[1:]))
+
+
+def test_token_chunks_advance_with_high_overlap():
+    """Test that no chunk falls within the previous one when the overlap is most of the budget."""
+    text = "gg.\n\n gg.\n\n ccc fffff iiii? fffff bb h\n iiii? bb ccc iiii? gg.\n\n fffff h\n a h\n a ee,  "
+    
+    bounds = token_chunk_bounds(text, 0, len(text), 14, 12)
+    
+    assert all(later[0] > earlier[0] and later[1] > earlier[1] for earlier, later in zip(bounds, bounds[1:]))
+    assert bounds[-1][1] == len(text.rstrip())
+
+
+def test_token_chunks_prefer_paragraphs_and_split_long_words():
+    """Test paragraph snapping and the fallbacks for text without sentence ends."""
+    text = "First paragraph is short.\n\nSecond one goes on a bit longer. " + "x" * 30
+    
+    assert token_chunk_bounds(text, 0, len(text), 10, 0)[0] == (0, 25)
+    assert token_chunk_bounds("word " * 20, 0, 100, 4, 0)[0] == (0, 14)
+    assert token_chunk_bounds("y" * 50, 0, 50, 4, 1) == [(0, 16), (16, 32), (32, 48), (48, 50)]
+    with pytest.raises(ValueError):
+        token_chunk_bounds(text, 0, len(text), 4, 4)
+
+
+@pytest.mark.asyncio
+async def test_token_chunker_is_selectable(multi_page_pdf):
+    """Test that the processor chunks by token budget when configured to."""
+    processor = PyPDFProcessor(PDFConfig(chunker="tokens", chunk_tokens=16, chunk_overlap_tokens=4))
+    document = await processor.extract_document(multi_page_pdf)
+    
+    chunks = await processor.process_pdf(multi_page_pdf)
+    page_spans = processor.chunk_range(document, document.page_offsets[2], document.page_offsets[3])
+    
+    assert chunks == [span.text for span in processor.chunk_document(document)]
+    assert all(estimate_tokens(chunk) <= 16 for chunk in chunks)
+    assert all(span.page == 2 and span.end <= document.page_offsets[3] for span in page_spans)
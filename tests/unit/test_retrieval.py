@@ -4,6 +4,9 @@ import numpy as np
 
 from noteviz.core.retrieval.base import RetrievalConfig
 from noteviz.core.retrieval.cosine import CosineRetrieval
+from noteviz.core.retrieval.ivf import IVFConfig, IVFRetrieval
+from noteviz.core.retrieval.bm25 import BM25Index
+from noteviz.core.retrieval.hybrid import HybridConfig, HybridRetrieval, reciprocal_rank_fusion
 
 
 @pytest.fixture
@@ -82,4 +85,491 @@ def test_find_relevant_chunks_invalid_embeddings(retrieval_service, sample_data)
     
     # Test with invalid query embedding dimensions
     with pytest.raises(ValueError):
-        retrieval_service.find_relevant_chunks([0.5, 0.5])  # Wrong dimensions 
\ No newline at end of file
+        retrieval_service.find_relevant_chunks([0.5, 0.5])  # Wrong dimensions 
+
+def test_index_accepts_float32_matrix_without_copy(retrieval_service, sample_data):
+    """Test that a float32 embedding matrix is indexed without copying."""
+    texts, embeddings = sample_data
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    
+    retrieval_service.index(texts, matrix)
+    results = retrieval_service.find_relevant_chunks(np.array([0.9, 0.1, 0.0], dtype=np.float32))
+    
+    assert np.shares_memory(retrieval_service.embeddings, matrix)
+    assert results[0][0] == texts[0]
+
+
+def test_find_relevant_chunks_matches_full_sort():
+    """Test that partial top-k selection matches a full sort of the scores."""
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(500, 16)).astype(np.float32)
+    texts = [f"chunk {i}" for i in range(500)]
+    query = rng.normal(size=16).astype(np.float32)
+    service = CosineRetrieval(RetrievalConfig(similarity_threshold=0.1, max_results=7))
+    service.index(texts, embeddings)
+    
+    results = service.find_relevant_chunks(query)
+    
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    expected = [texts[i] for i in np.argsort(-scores)[:7] if scores[i] >= 0.1]
+    assert [text for text, _ in results] == expected
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_find_relevant_chunks_applies_threshold(retrieval_service, sample_data):
+    """Test that chunks below the similarity threshold are excluded."""
+    texts, embeddings = sample_data
+    retrieval_service.index(texts, embeddings)
+    
+    results = retrieval_service.find_relevant_chunks([0.0, 0.0, 1.0])
+    
+    assert results == [(texts[2], 1.0)]
+
+
+def test_index_normalizes_rows_once(retrieval_service, sample_data):
+    """Test that the indexed matrix is row-normalized float32."""
+    texts, embeddings = sample_data
+    
+    retrieval_service.index(texts, embeddings)
+    
+    assert retrieval_service.embeddings.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(retrieval_service.embeddings, axis=1), 1.0, rtol=1e-6)
+
+
+def test_find_relevant_chunks_batch_matches_single_queries():
+    """Test that blocked batch scoring matches answering queries one by one."""
+    rng = np.random.default_rng(1)
+    embeddings = rng.normal(size=(300, 8)).astype(np.float32)
+    texts = [f"chunk {i}" for i in range(300)]
+    queries = rng.normal(size=(23, 8)).astype(np.float32)
+    # A small block size forces several query and corpus blocks
+    service = CosineRetrieval(RetrievalConfig(similarity_threshold=0.2, max_results=4, block_size=7))
+    service.index(texts, embeddings)
+    
+    batch_results = service.find_relevant_chunks_batch(queries)
+    
+    assert len(batch_results) == len(queries)
+    for query, results in zip(queries, batch_results):
+        expected = service.find_relevant_chunks(query)
+        assert [text for text, _ in results] == [text for text, _ in expected]
+        np.testing.assert_allclose(
+            [score for _, score in results], [score for _, score in expected], rtol=1e-5
+        )
+
+
+def test_find_relevant_chunks_batch_invalid_shape(retrieval_service, sample_data):
+    """Test that a query matrix with the wrong width is rejected."""
+    texts, embeddings = sample_data
+    retrieval_service.index(texts, embeddings)
+    
+    with pytest.raises(ValueError):
+        retrieval_service.find_relevant_chunks_batch([[0.5, 0.5]])
+
+
+def clustered_embeddings(rng, n_clusters=20, per_cluster=50, dimensions=16):
+    """Generate unit vectors grouped around random cluster centres."""
+    centres = rng.normal(size=(n_clusters, dimensions))
+    points = np.repeat(centres, per_cluster, axis=0) + 0.3 * rng.normal(size=(n_clusters * per_cluster, dimensions))
+    return points.astype(np.float32)
+
+
+def test_ivf_retrieval_exhaustive_probe_matches_exact():
+    """Test that probing every list gives the same results as exact search."""
+    rng = np.random.default_rng(2)
+    embeddings = clustered_embeddings(rng)
+    texts = [f"chunk {i}" for i in range(len(embeddings))]
+    query = rng.normal(size=16).astype(np.float32)
+    exact = CosineRetrieval(RetrievalConfig(similarity_threshold=0.0, max_results=10))
+    exact.index(texts, embeddings)
+    ivf = IVFRetrieval(IVFConfig(similarity_threshold=0.0, max_results=10, n_lists=8, nprobe=8))
+    ivf.index(texts, embeddings)
+    
+    assert [text for text, _ in ivf.find_relevant_chunks(query)] == \
+        [text for text, _ in exact.find_relevant_chunks(query)]
+
+
+def test_ivf_retrieval_recall_with_few_probes():
+    """Test that scanning a few lists still finds most true neighbours."""
+    rng = np.random.default_rng(3)
+    embeddings = clustered_embeddings(rng)
+    texts = [f"chunk {i}" for i in range(len(embeddings))]
+    exact = CosineRetrieval(RetrievalConfig(similarity_threshold=0.0, max_results=10))
+    exact.index(texts, embeddings)
+    ivf = IVFRetrieval(IVFConfig(similarity_threshold=0.0, max_results=10, n_lists=20, nprobe=3))
+    ivf.index(texts, embeddings)
+    
+    # Query with perturbed corpus vectors so neighbours sit in nearby clusters
+    queries = embeddings[rng.choice(len(embeddings), 20, replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+    found = sum(
+        len({t for t, _ in ivf.find_relevant_chunks(q)} & {t for t, _ in exact.find_relevant_chunks(q)})
+        for q in queries
+    )
+    
+    assert found / (10 * len(queries)) >= 0.9
+
+
+def test_ivf_caps_lists_at_training_sample():
+    """Test that more lists than training rows are reduced to the training sample size."""
+    rng = np.random.default_rng(4)
+    embeddings = rng.normal(size=(200, 16)).astype(np.float32)
+    ivf = IVFRetrieval(IVFConfig(similarity_threshold=0.0, max_results=5, n_lists=64, training_sample=32))
+    
+    ivf.index([f"chunk {i}" for i in range(200)], embeddings)
+    
+    assert len(ivf.centroids) == 32
+    assert ivf.list_offsets[-1] == 200
+    assert ivf.find_relevant_chunks(embeddings[7])[0][0] == "chunk 7"
+
+
+def test_ivf_add_and_remove():
+    """Test that IVF rows can be added to their nearest lists and removed by id."""
+    rng = np.random.default_rng(5)
+    embeddings = clustered_embeddings(rng, n_clusters=4, per_cluster=25)
+    texts = [f"chunk {i}" for i in range(100)]
+    config = IVFConfig(similarity_threshold=0.0, max_results=3, n_lists=4, nprobe=4, compaction_threshold=0.5)
+    ivf = IVFRetrieval(config)
+    ivf.index(texts[:80], embeddings[:80])
+    
+    added = ivf.add(texts[80:], embeddings[80:])
+    
+    assert added == [str(i) for i in range(80, 100)]
+    assert len(ivf) == 100 and ivf.list_offsets[-1] == 100
+    assert ivf.find_relevant_chunks(embeddings[90])[0][0] == "chunk 90"
+    
+    ivf.remove(["90", "91"])
+    assert ivf.removed == 2  # tombstoned until the threshold
+    assert "chunk 90" not in [text for text, _ in ivf.find_relevant_chunks(embeddings[90])]
+    with pytest.raises(ValueError):
+        ivf.remove(["90"])
+    
+    ivf.remove([str(i) for i in range(60)])
+    assert ivf.removed == 0 and len(ivf.texts) == 38
+    assert ivf.find_relevant_chunks(embeddings[95])[0][0] == "chunk 95"
+
+
+def test_ivf_save_keeps_ids(tmp_path):
+    """Test that chunk ids survive saving, and removed rows are not saved."""
+    rng = np.random.default_rng(6)
+    embeddings = clustered_embeddings(rng, n_clusters=2, per_cluster=10)
+    ivf = IVFRetrieval(IVFConfig(similarity_threshold=0.0, max_results=1, n_lists=2, nprobe=2))
+    ivf.index([f"chunk {i}" for i in range(20)], embeddings, ids=[f"id{i}" for i in range(20)])
+    ivf.remove(["id3"])
+    ivf.save(tmp_path / "ivf")
+    
+    loaded = IVFRetrieval(ivf.config)
+    loaded.load(tmp_path / "ivf")
+    loaded.remove(["id4"])
+    
+    assert len(loaded) == 18
+    assert "id3" not in list(loaded.ids)
+    assert loaded.find_relevant_chunks(embeddings[5])[0][0] == "chunk 5"
+
+
+def test_ivf_config_validation():
+    """Test IVFConfig validation."""
+    with pytest.raises(ValueError):
+        IVFConfig(nprobe=0)
+    with pytest.raises(ValueError):
+        IVFConfig(n_lists=0)
+    with pytest.raises(ValueError):
+        IVFConfig(max_results=0)
+
+
+def test_ivf_retrieval_empty_index():
+    """Test that querying an empty IVF index is rejected."""
+    with pytest.raises(ValueError) as exc_info:
+        IVFRetrieval(IVFConfig()).find_relevant_chunks([0.5, 0.5, 0.0])
+    assert "No indexed texts available" in str(exc_info.value)
+
+
+def test_cosine_save_and_load_memory_maps(tmp_path, retrieval_config, sample_data):
+    """Test that a saved index reloads memory-mapped with identical results."""
+    texts, embeddings = sample_data
+    texts = texts[:-1] + ["Fish swim in the ocean. 🐟"]  # non-ASCII text survives the blob
+    original = CosineRetrieval(retrieval_config)
+    original.index(texts, embeddings)
+    original.save(tmp_path / "index")
+    
+    loaded = CosineRetrieval(retrieval_config)
+    loaded.load(tmp_path / "index")
+    
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert list(loaded.texts) == texts
+    query = [0.6, 0.4, 0.0]
+    assert loaded.find_relevant_chunks(query) == original.find_relevant_chunks(query)
+
+
+def test_save_replaces_existing_index(tmp_path, retrieval_config, sample_data):
+    """Test that saving over an index that is currently loaded is safe."""
+    texts, embeddings = sample_data
+    service = CosineRetrieval(retrieval_config)
+    service.index(texts, embeddings)
+    service.save(tmp_path / "index")
+    service.load(tmp_path / "index")
+    
+    service.save(tmp_path / "index")
+    service.load(tmp_path / "index")
+    
+    assert list(service.texts) == texts
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index"]
+
+
+def test_ivf_save_and_load(tmp_path):
+    """Test that an IVF index round-trips through save and load."""
+    rng = np.random.default_rng(4)
+    embeddings = clustered_embeddings(rng)
+    texts = [f"chunk {i}" for i in range(len(embeddings))]
+    config = IVFConfig(similarity_threshold=0.0, max_results=5, n_lists=10, nprobe=2)
+    original = IVFRetrieval(config)
+    original.index(texts, embeddings)
+    original.save(tmp_path / "ivf")
+    
+    loaded = IVFRetrieval(config)
+    loaded.load(tmp_path / "ivf")
+    
+    query = rng.normal(size=16).astype(np.float32)
+    assert loaded.find_relevant_chunks(query) == original.find_relevant_chunks(query)
+
+
+def test_load_rejects_other_backend(tmp_path, retrieval_config, sample_data):
+    """Test that loading another backend's index is rejected."""
+    texts, embeddings = sample_data
+    service = CosineRetrieval(retrieval_config)
+    service.index(texts, embeddings)
+    service.save(tmp_path / "index")
+    
+    with pytest.raises(ValueError):
+        IVFRetrieval(IVFConfig()).load(tmp_path / "index")
+    with pytest.raises(ValueError):
+        CosineRetrieval(retrieval_config).load(tmp_path / "missing")
+
+
+def test_add_grows_index_incrementally(retrieval_service, sample_data):
+    """Test that added chunks are searchable and the buffer grows geometrically."""
+    texts, embeddings = sample_data
+    retrieval_service.index(texts[:2], embeddings[:2])
+    
+    added = retrieval_service.add(texts[2:], embeddings[2:], ids=["birds", "fish"])
+    capacity = len(retrieval_service._state.matrix)
+    retrieval_service.add(["More birds"], [[0.0, 0.1, 1.0]])
+    
+    assert added == ["birds", "fish"]
+    assert len(retrieval_service) == 5
+    assert len(retrieval_service._state.matrix) == capacity  # spare capacity reused
+    results = retrieval_service.find_relevant_chunks([0.0, 0.0, 1.0])
+    assert [text for text, _ in results] == ["Birds can fly in the sky.", "More birds"]
+
+
+def test_add_rejects_duplicate_ids(retrieval_service, sample_data):
+    """Test that chunk ids must be unique."""
+    texts, embeddings = sample_data
+    retrieval_service.index(texts, embeddings)
+    
+    with pytest.raises(ValueError):
+        retrieval_service.add(["Another"], [[1.0, 0.0, 0.0]], ids=["0"])
+
+
+def test_index_with_custom_ids(retrieval_service, sample_data):
+    """Test that index accepts caller-chosen chunk ids."""
+    texts, embeddings = sample_data
+    retrieval_service.index(texts, embeddings, ids=["a", "b", "c", "d"])
+    
+    retrieval_service.remove(["a"])
+    
+    assert list(retrieval_service.ids) == ["a", "b", "c", "d"]
+    assert len(retrieval_service) == 3
+    with pytest.raises(ValueError):
+        retrieval_service.index(texts, embeddings, ids=["a", "a", "b", "c"])
+
+
+def test_remove_tombstones_and_compacts(sample_data):
+    """Test that removed chunks disappear from results and are compacted away."""
+    texts, embeddings = sample_data
+    service = CosineRetrieval(RetrievalConfig(similarity_threshold=0.1, max_results=5, compaction_threshold=0.5))
+    service.index(texts, embeddings)
+    
+    service.remove(["0"])
+    assert service._state.removed == 1  # below the threshold, only tombstoned
+    assert "This is a test document about cats." not in [t for t, _ in service.find_relevant_chunks([1.0, 0.0, 0.0])]
+    assert [t for t, _ in service.find_relevant_chunks_batch([[1.0, 0.0, 0.0]])[0]] == ["Fish swim in the ocean."]
+    
+    service.remove(["1", "3"])
+    assert service._state.removed == 0
+    assert list(service.texts) == ["Birds can fly in the sky."]
+    assert list(service.ids) == ["2"]
+    with pytest.raises(ValueError):
+        service.remove(["0"])
+
+
+def test_query_snapshot_survives_compaction(sample_data):
+    """Test that a query's view of the index is unaffected by a concurrent compaction."""
+    texts, embeddings = sample_data
+    service = CosineRetrieval(RetrievalConfig(similarity_threshold=0.0, max_results=5))
+    service.index(texts, embeddings)
+    service.add(["Extra"], [[0.0, 1.0, 1.0]])
+    snapshot = service._state
+    
+    service.remove(["1", "2", "3"])
+    
+    assert service._state is not snapshot
+    assert snapshot.size == 5 and list(snapshot.texts) == texts + ["Extra"]
+    assert len(service) == 2
+
+
+def test_remove_leaves_published_snapshot_unchanged(sample_data):
+    """Test that tombstoning does not write into the mask of a state queries may hold."""
+    texts, embeddings = sample_data
+    service = CosineRetrieval(RetrievalConfig(similarity_threshold=0.0, max_results=5, compaction_threshold=0.9))
+    service.index(texts, embeddings)
+    snapshot = service._state
+    
+    service.remove(["0"])
+    
+    assert snapshot.alive.all()
+    assert snapshot.removed == 0
+    assert not service._state.alive[0]
+    assert service._search(snapshot, [1.0, 0.0, 0.0])[0][0] == 0
+
+
+def test_save_after_remove_and_add_after_load(tmp_path, retrieval_config, sample_data):
+    """Test that removals are compacted on save and loaded indexes accept additions."""
+    texts, embeddings = sample_data
+    service = CosineRetrieval(retrieval_config)
+    service.index(texts, embeddings)
+    service.remove(["1"])
+    service.save(tmp_path / "index")
+    
+    loaded = CosineRetrieval(retrieval_config)
+    loaded.load(tmp_path / "index")
+    loaded.add(["Dogs again"], [[0.0, 1.0, 0.0]], ids=["dogs"])
+    
+    assert list(loaded.ids) == ["0", "2", "3", "dogs"]
+    assert loaded.find_relevant_chunks([0.0, 1.0, 0.0])[0][0] == "Dogs again"
+
+
+@pytest.fixture
+def hybrid_data():
+    """Create chunks where an exact term is not reflected in the embeddings."""
+    texts = [
+        "Maxwell's equations describe electromagnetism.",
+        "Light is an electromagnetic wave.",
+        "The Schrodinger equation governs quantum states.",
+        "Waves interfere and diffract.",
+    ]
+    embeddings = [
+        [0.0, 1.0, 0.0],
+        [1.0, 0.0, 0.0],
+        [0.0, 0.0, 1.0],
+        [0.9, 0.1, 0.0],
+    ]
+    return texts, embeddings
+
+
+def test_bm25_scores_exact_terms(hybrid_data):
+    """Test that BM25 ranks documents containing rare query terms first."""
+    texts, _ = hybrid_data
+    index = BM25Index(texts)
+    
+    scores = index.score("Schrodinger equation")
+    
+    assert int(np.argmax(scores)) == 2
+    assert scores[1] == 0.0
+    assert index.score("unknownterm").sum() == 0.0
+
+
+def test_hybrid_lexical_only_mode(hybrid_data):
+    """Test that text queries are answered without any embeddings."""
+    texts, _ = hybrid_data
+    service = HybridRetrieval(HybridConfig(max_results=2))
+    service.index(texts)
+    
+    results = service.search("maxwell")
+    
+    assert [text for text, _ in results] == [texts[0]]
+    with pytest.raises(ValueError):
+        service.find_relevant_chunks([1.0, 0.0, 0.0])
+
+
+def test_hybrid_search_fuses_rankings(hybrid_data):
+    """Test that fused results include both keyword and vector matches."""
+    texts, embeddings = hybrid_data
+    service = HybridRetrieval(HybridConfig(similarity_threshold=0.5, max_results=3))
+    service.index(texts, embeddings)
+    
+    # The embedding points at the wave chunks while the text names Maxwell
+    results = service.search("Maxwell", query_embedding=[1.0, 0.0, 0.0])
+    
+    found = [text for text, _ in results]
+    assert texts[0] in found and texts[1] in found
+    assert found[:2] == [texts[0], texts[1]]  # each tops one ranking; ties keep index order
+    assert all(score > 0 for _, score in results)
+
+
+def test_hybrid_add_and_remove(hybrid_data):
+    """Test that added chunks are found by both rankers and removed ones by neither."""
+    texts, embeddings = hybrid_data
+    service = HybridRetrieval(HybridConfig(similarity_threshold=0.5, max_results=3))
+    service.index(texts[:3], embeddings[:3], ids=["a", "b", "c"])
+    
+    assert service.add(texts[3:], embeddings[3:]) == ["3"]
+    service.remove(["b"])
+    
+    assert list(service.ids) == ["a", "c", "3"]
+    assert service.search("diffract")[0][0] == texts[3]
+    found = [text for text, _ in service.search("Maxwell", query_embedding=[1.0, 0.0, 0.0])]
+    assert found[:2] == [texts[0], texts[3]]
+    assert texts[1] not in found
+    with pytest.raises(ValueError):
+        service.add(["No vector"])
+
+
+def test_hybrid_lexical_only_add_and_remove(hybrid_data):
+    """Test incremental updates of an index built without embeddings."""
+    texts, _ = hybrid_data
+    service = HybridRetrieval(HybridConfig(max_results=2))
+    service.index(texts[:2])
+    
+    service.add(["Glaciers carve valleys."], ids=["ice"])
+    service.remove(["0"])
+    
+    assert [text for text, _ in service.search("glaciers")] == ["Glaciers carve valleys."]
+    assert service.search("maxwell") == []
+    assert len(service) == 2
+
+
+def test_hybrid_save_and_load(tmp_path, hybrid_data):
+    """Test that a saved hybrid index reloads with identical fused and lexical results."""
+    texts, embeddings = hybrid_data
+    config = HybridConfig(similarity_threshold=0.5, max_results=3)
+    original = HybridRetrieval(config)
+    original.index(texts, embeddings)
+    original.save(tmp_path / "hybrid")
+    lexical_only = HybridRetrieval(config)
+    lexical_only.index(texts)
+    lexical_only.save(tmp_path / "lexical")
+    
+    loaded = HybridRetrieval(config)
+    loaded.load(tmp_path / "hybrid")
+    loaded_lexical = HybridRetrieval(config)
+    loaded_lexical.load(tmp_path / "lexical")
+    
+    assert isinstance(loaded.lexical.doc_ids, np.memmap)
+    query = [1.0, 0.0, 0.0]
+    assert loaded.search("Maxwell", query_embedding=query) == original.search("Maxwell", query_embedding=query)
+    assert loaded.find_relevant_chunks(query) == original.find_relevant_chunks(query)
+    assert loaded_lexical.search("wave equations") == lexical_only.search("wave equations")
+    assert not (tmp_path / "lexical" / "dense").exists()
+    with pytest.raises(ValueError):
+        loaded_lexical.find_relevant_chunks(query)
+
+
+def test_reciprocal_rank_fusion():
+    """Test reciprocal rank fusion scores."""
+    fused = reciprocal_rank_fusion([[1, 2], [2, 3]], k=1)
+    
+    assert fused[2] == pytest.approx(1 / 3 + 1 / 2)
+    assert fused[1] == pytest.approx(1 / 2)
+    assert fused[3] == pytest.approx(1 / 3)
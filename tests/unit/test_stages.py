@@ -0,0 +1,79 @@
+"""Tests for concurrent pipeline stages."""
+import asyncio
+import time
+
+import pytest
+
+from noteviz.core.stages import run_stages
+
+
+async def finish_after(seconds, value=None, error=None):
+    """Sleep, then return ``value`` or raise ``error``."""
+    await asyncio.sleep(seconds)
+    if error is not None:
+        raise error
+    return value
+
+
+@pytest.mark.asyncio
+async def test_run_stages_concurrently():
+    """Test that independent stages take as long as the slowest one."""
+    start = time.perf_counter()
+    results = await run_stages({
+        "a": finish_after(0.1, "A"),
+        "b": finish_after(0.1, "B"),
+        "c": finish_after(0.1, "C"),
+    })
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.25
+    assert list(results) == ["a", "b", "c"]
+    assert [result.value for result in results.values()] == ["A", "B", "C"]
+
+
+@pytest.mark.asyncio
+async def test_run_stages_isolates_errors():
+    """Test that a failing stage does not affect the others."""
+    results = await run_stages({
+        "ok": finish_after(0.02, "fine"),
+        "broken": finish_after(0, error=RuntimeError("boom")),
+    })
+
+    assert results["ok"].ok and results["ok"].value == "fine"
+    assert not results["broken"].ok
+    assert results["broken"].value is None
+    assert str(results["broken"].error) == "boom"
+
+
+@pytest.mark.asyncio
+async def test_run_stages_reports_results_as_they_finish():
+    """Test that the callback sees results in completion order."""
+    reported = []
+    await run_stages(
+        {"slow": finish_after(0.05, 1), "fast": finish_after(0, 2)},
+        on_result=lambda result: reported.append((result.name, result.seconds)),
+    )
+
+    assert [name for name, _ in reported] == ["fast", "slow"]
+    assert reported[0][1] <= reported[1][1]
+
+
+@pytest.mark.asyncio
+async def test_run_stages_cancels_unfinished_stages():
+    """Test that cancelling the run cancels every stage still running."""
+    cancelled = []
+
+    async def wait_forever(name):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+
+    run = asyncio.ensure_future(run_stages({"a": wait_forever("a"), "b": wait_forever("b")}))
+    await asyncio.sleep(0.01)
+    run.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await run
+
+    assert sorted(cancelled) == ["a", "b"]